@@ -0,0 +1,130 @@
+"""Benchmark: exact Jacobians and generated RHS against finite differences.
+
+Compares RHS calls, Jacobian evaluations and wall time of every solver entry
+point with the solver's finite-difference Jacobian ('fd'), the exact Jacobian
+('exact') and, for the ``odeint`` paths, the exact Jacobian plus the
+code-generated buffered RHS ('generated').
+
+RHS calls include those spent differencing the Jacobian. ``odeint`` reports
+them in ``nfe``; ``solve_ivp`` leaves them out of ``nfev``, so for the PK
+runs the RHS is wrapped in a counter instead.
+
+    python benchmarks/jacobian.py
+"""
+import contextlib
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.integrate import odeint
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cbd_model import cache, pk  # noqa: E402
+from cbd_model.batch import (  # noqa: E402
+    banded_jacobian_v4_batch, buffered_dynamics_v4_batch, system_dynamics_v4_batch,
+    v4_coefficients,
+)
+from cbd_model.params import N_TIMEPOINTS, PHENOTYPES, T_END  # noqa: E402
+from cbd_model.solvers import odeint_functions  # noqa: E402
+
+VARIANTS = {'fd': (False, False), 'exact': (True, False), 'generated': (True, True)}
+CELL_TYPES = ('Healthy', 'Cancer (Vulnerable)')
+DOSES = (0, 5, 20, 40)
+
+
+def _row(label, variant, nfe, nje, seconds):
+    print(f'{label:<34} {variant:<10} {nfe:>9} {nje:>6} {seconds * 1e3:>10.2f}')
+
+
+def scalar_odeint(repeats=20):
+    """Every v1-v4 script scenario through ``odeint`` (``method='odeint'``)."""
+    t = np.linspace(0, T_END, N_TIMEPOINTS)
+    scenarios = [('v1', (dose, blocker), (1.0, 0.0))
+                 for dose in DOSES for blocker in (False, True)]
+    scenarios += [('v2', (dose, blocker, resilience), (1.0, 0.0))
+                  for dose in DOSES for blocker in (False, True) for resilience in (0.95, 0.4)]
+    scenarios += [(model, (dose, blocker, cell_type), (1.0, 0.0, 0.1))
+                  for model in ('v3', 'v4') for dose in DOSES for blocker in (False, True)
+                  for cell_type in CELL_TYPES]
+    for model in ('v1', 'v2', 'v3', 'v4'):
+        runs = [s for s in scenarios if s[0] == model]
+        for variant, (jacobian, generated) in VARIANTS.items():
+            nfe = nje = 0
+            start = time.perf_counter()
+            for _ in range(repeats):
+                for _, args, y0 in runs:
+                    func, Dfun, func_args = odeint_functions(model, args, jacobian, generated)
+                    _, info = odeint(func, list(y0), t, args=func_args, Dfun=Dfun,
+                                     full_output=True)
+            seconds = (time.perf_counter() - start) / repeats
+            for _, args, y0 in runs:
+                func, Dfun, func_args = odeint_functions(model, args, jacobian, generated)
+                _, info = odeint(func, list(y0), t, args=func_args, Dfun=Dfun, full_output=True)
+                nfe += info['nfe'][-1]
+                nje += info['nje'][-1]
+            _row(f'{model} sweep ({len(runs)} scenarios)', variant, nfe, nje, seconds)
+
+
+def batch_odeint(n=2000, stiff=False):
+    """``run_batch``'s stacked solve; ``stiff`` scales scavenging up 1000x."""
+    doses = np.linspace(0, 100, n)
+    params = dict(PHENOTYPES['Cancer (Vulnerable)'])
+    if stiff:
+        params['scavenging_capacity'] *= 1000.0
+    coefficients = [np.ravel(c).astype(float) for c in v4_coefficients(doses, False, **params)]
+    t = np.linspace(0, T_END, N_TIMEPOINTS)
+    y0 = np.tile([1.0, 0.1], n)
+    label = f"run_batch {n}{' stiff' if stiff else ''}"
+    for variant, (jacobian, generated) in VARIANTS.items():
+        func, args = ((buffered_dynamics_v4_batch(*coefficients), ()) if generated
+                      else (system_dynamics_v4_batch, tuple(coefficients)))
+        Dfun = banded_jacobian_v4_batch(coefficients[1]) if jacobian else None
+        start = time.perf_counter()
+        _, info = odeint(func, y0, t, args=args, Dfun=Dfun, ml=1, mu=1, mxstep=50000,
+                         full_output=True)
+        _row(label, variant, info['nfe'][-1], info['nje'][-1], time.perf_counter() - start)
+
+
+@contextlib.contextmanager
+def counting(module, name):
+    """Count calls to ``module.name`` for the duration of the block."""
+    original = getattr(module, name)
+    calls = [0]
+
+    def wrapper(*args, **kwargs):
+        calls[0] += 1
+        return original(*args, **kwargs)
+
+    setattr(module, name, wrapper)
+    try:
+        yield calls
+    finally:
+        setattr(module, name, original)
+
+
+def pk_solve_ivp(days=28):
+    """``simulate_pk`` (``solve_ivp``) over ``days`` of daily oral dosing."""
+    regimen = pk.repeated_dosing(30.0, interval=24.0)
+    for method in ('LSODA', 'BDF', 'Radau'):
+        for variant, jacobian in (('fd', False), ('exact', True)):
+            with counting(pk, 'system_dynamics_v4_pk') as calls:
+                start = time.perf_counter()
+                _, _, info = pk.simulate_pk(regimen, 24.0 * days, cell_type='Cancer (Vulnerable)',
+                                            method=method, jacobian=jacobian)
+                seconds = time.perf_counter() - start
+            _row(f'simulate_pk {days} d {method}', variant, calls[0], info['njev'], seconds)
+
+
+def main():
+    cache.configure(enabled=False)
+    print(f"{'case':<34} {'variant':<10} {'RHS calls':>9} {'nje':>6} {'wall ms':>10}")
+    scalar_odeint()
+    batch_odeint()
+    batch_odeint(stiff=True)
+    pk_solve_ivp()
+
+
+if __name__ == '__main__':
+    main()
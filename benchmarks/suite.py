@@ -0,0 +1,291 @@
+"""Benchmark suite: wall time, RHS evaluations and peak memory, kept as JSON history.
+
+Cases cover every model version and solver path, kept apart from plotting
+and file I/O:
+
+- ``single/*``: one scenario of each script (v1-v4) through its
+  ``run_simulation_v*`` solver, ``odeint`` and closed form for v3/v4.
+- ``sweep/v4-*``: the 2 x 4 cell type x dose sweep of
+  ``simulation_v4_honest.py``.
+- ``synthetic/*-N``: N = 10^3 to 10^5 v4 scenarios with random doses and
+  cancer phenotypes from the Monte Carlo priors, through ``run_batch``
+  (stacked ``odeint``) and ``run_analytic``.
+
+Each case is timed ``--repeats`` times, short cases looped so that one
+sample lasts at least 0.1 s, after a warm-up run (the 10^5 cases run once,
+without warm-up), with the result cache disabled; the minimum is the figure
+compared. The RHS count and peak memory come from one more
+run: every ``odeint`` call is made with ``full_output`` and its ``nfe``
+summed, which includes RHS calls spent differencing Jacobians (0 for the
+closed form), and peak memory is the ``tracemalloc`` peak above the start
+of the run, numpy buffers included. That run is untimed because tracing
+slows allocation.
+
+    python benchmarks/suite.py list
+    python benchmarks/suite.py run [--filter synthetic] [--history benchmarks/history.json]
+    python benchmarks/suite.py compare [--baseline -2] [--current -1] [--threshold 0.1]
+
+``run`` appends one record (commit, versions, host, per-case results) to
+the history file. ``compare`` lines up two records, by history position or
+commit prefix, and flags every case whose minimum wall time, RHS count or
+peak memory grew by more than ``--threshold``; it exits with status 1 if
+any did, so it can gate CI. Wall times are only comparable between
+records from the same host.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import scipy
+from scipy.integrate import odeint
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from cbd_model import analytic, batch, cache, solvers  # noqa: E402
+from cbd_model.montecarlo import PHENOTYPE_PRIORS, sample_parameters  # noqa: E402
+from cbd_model.sweeps import sweep_v4  # noqa: E402
+
+HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history.json')
+DEFAULT_REPEATS = 5
+DEFAULT_THRESHOLD = 0.10
+SYNTHETIC_SIZES = (10 ** 3, 10 ** 4, 10 ** 5)
+# Short cases are looped so one timing sample lasts at least this long
+MIN_SAMPLE_S = 0.1
+# Cases at least this large run once; a single run already takes seconds
+SINGLE_RUN_SCENARIOS = 10 ** 5
+METRICS = ('wall_min_s', 'rhs_evals', 'peak_mb')
+
+
+@contextlib.contextmanager
+def counting_odeint(*modules):
+    """Sum ``odeint``'s ``nfe`` over every call made from ``modules`` in the block."""
+    calls = {'nfe': 0}
+
+    def wrapper(*args, full_output=False, **kwargs):
+        sol, info = odeint(*args, full_output=True, **kwargs)
+        calls['nfe'] += int(info['nfe'][-1])
+        return (sol, info) if full_output else sol
+
+    for module in modules:
+        module.odeint = wrapper
+    try:
+        yield calls
+    finally:
+        for module in modules:
+            module.odeint = odeint
+
+
+def _synthetic(n, seed=0):
+    """Doses and cancer phenotypes for ``n`` random v4 scenarios."""
+    rng = np.random.default_rng(seed)
+    params = sample_parameters(PHENOTYPE_PRIORS['Cancer (Vulnerable)'], n, rng)
+    return rng.uniform(0.0, 100.0, n), params
+
+
+def cases():
+    """Benchmark name -> ``(n_scenarios, function)``; each function runs the case once."""
+    registry = {
+        'single/v1': (1, lambda: solvers.run_simulation_v1(20, False)),
+        'single/v2': (1, lambda: solvers.run_simulation_v2(20, False, 0.4)),
+    }
+    for model in ('v3', 'v4'):
+        run = solvers.RUNNERS[model]
+        for method in ('odeint', 'analytic'):
+            registry[f'single/{model}-{method}'] = (
+                1, lambda run=run, method=method: run(20, False, 'Cancer (Vulnerable)',
+                                                      method=method))
+    for method in ('odeint', 'analytic'):
+        registry[f'sweep/v4-{method}'] = (8, lambda method=method: sweep_v4(method=method))
+    for n in SYNTHETIC_SIZES:
+        doses, params = _synthetic(n)
+        registry[f'synthetic/batch-{n}'] = (
+            n, lambda doses=doses, params=params: batch.run_batch(doses, **params))
+        registry[f'synthetic/analytic-{n}'] = (
+            n, lambda doses=doses, params=params: analytic.run_analytic(doses, **params))
+    return registry
+
+
+def measure(function, n_scenarios, repeats=DEFAULT_REPEATS):
+    """Wall times over ``repeats`` samples, then RHS count and peak memory from one traced run."""
+    if n_scenarios >= SINGLE_RUN_SCENARIOS:
+        repeats, number = 1, 1
+    else:
+        # Warm-up (lazy imports, first-call allocations) that also sizes the
+        # inner loop so each sample takes at least MIN_SAMPLE_S, as timeit does
+        start = time.perf_counter()
+        function()
+        number = max(1, int(np.ceil(MIN_SAMPLE_S / (time.perf_counter() - start))))
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        times.append((time.perf_counter() - start) / number)
+    with counting_odeint(solvers, batch) as calls:
+        tracemalloc.start()
+        try:
+            function()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {
+        'scenarios': n_scenarios,
+        'repeats': repeats,
+        'loops': number,
+        'wall_min_s': min(times),
+        'wall_median_s': float(np.median(times)),
+        'rhs_evals': calls['nfe'],
+        'peak_mb': peak / 2 ** 20,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path=HISTORY):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def run_suite(pattern='', repeats=DEFAULT_REPEATS, history=HISTORY):
+    """Run the cases whose name contains ``pattern``; append and return the record."""
+    cache.configure(enabled=False)
+    selected = {name: case for name, case in cases().items() if pattern in name}
+    if not selected:
+        raise ValueError(f"No benchmark matches {pattern!r}; see 'list'")
+    record = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'host': platform.node(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'results': {},
+    }
+    print(f"{'case':<26} {'scenarios':>9} {'min ms':>10} {'median ms':>10} "
+          f"{'RHS calls':>10} {'peak MB':>9}")
+    for name, (n_scenarios, function) in selected.items():
+        result = measure(function, n_scenarios, repeats)
+        record['results'][name] = result
+        print(f"{name:<26} {n_scenarios:>9} {result['wall_min_s'] * 1e3:>10.2f} "
+              f"{result['wall_median_s'] * 1e3:>10.2f} {result['rhs_evals']:>10} "
+              f"{result['peak_mb']:>9.2f}")
+    if history:
+        records = load_history(history)
+        records.append(record)
+        with open(history, 'w') as f:
+            json.dump(records, f, indent=1)
+    return record
+
+
+def _find(records, ref):
+    try:
+        return records[int(ref)]
+    except ValueError:
+        matches = [r for r in records if (r['commit'] or '').startswith(ref)]
+        if not matches:
+            raise ValueError(f"No record for commit {ref!r} in the history") from None
+        return matches[-1]
+    except IndexError:
+        raise ValueError(f"History has {len(records)} records; no record {ref}") from None
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Per-case ratios current / baseline; returns ``(rows, regressions)``.
+
+    A case regresses when any of ``METRICS`` grew by more than ``threshold``
+    (0.1: 10 %). Cases missing from either record are skipped.
+    """
+    rows, regressions = [], []
+    for name, now in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        ratios = {}
+        for metric in METRICS:
+            if before[metric] > 0:
+                ratios[metric] = now[metric] / before[metric]
+            else:
+                ratios[metric] = 1.0 if now[metric] == before[metric] else np.inf
+        worse = [metric for metric, ratio in ratios.items() if ratio > 1.0 + threshold]
+        rows.append((name, ratios, worse))
+        if worse:
+            regressions.append(name)
+    return rows, regressions
+
+
+def _print_comparison(baseline, current, threshold):
+    rows, regressions = compare(baseline, current, threshold)
+    print(f"baseline {(baseline['commit'] or '?')[:10]} {baseline['timestamp']} "
+          f"({baseline['host']})")
+    print(f"current  {(current['commit'] or '?')[:10]} {current['timestamp']} "
+          f"({current['host']})")
+    if baseline['host'] != current['host']:
+        print('warning: records come from different hosts; wall times are not comparable')
+    print(f"{'case':<26} {'wall':>8} {'RHS':>8} {'memory':>8}")
+    for name, ratios, worse in rows:
+        flag = f"  REGRESSION ({', '.join(worse)})" if worse else ''
+        print(f"{name:<26} " + ' '.join(f'{ratios[m]:>7.2f}x' for m in METRICS) + flag)
+    print(f"{len(regressions)} of {len(rows)} cases regressed beyond {threshold:.0%}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python benchmarks/suite.py',
+                                     description='Benchmark the CBD model solvers.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='list the benchmark cases')
+
+    run = commands.add_parser('run', help='run benchmarks and append them to the history')
+    run.add_argument('--filter', default='', help='only cases whose name contains this')
+    run.add_argument('--repeats', type=int, default=DEFAULT_REPEATS)
+    run.add_argument('--history', default=HISTORY, help='JSON history file')
+    run.add_argument('--no-save', action='store_true', help='do not write the history')
+
+    comparison = commands.add_parser('compare', help='flag regressions between two runs')
+    comparison.add_argument('--baseline', default='-2',
+                            help='history position or commit prefix (default: -2)')
+    comparison.add_argument('--current', default='-1',
+                            help='history position or commit prefix (default: -1)')
+    comparison.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help='relative growth that counts as a regression (default: 0.1)')
+    comparison.add_argument('--history', default=HISTORY, help='JSON history file')
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        for name, (n_scenarios, _) in cases().items():
+            print(f'{name:<26} {n_scenarios:>9} scenarios')
+        return 0
+    if args.command == 'run':
+        if not any(args.filter in name for name in cases()):
+            parser.error(f"no benchmark matches {args.filter!r}; see 'list'")
+        run_suite(args.filter, args.repeats, None if args.no_save else args.history)
+        return 0
+    records = load_history(args.history)
+    try:
+        baseline, current = _find(records, args.baseline), _find(records, args.current)
+    except ValueError as error:
+        parser.error(str(error))
+    return 1 if _print_comparison(baseline, current, args.threshold) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
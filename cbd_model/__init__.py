@@ -0,0 +1,65 @@
+"""Importable core of the CBD two-pathway model.
+
+Model equations live in ``models``, per-scenario solvers in ``solvers``, the
+scripts' named experiments in ``sweeps`` and their figures in ``plotting``;
+``python -m cbd_model`` runs them from the command line. The remaining
+modules hold the machinery for running the v4 model at scale.
+
+Importing the package is cheap: the public names below are resolved on first
+access, so numpy, scipy and matplotlib load only when something needs them.
+"""
+import importlib
+
+from .params import PHENOTYPES, phenotype
+
+_EXPORTS = {
+    'analytic_collapse_time': 'analytic',
+    'run_analytic': 'analytic',
+    'final_outcomes': 'batch',
+    'inhibition_factor': 'batch',
+    'run_batch': 'batch',
+    'scenario_grid': 'batch',
+    'calibrate': 'calibration',
+    'predict': 'calibration',
+    'run_checkerboard': 'combination',
+    'run_event_driven': 'events',
+    'sweep_event_driven': 'events',
+    'run_grid_scan': 'gridscan',
+    'system_dynamics_v1': 'models',
+    'system_dynamics_v2': 'models',
+    'system_dynamics_v3': 'models',
+    'system_dynamics_v4': 'models',
+    'run_monte_carlo': 'montecarlo',
+    'run_population': 'population',
+    'repeated_dosing': 'pk',
+    'simulate_pk': 'pk',
+    'run_morris': 'sensitivity',
+    'run_sobol': 'sensitivity',
+    'run_spheroid': 'spheroid',
+    'run_sde': 'stochastic',
+    'run_simulation_v1': 'solvers',
+    'run_simulation_v2': 'solvers',
+    'run_simulation_v3': 'solvers',
+    'run_simulation_v4': 'solvers',
+    'open_store': 'store',
+    'read_decimated': 'store',
+    'write_sweep': 'store',
+    'continuation': 'steadystate',
+    'equilibrium': 'steadystate',
+    'threshold_dose': 'steadystate',
+    'SWEEPS': 'sweeps',
+}
+
+__all__ = sorted(['PHENOTYPES', 'phenotype', *_EXPORTS])
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
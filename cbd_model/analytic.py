@@ -0,0 +1,291 @@
+"""Closed-form evaluation of the v3/v4 models at constant dose.
+
+With ``cbd_conc`` fixed, the ROS and Psi equations are linear with constant
+coefficients:
+
+    dROS/dt = g - k * ROS
+    dPsi/dt = D - a * ROS - b * Psi
+
+so ROS relaxes exponentially to g/k and Psi is a constant plus two decaying
+exponentials. Both are evaluated here in a form that stays finite when k == b.
+ROS is monotone and Psi has at most one turning point, so each threshold has
+at most two crossings, found by safeguarded Newton iteration on monotone
+pieces to machine precision. Apop is piecewise linear between those crossings.
+
+No numerical integration is involved; this is the reference solution the
+numerical solvers are checked against.
+"""
+import numpy as np
+
+from .batch import default_time_grid, resolve_phenotype, v4_coefficients
+from .cache import cached
+from .models import blocker_factor
+from .params import (
+    APOP_RATE, BLOCKER_INHIBITION, EC50_TRPV1, INITIAL_STATE, Kd_VDAC, PROTECTION_MAX,
+    PSI_DECAY, PSI_DEATH_THRESHOLD, ROS_DAMAGE, ROS_TOXIC_THRESHOLD, T_END,
+    V3_BLOCKER_INHIBITION, V3_PROTECTION_RESPIRATION, V3_PROTECTION_SCAVENGING,
+    V3_PSI_DEATH_THRESHOLD, V3_ROS_BASAL_GENERATION, V3_ROS_DAMAGE,
+    V3_ROS_LEAK_YIELD, phenotype, v3_phenotype,
+)
+
+# Cap on Psi root iterations; bisection alone would need 52
+_ROOT_STEPS = 52
+# Relative step size at which the Psi root iteration stops
+_ROOT_XTOL = 1e-13
+
+
+def v3_coefficients(cbd_conc, blocker, resilience, scavenging_capacity, g_max,
+                    respiration_max, kd_vdac=Kd_VDAC, ec50_trpv1=EC50_TRPV1):
+    """``(ros_generation, ros_removal_rate, psi_drive)`` for the v3 model."""
+    cbd_conc = np.asarray(cbd_conc, dtype=float)
+    inhibition_factor = np.asarray(blocker_factor(blocker, V3_BLOCKER_INHIBITION), dtype=float)
+    protection_signal = (cbd_conc / (ec50_trpv1 + cbd_conc)) * PROTECTION_MAX
+    effective_binding = inhibition_factor * (cbd_conc**2 / (kd_vdac**2 + cbd_conc**2))
+    vdac_leak = np.asarray(g_max, dtype=float) * effective_binding
+
+    ros_generation = V3_ROS_BASAL_GENERATION + vdac_leak * V3_ROS_LEAK_YIELD
+    ros_removal_rate = (np.asarray(scavenging_capacity, dtype=float)
+                        + protection_signal * V3_PROTECTION_SCAVENGING)
+    respiration = (np.asarray(respiration_max, dtype=float)
+                   + protection_signal * V3_PROTECTION_RESPIRATION
+                   - (1.0 - np.asarray(resilience, dtype=float)))
+    psi_drive = respiration - vdac_leak
+    return np.broadcast_arrays(ros_generation, ros_removal_rate, psi_drive)
+
+
+# Per-version coefficient builder, phenotype table and linear/trigger constants
+MODELS = {
+    'v3': {
+        'coefficients': v3_coefficients,
+        'phenotype': v3_phenotype,
+        'ros_damage': V3_ROS_DAMAGE,
+        'psi_decay': PSI_DECAY,
+        'psi_threshold': V3_PSI_DEATH_THRESHOLD,
+        'ros_threshold': ROS_TOXIC_THRESHOLD,
+        'apop_rate': APOP_RATE,
+        'blocker_inhibition': V3_BLOCKER_INHIBITION,
+    },
+    'v4': {
+        'coefficients': v4_coefficients,
+        'phenotype': phenotype,
+        'ros_damage': ROS_DAMAGE,
+        'psi_decay': PSI_DECAY,
+        'psi_threshold': PSI_DEATH_THRESHOLD,
+        'ros_threshold': ROS_TOXIC_THRESHOLD,
+        'apop_rate': APOP_RATE,
+        'blocker_inhibition': BLOCKER_INHIBITION,
+    },
+}
+
+
+def _phi(rate, t):
+    """(1 - exp(-rate * t)) / rate, continuous through rate == 0."""
+    x = rate * t
+    small = np.abs(x) < 1e-10
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(small, t * (1.0 - 0.5 * x), -np.expm1(-x) / rate)
+
+
+def closed_form_ros(tau, g, k, ros0):
+    """ROS at elapsed times ``tau``: relaxation towards g / k."""
+    return ros0 * np.exp(-k * tau) + g * _phi(k, tau)
+
+
+def closed_form_psi(tau, g, k, D, a, b, psi0, ros0):
+    """Psi at elapsed times ``tau``; finite through k == b.
+
+    Requires ``k > 0`` (non-zero ROS removal), which holds for any positive
+    scavenging capacity.
+    """
+    ros_star = g / k
+    decay = np.exp(-b * tau)
+    return (psi0 * decay + (D - a * ros_star) * _phi(b, tau)
+            - a * (ros0 - ros_star) * decay * _phi(k - b, tau))
+
+
+def closed_form_psi_ros(tau, g, k, D, a, b, psi0, ros0):
+    """Psi and ROS at elapsed times ``tau`` for broadcastable coefficients."""
+    return closed_form_psi(tau, g, k, D, a, b, psi0, ros0), closed_form_ros(tau, g, k, ros0)
+
+
+def _psi_turning_point(g, k, D, a, b, psi0, ros0):
+    """Elapsed time where dPsi/dt == 0, or +inf when Psi is monotone.
+
+    dPsi/dt = exp(-b t) * (u0 - a * r0 * phi(k - b, t)) with u0 and r0 the
+    initial slopes of Psi and ROS; phi is increasing in t, so there is at most
+    one zero, at phi(k - b, t) == u0 / (a * r0).
+    """
+    u0 = D - a * ros0 - b * psi0
+    r0 = g - k * ros0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        q = u0 / (a * r0)
+        x = k - b
+        small = np.abs(x * q) < 1e-10
+        t_turn = np.where(small, q, -np.log1p(-x * q) / x)
+    valid = np.isfinite(t_turn) & (q > 0) & (t_turn > 0)
+    return np.where(valid, t_turn, np.inf)
+
+
+def closed_form_dpsi(tau, g, k, D, a, b, psi0, ros0):
+    """dPsi/dt at elapsed times ``tau``: exp(-b tau) (u0 - a r0 phi(k - b, tau))."""
+    u0 = D - a * ros0 - b * psi0
+    r0 = g - k * ros0
+    return np.exp(-b * tau) * (u0 - a * r0 * _phi(k - b, tau))
+
+
+def _psi_root(lo, hi, g, k, D, a, b, psi0, ros0, threshold):
+    """Crossing of Psi == threshold on monotone pieces [lo, hi]; nan where none.
+
+    Safeguarded Newton (Newton steps using the closed-form dPsi/dt, falling
+    back to the secant through the shrinking bracket, then to bisection,
+    whenever a step would leave it) runs only on the scenarios whose piece
+    brackets a crossing, each until its step falls below a few ulps.
+    """
+    coefficients = np.broadcast_arrays(g, k, D, a, b, psi0, ros0)
+    gap_lo = closed_form_psi(lo, *coefficients) - threshold
+    gap_hi = closed_form_psi(hi, *coefficients) - threshold
+    root = np.full(lo.shape, np.nan)
+    rows = np.nonzero((gap_lo > 0) != (gap_hi > 0))[0]
+    coefficients = [c[rows] for c in coefficients]
+    lo, hi, rising = lo[rows], hi[rows], gap_lo[rows] <= 0
+    gap_lo, gap_hi = gap_lo[rows], gap_hi[rows]
+    x = 0.5 * (lo + hi)
+    for _ in range(_ROOT_STEPS):
+        if rows.size == 0:
+            break
+        gap = closed_form_psi(x, *coefficients) - threshold
+        below = (gap <= 0) == rising
+        lo, gap_lo = np.where(below, x, lo), np.where(below, gap, gap_lo)
+        hi, gap_hi = np.where(below, hi, x), np.where(below, gap_hi, gap)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            new = x - gap / closed_form_dpsi(x, *coefficients)
+            secant = lo - gap_lo * (hi - lo) / (gap_hi - gap_lo)
+        # Newton overshoots on the far side of a convex/concave piece; the
+        # secant through the bracket then lands on the near side
+        new = np.where((new >= lo) & (new <= hi), new,
+                       np.where((secant >= lo) & (secant <= hi), secant, 0.5 * (lo + hi)))
+        done = (np.abs(new - x) <= _ROOT_XTOL * np.maximum(np.abs(x), 1.0)) | (gap == 0)
+        root[rows[done]] = np.where(gap[done] == 0, x[done], new[done])
+        keep = ~done
+        rows, x, rising = rows[keep], new[keep], rising[keep]
+        lo, hi, gap_lo, gap_hi = lo[keep], hi[keep], gap_lo[keep], gap_hi[keep]
+        coefficients = [c[keep] for c in coefficients]
+    root[rows] = x
+    return root
+
+
+def _ros_root(g, k, ros0, threshold):
+    """Exact crossing time of ROS == threshold; nan if ROS never reaches it."""
+    ros_star = g / k
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = (threshold - ros_star) / (ros0 - ros_star)
+        root = -np.log(ratio) / k
+    return np.where((ratio > 0) & (ratio < 1), root, np.nan)
+
+
+def trigger_segments(t_end, g, k, D, a, b, psi0, ros0, psi_threshold, ros_threshold):
+    """Breakpoints (N, 5) and trigger state (N, 4) of the Apop switch on [0, t_end].
+
+    Segment j runs from ``breaks[:, j]`` to ``breaks[:, j + 1]`` and the Apop
+    trigger is constant on it, given by ``on[:, j]``.
+    """
+    zero = np.zeros(np.broadcast(g, k, D, psi0, ros0).shape)
+    end = zero + t_end
+    turn = np.minimum(_psi_turning_point(g, k, D, a, b, psi0, ros0), end)
+    roots = [
+        _psi_root(zero, turn, g, k, D, a, b, psi0, ros0, psi_threshold),
+        _psi_root(turn, end, g, k, D, a, b, psi0, ros0, psi_threshold),
+        _ros_root(g, k, ros0, ros_threshold) + zero,
+    ]
+    roots = [np.where(np.isnan(r) | (r > t_end), end, r) for r in roots]
+    breaks = np.sort(np.stack([zero] + roots + [end], axis=-1), axis=-1)
+    mids = 0.5 * (breaks[..., 1:] + breaks[..., :-1])
+    args = [np.expand_dims(v, -1) for v in (g, k, D, a, b, psi0, ros0)]
+    psi_mid, ros_mid = closed_form_psi_ros(mids, *args)
+    on = (psi_mid < psi_threshold) | (ros_mid > ros_threshold)
+    return breaks, on
+
+
+def _prepare(model, cbd_conc, blocker, cell_type, initial_state, kd_vdac, ec50_trpv1,
+             **given):
+    spec = MODELS[model]
+    given = resolve_phenotype(cell_type, lookup=spec['phenotype'], **given)
+    g, k, D = spec['coefficients'](cbd_conc, blocker, kd_vdac=kd_vdac,
+                                   ec50_trpv1=ec50_trpv1, **given)
+    n = g.size
+    y0 = np.broadcast_to(np.asarray(initial_state, dtype=float), (n, 3))
+    linear = (g.ravel(), k.ravel(), D.ravel(), spec['ros_damage'], spec['psi_decay'],
+              y0[:, 0], y0[:, 2])
+    return spec, linear, y0[:, 1]
+
+
+@cached('analytic', ignore=('use_cache',), bypass=('use_cache',))
+def run_analytic(cbd_conc, blocker=False, resilience=None, scavenging_capacity=None,
+                 g_max=None, respiration_max=None, cell_type=None, t=None,
+                 initial_state=INITIAL_STATE, model='v4', kd_vdac=Kd_VDAC,
+                 ec50_trpv1=EC50_TRPV1, use_cache=True):
+    """Exact ``(t, sol)`` for N constant-dose scenarios without integration.
+
+    Arguments broadcast exactly as in ``run_batch`` and ``sol`` has the same
+    (N, len(t), 3) layout. The initial state is taken at ``t[0]``. ``model``
+    selects the 'v3' or 'v4' calibration; ``kd_vdac`` and ``ec50_trpv1``
+    override the binding constants and broadcast like the other parameters.
+    ``use_cache=False`` solves without reading or writing the result cache.
+    """
+    t = default_time_grid() if t is None else np.asarray(t, dtype=float)
+    spec, linear, apop0 = _prepare(model, cbd_conc, blocker, cell_type, initial_state,
+                                   kd_vdac, ec50_trpv1,
+                                   resilience=resilience,
+                                   scavenging_capacity=scavenging_capacity,
+                                   g_max=g_max, respiration_max=respiration_max)
+    tau = t - t[0]
+    column = [np.asarray(v, dtype=float)[..., None] if np.ndim(v) else v for v in linear]
+    psi, ros = closed_form_psi_ros(tau, *column)
+
+    breaks, on = trigger_segments(tau[-1], *linear, spec['psi_threshold'],
+                                  spec['ros_threshold'])
+    # Apop is piecewise linear: accumulated triggered time up to the start of
+    # the segment containing each tau, plus the triggered part of that segment
+    triggered = np.concatenate([np.zeros((on.shape[0], 1)),
+                                np.cumsum(on * np.diff(breaks, axis=-1), axis=-1)], axis=-1)
+    segment = (tau[None, :, None] >= breaks[:, None, 1:-1]).sum(axis=-1)
+    rows = np.arange(on.shape[0])[:, None]
+    start = breaks[rows, segment]
+    triggered_time = triggered[rows, segment] + on[rows, segment] * (tau[None, :] - start)
+    apop = apop0[:, None] + spec['apop_rate'] * triggered_time
+
+    sol = np.stack([psi, apop, ros], axis=-1)
+    return t, sol
+
+
+def analytic_collapse_time(cbd_conc, blocker=False, resilience=None,
+                           scavenging_capacity=None, g_max=None, respiration_max=None,
+                           cell_type=None, t_end=T_END, initial_state=INITIAL_STATE,
+                           model='v4', kd_vdac=Kd_VDAC, ec50_trpv1=EC50_TRPV1):
+    """First time the Apop trigger switches on, or nan if not before ``t_end``."""
+    return analytic_final_state(cbd_conc, blocker, resilience, scavenging_capacity, g_max,
+                                respiration_max, cell_type, t_end, initial_state, model,
+                                kd_vdac, ec50_trpv1)[1]
+
+
+def analytic_final_state(cbd_conc, blocker=False, resilience=None, scavenging_capacity=None,
+                         g_max=None, respiration_max=None, cell_type=None, t_end=T_END,
+                         initial_state=INITIAL_STATE, model='v4', kd_vdac=Kd_VDAC,
+                         ec50_trpv1=EC50_TRPV1):
+    """Final ``[Psi, Apop, ROS]`` (N, 3) at ``t_end`` and the collapse time (N,).
+
+    Solves the crossings once and skips the full trajectory, for sweeps that
+    only need the outcome of each scenario.
+    """
+    spec, linear, apop0 = _prepare(model, cbd_conc, blocker, cell_type, initial_state,
+                                   kd_vdac, ec50_trpv1,
+                                   resilience=resilience,
+                                   scavenging_capacity=scavenging_capacity,
+                                   g_max=g_max, respiration_max=respiration_max)
+    breaks, on = trigger_segments(t_end, *linear, spec['psi_threshold'],
+                                  spec['ros_threshold'])
+    psi, ros = closed_form_psi_ros(t_end, *linear)
+    apop = apop0 + spec['apop_rate'] * (on * np.diff(breaks, axis=-1)).sum(axis=-1)
+    starts = np.where(on, breaks[:, :-1], np.inf).min(axis=-1)
+    collapse_time = np.where(np.isfinite(starts), starts, np.nan)
+    return np.stack([psi, apop, ros], axis=-1), collapse_time
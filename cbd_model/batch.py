@@ -0,0 +1,324 @@
+"""Batched, vectorized integration of the v4 resilience model.
+
+``run_simulation`` in ``simulation_v4_honest.py`` solves one (dose, cell_type,
+blocker) scenario per ``odeint`` call, paying Python and solver start-up
+overhead for every scenario. Here N scenarios are stacked into a single state
+vector laid out per scenario as [Psi_0, ROS_0, Psi_1, ROS_1, ...] and advanced
+by one NumPy-vectorized RHS. Scenarios never interact, so the Jacobian is
+block-diagonal with 2x2 blocks; passing ``ml=mu=1`` lets LSODA treat it as
+banded, keeping any stiff-mode Jacobian estimate at three RHS calls regardless
+of N. Apop is recovered afterwards from the threshold crossings, since its
+trigger would otherwise force the shared step down at every scenario's
+crossing.
+
+Accuracy: against the per-scenario v4 ``odeint`` output over doses 0-100 uM,
+both phenotypes, with and without blocker, the batched trajectories agree to
+within 1e-5 absolute in Psi and ROS and 1e-4 absolute in Apop.
+"""
+import numpy as np
+from scipy.integrate import odeint
+
+from . import trace
+from .cache import cached
+from .models import blocker_factor
+from .params import (
+    APOP_RATE, BLOCKER_HILL, BLOCKER_IC50, BLOCKER_INHIBITION, EC50_TRPV1, INITIAL_STATE, Kd_VDAC,
+    N_TIMEPOINTS, PHENOTYPE_KEYS, PROTECTION_MAX, PROTECTION_RESPIRATION,
+    PSI_DEATH_THRESHOLD, PSI_DECAY, ROS_BASAL_GENERATION, ROS_DAMAGE,
+    ROS_LEAK_YIELD, ROS_TOXIC_THRESHOLD, T_END, phenotype,
+)
+
+DEFAULT_CHUNK_SIZE = 4096
+
+
+def default_time_grid():
+    """The v4 observation grid: 400 points on [0, 50]."""
+    return np.linspace(0, T_END, N_TIMEPOINTS)
+
+
+def scenario_grid(doses, cell_types=('Healthy', 'Cancer (Vulnerable)'), blockers=(False,)):
+    """Cartesian product of doses x cell_types x blockers as flat arrays.
+
+    Returns a dict with ``cbd_conc``, ``blocker``, ``cell_type`` and the four
+    phenotype parameter arrays, ordered cell_type-major then dose then blocker,
+    ready to be passed to ``run_batch(**grid)``.
+    """
+    rows = [(cell_type, dose, blocker)
+            for cell_type in cell_types for dose in doses for blocker in blockers]
+    grid = {
+        'cbd_conc': np.array([r[1] for r in rows], dtype=float),
+        'blocker': np.array([r[2] for r in rows], dtype=bool),
+        'cell_type': np.array([r[0] for r in rows], dtype=object),
+    }
+    for key in PHENOTYPE_KEYS:
+        grid[key] = np.array([phenotype(r[0])[key] for r in rows], dtype=float)
+    return grid
+
+
+def resolve_phenotype(cell_type=None, lookup=phenotype, **given):
+    """Fill phenotype parameters left as None from ``cell_type`` labels.
+
+    ``cell_type`` may be a single label or an array of labels (default
+    "Healthy"); ``lookup`` maps a label to its parameter dict.
+    """
+    if any(value is None for value in given.values()):
+        labels = np.atleast_1d(np.asarray('Healthy' if cell_type is None else cell_type,
+                                          dtype=object))
+        for key, value in given.items():
+            if value is None:
+                given[key] = np.array([lookup(label)[key] for label in labels])
+    return given
+
+
+def scalar_phenotype(cell_type=None, **given):
+    """``resolve_phenotype`` for the single-scenario solvers, as plain floats.
+
+    Raises ValueError when ``cell_type`` or a parameter holds more than one
+    value rather than keeping only the first.
+    """
+    given = resolve_phenotype(cell_type, **given)
+    for key, value in given.items():
+        if np.size(value) != 1:
+            raise ValueError(f"{key} must be a single value for one scenario, got "
+                             f"{np.size(value)}; the batch solvers take arrays")
+    return {key: float(np.ravel(value)[0]) for key, value in given.items()}
+
+
+def inhibition_factor(blocker_conc, ic50=BLOCKER_IC50, hill=BLOCKER_HILL,
+                      max_inhibition=1.0 - BLOCKER_INHIBITION):
+    """Fraction of VDAC binding left at blocker concentration ``blocker_conc`` (uM).
+
+    Hill inhibition, ``1 - max_inhibition * B^h / (ic50^h + B^h)``; pass the
+    result as ``blocker``. The default ``max_inhibition`` makes a saturating
+    dose equal to the v4 boolean blocker (use ``1 - V3_BLOCKER_INHIBITION``
+    for v3). Arguments broadcast.
+    """
+    blocker_conc = np.asarray(blocker_conc, dtype=float)
+    occupancy = blocker_conc**hill / (np.asarray(ic50, dtype=float)**hill + blocker_conc**hill)
+    return 1.0 - max_inhibition * occupancy
+
+
+def vdac_binding(cbd_conc, blocker, kd_vdac=Kd_VDAC):
+    """Effective VDAC1 binding: Hill occupancy times the blocker's inhibition factor."""
+    cbd_conc = np.asarray(cbd_conc, dtype=float)
+    factor = np.asarray(blocker_factor(blocker, BLOCKER_INHIBITION), dtype=float)
+    return factor * (cbd_conc**2 / (kd_vdac**2 + cbd_conc**2))
+
+
+def v4_coefficients(cbd_conc, blocker, resilience, scavenging_capacity, g_max,
+                    respiration_max, kd_vdac=Kd_VDAC, ec50_trpv1=EC50_TRPV1):
+    """Per-scenario constant terms of the v4 equations at a fixed dose.
+
+    At constant ``cbd_conc`` the v4 system reduces to
+        dROS/dt = ros_generation - ros_removal_rate * ROS
+        dPsi/dt = psi_drive - ROS_DAMAGE * ROS - PSI_DECAY * Psi
+    and this returns ``(ros_generation, ros_removal_rate, psi_drive)`` as
+    broadcast float arrays.
+
+    ``blocker`` may be boolean (VBIT-4 present/absent) or a float inhibition
+    factor in [0, 1] applied directly to VDAC binding, such as
+    ``inhibition_factor`` of a blocker concentration. ``kd_vdac`` and
+    ``ec50_trpv1`` default to the calibrated constants and may be arrays.
+    """
+    cbd_conc = np.asarray(cbd_conc, dtype=float)
+    vdac_leak = np.asarray(g_max, dtype=float) * vdac_binding(cbd_conc, blocker, kd_vdac)
+    protection_signal = (cbd_conc / (ec50_trpv1 + cbd_conc)) * PROTECTION_MAX
+
+    ros_generation = ROS_BASAL_GENERATION + vdac_leak * ROS_LEAK_YIELD
+    ros_removal_rate = np.asarray(scavenging_capacity, dtype=float) + protection_signal
+    respiration = (np.asarray(respiration_max, dtype=float)
+                   + protection_signal * PROTECTION_RESPIRATION
+                   - (1.0 - np.asarray(resilience, dtype=float)))
+    psi_drive = respiration - vdac_leak
+    return np.broadcast_arrays(ros_generation, ros_removal_rate, psi_drive)
+
+
+def system_dynamics_v4_batch(y, t, ros_generation, ros_removal_rate, psi_drive):
+    """Vectorized Psi/ROS RHS over a flat interleaved state [Psi_0, ROS_0, ...].
+
+    Apop is left out: it never feeds back into Psi or ROS, so the stacked
+    system stays smooth and the step size is not dragged down by every
+    scenario's trigger crossing. See ``apoptosis_from_trajectory``.
+    """
+    state = y.reshape(-1, 2)
+    Psi, ROS = state[:, 0], state[:, 1]
+    dydt = np.empty_like(state)
+    dydt[:, 0] = psi_drive - ROS_DAMAGE * ROS - PSI_DECAY * Psi
+    dydt[:, 1] = ros_generation - ros_removal_rate * ROS
+    return dydt.ravel()
+
+
+def buffered_dynamics_v4_batch(ros_generation, ros_removal_rate, psi_drive):
+    """Allocation-free ``system_dynamics_v4_batch`` for fixed coefficients.
+
+    Returns ``rhs(y, t)`` that fills and returns one preallocated array using
+    the same operations in the same order, so results are bitwise identical.
+    The array is reused between calls, which suits ``odeint`` only.
+    """
+    n = np.size(psi_drive)
+    dydt = np.empty((n, 2))
+    scratch = np.empty(n)
+    psi_out, ros_out = dydt[:, 0], dydt[:, 1]
+    flat = dydt.ravel()
+
+    def rhs(y, t):
+        state = y.reshape(-1, 2)
+        np.multiply(ROS_DAMAGE, state[:, 1], out=scratch)
+        np.subtract(psi_drive, scratch, out=psi_out)
+        np.multiply(PSI_DECAY, state[:, 0], out=scratch)
+        np.subtract(psi_out, scratch, out=psi_out)
+        np.multiply(ros_removal_rate, state[:, 1], out=scratch)
+        np.subtract(ros_generation, scratch, out=ros_out)
+        return flat
+    return rhs
+
+
+def banded_jacobian_v4_batch(ros_removal_rate):
+    """Constant Jacobian of ``system_dynamics_v4_batch`` in ``odeint`` banded form.
+
+    With ``ml = mu = 1`` row ``i - j + 1`` of column ``j`` holds dy_i'/dy_j:
+    the superdiagonal carries dPsi'/dROS, the diagonal the decay rates and the
+    subdiagonal (dROS'/dPsi) is zero.
+    """
+    n = np.size(ros_removal_rate)
+    jac = np.zeros((3, 2 * n))
+    jac[0, 1::2] = -ROS_DAMAGE
+    jac[1, 0::2] = -PSI_DECAY
+    jac[1, 1::2] = -np.asarray(ros_removal_rate, dtype=float)
+
+    def Dfun(y, t, *args):
+        return jac
+    return Dfun
+
+
+def _hermite(p0, p1, m0, m1, h, s):
+    """Cubic Hermite interpolant on [0, 1] with endpoint slopes scaled by h."""
+    s2, s3 = s * s, s * s * s
+    return ((2 * s3 - 3 * s2 + 1) * p0 + (s3 - 2 * s2 + s) * h * m0
+            + (-2 * s3 + 3 * s2) * p1 + (s3 - s2) * h * m1)
+
+
+def _hermite_root(p0, p1, m0, m1, h, iterations=40):
+    """Bisection for the sign change of the Hermite cubic inside each interval."""
+    lo = np.zeros_like(p0)
+    hi = np.ones_like(p0)
+    negative_at_lo = p0 < 0
+    for _ in range(iterations):
+        mid = 0.5 * (lo + hi)
+        same = (_hermite(p0, p1, m0, m1, h, mid) < 0) == negative_at_lo
+        lo = np.where(same, mid, lo)
+        hi = np.where(same, hi, mid)
+    return 0.5 * (lo + hi)
+
+
+def apoptosis_from_trajectory(t, psi, ros, dpsi, dros):
+    """Integrate the v4 Apop trigger exactly along sampled Psi/ROS trajectories.
+
+    ``psi``, ``ros`` and their time derivatives have shape (N, len(t)). The
+    trigger ``Psi < 0.4 or ROS > 2.0`` is switched at the threshold crossings
+    of the cubic Hermite interpolant between samples, and the returned Apop
+    (N, len(t)) is ``APOP_RATE`` times the accumulated time spent triggered.
+    A threshold crossed and re-crossed within a single output interval is not
+    resolved; with the v4 time scales this needs a coarser grid than the
+    default.
+    """
+    h = np.diff(t)
+    f_psi = PSI_DEATH_THRESHOLD - psi
+    f_ros = ros - ROS_TOXIC_THRESHOLD
+    on0 = (f_psi[:, :-1] > 0) | (f_ros[:, :-1] > 0)
+    on1 = (f_psi[:, 1:] > 0) | (f_ros[:, 1:] > 0)
+    fraction = on0.astype(float)
+
+    cross_psi = (f_psi[:, :-1] > 0) != (f_psi[:, 1:] > 0)
+    cross_ros = (f_ros[:, :-1] > 0) != (f_ros[:, 1:] > 0)
+    mixed = cross_psi | cross_ros | (on0 != on1)
+    if mixed.any():
+        rows, cols = np.nonzero(mixed)
+        hh = h[cols]
+        breaks = [np.zeros(rows.size), np.ones(rows.size)]
+        for f, df, crossed, sign in ((f_psi, dpsi, cross_psi, -1.0),
+                                     (f_ros, dros, cross_ros, 1.0)):
+            root = _hermite_root(f[rows, cols], f[rows, cols + 1],
+                                 sign * df[rows, cols], sign * df[rows, cols + 1], hh)
+            breaks.append(np.where(crossed[rows, cols], root, 1.0))
+        breaks = np.sort(np.stack(breaks, axis=1), axis=1)
+        widths = np.diff(breaks, axis=1)
+        mids = 0.5 * (breaks[:, 1:] + breaks[:, :-1])
+        on = np.zeros(mids.shape, dtype=bool)
+        for f, df, sign in ((f_psi, dpsi, -1.0), (f_ros, dros, 1.0)):
+            on |= _hermite(f[rows, cols, None], f[rows, cols + 1, None],
+                           sign * df[rows, cols, None], sign * df[rows, cols + 1, None],
+                           hh[:, None], mids) > 0
+        fraction[rows, cols] = (widths * on).sum(axis=1)
+
+    apop = np.zeros_like(psi)
+    apop[:, 1:] = APOP_RATE * np.cumsum(fraction * h, axis=1)
+    return apop
+
+
+@cached('v4-batch')
+def run_batch(cbd_conc, blocker=False, resilience=None, scavenging_capacity=None,
+              g_max=None, respiration_max=None, cell_type=None, t=None,
+              initial_state=INITIAL_STATE, chunk_size=DEFAULT_CHUNK_SIZE, jacobian=True,
+              generated=False, **odeint_kwargs):
+    """Integrate N v4 scenarios together and return ``(t, sol)``.
+
+    ``cbd_conc``, ``blocker`` and the phenotype parameters broadcast against
+    each other to N scenarios. Phenotype parameters left as None are filled
+    from ``cell_type`` (a label or array of labels, default "Healthy").
+    ``sol`` has shape (N, len(t), 3) so ``sol[i]`` is laid out exactly like
+    the output of ``run_simulation`` for scenario i.
+
+    Scenarios are solved ``chunk_size`` at a time to bound the size of the
+    stacked state; extra keyword arguments are forwarded to ``odeint``.
+    ``jacobian`` supplies the exact banded Jacobian instead of finite
+    differences; ``generated`` uses the allocation-free buffered RHS.
+    """
+    t = default_time_grid() if t is None else np.asarray(t, dtype=float)
+    given = resolve_phenotype(cell_type, resilience=resilience,
+                              scavenging_capacity=scavenging_capacity,
+                              g_max=g_max, respiration_max=respiration_max)
+    coefficients = v4_coefficients(cbd_conc, blocker, **given)
+    n = coefficients[0].size
+    coefficients = [np.ascontiguousarray(c, dtype=float).ravel() for c in coefficients]
+    initial_state = np.broadcast_to(np.asarray(initial_state, dtype=float), (n, 3))
+    odeint_kwargs.setdefault('mxstep', 5000)
+
+    sol = np.empty((n, t.size, 3))
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        args = tuple(c[start:stop] for c in coefficients)
+        y0 = initial_state[start:stop][:, [0, 2]].ravel()
+        if generated:
+            func, func_args = buffered_dynamics_v4_batch(*args), ()
+        else:
+            func, func_args = system_dynamics_v4_batch, args
+        Dfun = banded_jacobian_v4_batch(args[1]) if jacobian else None
+        # One trace record per stacked chunk: the solver counters are shared
+        with trace.recording('run_batch', 'odeint', start=start, stop=stop,
+                             n_scenarios=stop - start, jacobian=jacobian,
+                             generated=generated) as record:
+            flat = odeint(trace.timed(record, func), y0, t, args=func_args,
+                          Dfun=trace.timed(record, Dfun, 'jac'), ml=1, mu=1,
+                          full_output=record is not None, **odeint_kwargs)
+            if record is not None:
+                flat, info = flat
+                trace.add_odeint(record, info)
+            flat = flat.reshape(t.size, stop - start, 2).transpose(1, 0, 2)
+            psi, ros = flat[..., 0], flat[..., 1]
+            ros_generation, ros_removal_rate, psi_drive = (c[:, None] for c in args)
+            dpsi = psi_drive - ROS_DAMAGE * ros - PSI_DECAY * psi
+            dros = ros_generation - ros_removal_rate * ros
+            sol[start:stop, :, 0] = psi
+            sol[start:stop, :, 2] = ros
+            sol[start:stop, :, 1] = (initial_state[start:stop, 1, None]
+                                     + apoptosis_from_trajectory(t, psi, ros, dpsi, dros))
+    return t, sol
+
+
+def final_outcomes(sol):
+    """Final Psi, ROS and the SURVIVED mask used by the v3/v4 summaries."""
+    final_psi = sol[..., -1, 0]
+    final_ros = sol[..., -1, 2]
+    survived = (final_psi > PSI_DEATH_THRESHOLD) & (final_ros < ROS_TOXIC_THRESHOLD)
+    return final_psi, final_ros, survived
@@ -0,0 +1,228 @@
+"""Content-addressed on-disk cache for model solutions.
+
+Wrapped entry points (``run_batch``, ``run_analytic``, ``run_event_driven``,
+``simulate_pk``) look up their result under a SHA-256 key before solving. The
+key covers:
+
+- the model tag of the entry point,
+- every argument after defaults are applied: doses, phenotype parameters,
+  initial state, time grid, solver method and tolerances,
+- a fingerprint of the cbd_model source files.
+
+The fingerprint covers the constants in ``params.py``, so any change to a
+parameter or to the equations invalidates old entries. Results are stored as
+uncompressed ``.npz`` files, two hex levels deep under the cache directory.
+Hits refresh the file's modification time, and when the directory grows past
+``max_bytes`` the least recently used entries are deleted until it is back
+under 90% of the limit.
+
+A hit returns the stored result without running the entry point, so it
+writes no ``cbd_model.trace`` record. ``simulate_pk`` calls with a
+``checkpoint_path`` always run, so the checkpoint is written, and
+``run_analytic(..., use_cache=False)`` skips the cache for callers that keep
+the results elsewhere, such as ``store.write_sweep``.
+
+Configuration comes from ``CBD_MODEL_CACHE`` (set to 0 to disable),
+``CBD_MODEL_CACHE_DIR`` and ``CBD_MODEL_CACHE_MAX_BYTES``, or from
+``configure()`` at runtime.
+"""
+import functools
+import glob
+import hashlib
+import inspect
+import json
+import os
+
+import numpy as np
+
+CACHE_FORMAT = 1
+DEFAULT_MAX_BYTES = 2 ** 30
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+_CONFIG = {
+    'enabled': os.environ.get('CBD_MODEL_CACHE', '1') != '0',
+    'directory': os.environ.get('CBD_MODEL_CACHE_DIR') or os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+        'cbd_model'),
+    'max_bytes': int(os.environ.get('CBD_MODEL_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+}
+_STATE = {'fingerprint': None, 'size': None}
+
+
+def configure(enabled=None, directory=None, max_bytes=None):
+    """Change cache settings for this process; returns the active settings."""
+    if enabled is not None:
+        _CONFIG['enabled'] = bool(enabled)
+    if directory is not None:
+        _CONFIG['directory'] = directory
+        _STATE['size'] = None
+    if max_bytes is not None:
+        _CONFIG['max_bytes'] = int(max_bytes)
+    return dict(_CONFIG)
+
+
+def source_fingerprint():
+    """Hash of every module in the package, computed once per process."""
+    if _STATE['fingerprint'] is None:
+        digest = hashlib.sha256()
+        for path in sorted(glob.glob(os.path.join(_PACKAGE_DIR, '*.py'))):
+            digest.update(os.path.basename(path).encode())
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        _STATE['fingerprint'] = digest.hexdigest()
+    return _STATE['fingerprint']
+
+
+def _update(digest, value):
+    """Feed a canonical, type-tagged encoding of ``value`` into ``digest``."""
+    if isinstance(value, np.ndarray) or isinstance(value, np.generic):
+        value = np.ascontiguousarray(value)
+        if value.dtype == object:
+            digest.update(b'O')
+            _update(digest, value.tolist())
+            return
+        digest.update(f'A{value.dtype.str}{value.shape}'.encode())
+        digest.update(value.tobytes())
+    elif isinstance(value, (list, tuple)):
+        digest.update(f'L{len(value)}'.encode())
+        for item in value:
+            _update(digest, item)
+    elif isinstance(value, dict):
+        digest.update(f'D{len(value)}'.encode())
+        for key in sorted(value, key=str):
+            _update(digest, str(key))
+            _update(digest, value[key])
+    elif value is None or isinstance(value, (bool, int, float, str)):
+        digest.update(f'{type(value).__name__}:{value!r};'.encode())
+    else:
+        raise TypeError(f"Cannot build a cache key from {type(value).__name__}")
+
+
+def cache_key(tag, arguments):
+    """SHA-256 hex key for a model ``tag`` and its bound ``arguments`` dict."""
+    digest = hashlib.sha256()
+    _update(digest, [CACHE_FORMAT, source_fingerprint(), tag, arguments])
+    return digest.hexdigest()
+
+
+def _path(key):
+    return os.path.join(_CONFIG['directory'], key[:2], key + '.npz')
+
+
+def load(key):
+    """Cached tuple for ``key``, or None on a miss."""
+    path = _path(key)
+    try:
+        with np.load(path) as data:
+            items = [data[f'item_{i}'] for i in range(int(data['n_items']))]
+            kinds = json.loads(str(data['kinds']))
+    except (OSError, KeyError, ValueError):
+        return None
+    os.utime(path)
+    return tuple(json.loads(str(item)) if kind == 'json' else item
+                 for item, kind in zip(items, kinds))
+
+
+def _json_scalar(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot cache {type(value).__name__} values")
+
+
+def store(key, value):
+    """Write a tuple of arrays and JSON-serializable dicts under ``key``."""
+    arrays, kinds = {}, []
+    for i, item in enumerate(value):
+        if isinstance(item, dict):
+            arrays[f'item_{i}'] = np.array(json.dumps(item, default=_json_scalar))
+            kinds.append('json')
+        else:
+            arrays[f'item_{i}'] = np.asarray(item)
+            kinds.append('array')
+    path = _path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = f'{path}.{os.getpid()}.partial.npz'
+    np.savez(partial, n_items=len(value), kinds=json.dumps(kinds), **arrays)
+    os.replace(partial, path)
+    if _STATE['size'] is None:
+        _STATE['size'] = directory_size()
+    else:
+        _STATE['size'] += os.path.getsize(path)
+    if _STATE['size'] > _CONFIG['max_bytes']:
+        _STATE['size'] = evict(int(0.9 * _CONFIG['max_bytes']))
+
+
+def _entries():
+    entries = []
+    for path in glob.glob(os.path.join(_CONFIG['directory'], '??', '*.npz')):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def directory_size():
+    """Total bytes held in the cache directory."""
+    return sum(size for _, size, _ in _entries())
+
+
+def evict(target_bytes):
+    """Delete least recently used entries until at most ``target_bytes`` remain."""
+    entries = sorted(_entries())
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total <= target_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    return total
+
+
+def clear():
+    """Remove every cache entry."""
+    evict(0)
+    _STATE['size'] = 0
+
+
+def cached(tag, ignore=(), bypass=()):
+    """Decorate a model entry point so its results go through the cache.
+
+    The wrapped function must return a tuple of arrays and JSON-serializable
+    dicts. Arguments named in ``ignore`` do not affect the result and are left
+    out of the key. Calls whose arguments cannot be hashed bypass the cache,
+    as do calls that set an argument named in ``bypass`` to anything but its
+    default: such arguments ask for side effects a hit would skip, like
+    writing a checkpoint, or opt out of caching altogether.
+    """
+    def decorator(function):
+        signature = inspect.signature(function)
+        defaults = [(name, signature.parameters[name].default) for name in bypass]
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _CONFIG['enabled']:
+                return function(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            if any(bound.arguments.get(name, default) is not default
+                   for name, default in defaults):
+                return function(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = {name: value for name, value in bound.arguments.items()
+                         if name not in ignore}
+            try:
+                key = cache_key(tag, arguments)
+            except TypeError:
+                return function(*args, **kwargs)
+            hit = load(key)
+            if hit is not None:
+                return hit
+            result = function(*args, **kwargs)
+            store(key, result)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,386 @@
+"""Weighted least-squares calibration of v4 phenotypes against experiments.
+
+The v4 phenotype constants were tuned by hand. ``calibrate`` fits them per
+phenotype to any number of experiments at once. An experiment is a dict:
+
+- ``phenotype``: cell type label. Experiments with the same label share
+  parameters, and the label's ``PHENOTYPES`` entry is the starting point.
+- ``cbd_conc``, and optionally ``blocker`` (bool or inhibition factor, as in
+  ``run_batch``; see ``inhibition_factor`` for concentrations). Both forms
+  may be mixed; True counts as the factor ``BLOCKER_INHIBITION``.
+- ``t`` and ``values``: the measured time course of one ``observable``:
+  - ``psi`` or ``ros``: the model states, with Psi = 1 at t = 0;
+  - ``viability``: Psi relative to the untreated (vehicle) cell of the same
+    phenotype at the same time, floored at 0. Collapsed cells read 0, not
+    a negative potential.
+- ``sigma`` (per point or scalar, default 1) and ``weight`` (default 1).
+  The residual of a point is ``sqrt(weight) * (model - value) / sigma``.
+
+Gradients come from the forward sensitivity equations. The Psi/ROS
+subsystem at constant dose is linear, dROS = g - k ROS and
+dPsi = D - a ROS - b Psi, and g, k, D are linear in the phenotype
+parameters. So the sensitivities S = d(Psi, ROS)/d(theta) obey
+
+    dS_ROS/dt = dg/dtheta - dk/dtheta ROS - k S_ROS
+    dS_Psi/dt = dD/dtheta - a S_ROS - b S_Psi,    S(0) = 0
+
+Every distinct (phenotype, dose, blocker) scenario of every experiment is
+integrated with its sensitivities in one stacked ``odeint`` call, laid out
+like ``run_batch`` with an exact banded Jacobian. Each trial point of the
+optimizer costs one such solve, and the residual Jacobian reuses it. The
+Apop trigger does not enter the observables, so the solve leaves Apop out.
+
+resilience and respiration_max enter only D, with the same sign and
+weight, so no data can tell them apart. By default resilience stays fixed
+and the other three parameters are fitted. ``n_starts`` adds fits from
+log-uniform perturbations of the start (a factor of up to 3 either way),
+optionally run in a process pool, and the lowest-cost fit wins.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.integrate import odeint
+from scipy.optimize import least_squares
+
+from . import trace
+from .batch import v4_coefficients, vdac_binding
+from .models import blocker_factor
+from .montecarlo import batch_rng
+from .params import (
+    BLOCKER_INHIBITION, EC50_TRPV1, INITIAL_STATE, Kd_VDAC, PHENOTYPE_KEYS, PSI_DECAY, ROS_DAMAGE,
+    ROS_LEAK_YIELD, phenotype,
+)
+
+OBSERVABLES = ('psi', 'ros', 'viability')
+CALIBRATED = ('scavenging_capacity', 'g_max', 'respiration_max')
+PARAMETER_BOUNDS = {
+    'resilience': (0.0, 1.0),
+    'scavenging_capacity': (0.0, np.inf),
+    'g_max': (0.0, np.inf),
+    'respiration_max': (0.0, np.inf),
+}
+# Multi-start perturbations span start / SPREAD to start * SPREAD
+START_SPREAD = 3.0
+
+
+def coefficient_gradients(cbd_conc, blocker, keys, kd_vdac=Kd_VDAC):
+    """``(dg, dk, dD)``, each (..., len(keys)): derivatives of the v4 terms.
+
+    The derivatives do not depend on the phenotype values: g, k and D are
+    linear in each phenotype parameter.
+    """
+    binding = vdac_binding(cbd_conc, blocker, kd_vdac)
+    zero, one = np.zeros_like(binding), np.ones_like(binding)
+    derivatives = {
+        'resilience': (zero, zero, one),
+        'scavenging_capacity': (zero, one, zero),
+        'g_max': (binding * ROS_LEAK_YIELD, zero, -binding),
+        'respiration_max': (zero, zero, one),
+    }
+    unknown = set(keys) - set(derivatives)
+    if unknown:
+        raise ValueError(f"Unknown phenotype parameters: {sorted(unknown)}; "
+                         f"expected some of {PHENOTYPE_KEYS}")
+    if not keys:
+        return (zero[..., None][..., :0],) * 3
+    return tuple(np.stack([derivatives[key][term] for key in keys], axis=-1)
+                 for term in range(3))
+
+
+def _sensitivity_rhs(y, t, g, k, D, dg, dk, dD):
+    """Per scenario ``[Psi, ROS, S_Psi_1, S_ROS_1, ...]``, stacked like ``run_batch``."""
+    state = y.reshape(g.size, -1)
+    ros = state[:, 1]
+    dydt = np.empty_like(state)
+    dydt[:, 0] = D - ROS_DAMAGE * ros - PSI_DECAY * state[:, 0]
+    dydt[:, 1] = g - k * ros
+    dydt[:, 2::2] = dD - ROS_DAMAGE * state[:, 3::2] - PSI_DECAY * state[:, 2::2]
+    dydt[:, 3::2] = dg - dk * ros[:, None] - k[:, None] * state[:, 3::2]
+    return dydt.ravel()
+
+
+def _sensitivity_jacobian(k, dk):
+    """Banded ``odeint`` Dfun (``ml = 2 m``, ``mu = 1``) of ``_sensitivity_rhs``."""
+    n, m = dk.shape
+    width, mu = 2 + 2 * m, 1
+    band = np.zeros((2 * m + mu + 1, n, width))
+    # Diagonal: -b for Psi and S_Psi, -k for ROS and S_ROS
+    band[mu, :, 0::2] = -PSI_DECAY
+    band[mu, :, 1::2] = -k[:, None]
+    # Superdiagonal: Psi and each S_Psi depend on the ROS entry after them
+    band[mu - 1, :, 1::2] = -ROS_DAMAGE
+    # S_ROS_j depends on ROS, 2 + 2 j rows below it
+    for j in range(m):
+        band[mu + 2 + 2 * j, :, 1] = -dk[:, j]
+    band = band.reshape(band.shape[0], n * width)
+
+    def Dfun(y, t, *args):
+        return band
+    return Dfun
+
+
+def solve_sensitivities(cbd_conc, blocker, params, keys=CALIBRATED, t=None,
+                        initial_state=INITIAL_STATE, kd_vdac=Kd_VDAC, ec50_trpv1=EC50_TRPV1,
+                        **odeint_kwargs):
+    """Psi, ROS and their forward sensitivities for N scenarios in one solve.
+
+    ``params`` maps every phenotype key to an array that broadcasts with
+    ``cbd_conc`` and ``blocker`` to N scenarios. Returns ``psi`` and ``ros``
+    (N, T) and ``d_psi`` and ``d_ros`` (N, T, len(keys)), the derivatives
+    with respect to ``keys``.
+    """
+    t = np.asarray(t, dtype=float)
+    g, k, D = (np.ravel(c) for c in v4_coefficients(cbd_conc, blocker, kd_vdac=kd_vdac,
+                                                    ec50_trpv1=ec50_trpv1, **params))
+    dg, dk, dD = (np.broadcast_to(d, (g.size, len(keys))).astype(float)
+                  for d in coefficient_gradients(np.broadcast_to(cbd_conc, g.shape),
+                                                 np.broadcast_to(blocker, g.shape),
+                                                 keys, kd_vdac))
+    n, m = g.size, len(keys)
+    y0 = np.zeros((n, 2 + 2 * m))
+    y0[:, 0], y0[:, 1] = initial_state[0], initial_state[2]
+    odeint_kwargs.setdefault('mxstep', 5000)
+    with trace.recording('solve_sensitivities', 'odeint', n_scenarios=n,
+                         keys=list(keys)) as record:
+        flat = odeint(trace.timed(record, _sensitivity_rhs), y0.ravel(), t,
+                      args=(g, k, D, dg, dk, dD),
+                      Dfun=trace.timed(record, _sensitivity_jacobian(k, dk), 'jac'),
+                      ml=2 * m, mu=1, full_output=record is not None, **odeint_kwargs)
+        if record is not None:
+            flat, info = flat
+            trace.add_odeint(record, info)
+    state = flat.reshape(t.size, n, 2 + 2 * m).transpose(1, 0, 2)
+    return {'psi': state[..., 0], 'ros': state[..., 1],
+            'd_psi': state[..., 2::2], 'd_ros': state[..., 3::2]}
+
+
+def prepare(experiments):
+    """Flatten ``experiments`` into the scenario table and point index the fit uses."""
+    phenotypes, scenarios = [], {}
+    times = [np.zeros(1)]
+    points = {key: [] for key in ('scenario', 'vehicle', 'time', 'observable', 'value',
+                                  'scale', 'experiment')}
+
+    def scenario(name, dose, blocker):
+        # Booleans become their inhibition factor, so a table mixing both
+        # forms stays float and True and 0.1 share one scenario
+        blocker = float(blocker_factor(blocker, BLOCKER_INHIBITION))
+        key = (name, float(dose), blocker)
+        if key not in scenarios:
+            scenarios[key] = len(scenarios)
+        return scenarios[key]
+
+    for number, experiment in enumerate(experiments):
+        name = experiment['phenotype']
+        observable = experiment['observable']
+        if observable not in OBSERVABLES:
+            raise ValueError(f"unknown observable {observable!r}; expected one of {OBSERVABLES}")
+        if name not in phenotypes:
+            phenotypes.append(name)
+        t = np.atleast_1d(np.asarray(experiment['t'], dtype=float))
+        values = np.broadcast_to(np.asarray(experiment['values'], dtype=float), t.shape)
+        sigma = np.broadcast_to(np.asarray(experiment.get('sigma', 1.0), dtype=float), t.shape)
+        blocker = experiment.get('blocker', False)
+        s = scenario(name, experiment['cbd_conc'], blocker)
+        vehicle = scenario(name, 0.0, False) if observable == 'viability' else -1
+        times.append(t)
+        points['scenario'].append(np.full(t.size, s))
+        points['vehicle'].append(np.full(t.size, vehicle))
+        points['time'].append(t)
+        points['observable'].append(np.full(t.size, OBSERVABLES.index(observable)))
+        points['value'].append(values)
+        points['scale'].append(np.sqrt(experiment.get('weight', 1.0)) / sigma)
+        points['experiment'].append(np.full(t.size, number))
+    grid = np.unique(np.concatenate(times))
+    if grid[0] < 0:
+        raise ValueError("Experiment times must be >= 0 (the initial state is at t = 0)")
+    index = {key: np.concatenate(value) for key, value in points.items()}
+    index['time'] = np.searchsorted(grid, index['time'])
+    keys = list(scenarios)
+    return {
+        'phenotypes': phenotypes,
+        't': grid,
+        'scenario_phenotype': np.array([phenotypes.index(key[0]) for key in keys]),
+        'cbd_conc': np.array([key[1] for key in keys]),
+        'blocker': np.array([key[2] for key in keys]),
+        'n_experiments': len(experiments),
+        **index,
+    }
+
+
+def _model_points(layout, values, keys, kd_vdac, ec50_trpv1):
+    """Model value and its gradient (n_points, len(keys)) at every data point."""
+    per_scenario = {key: values[layout['scenario_phenotype'], j]
+                    for j, key in enumerate(PHENOTYPE_KEYS)}
+    solution = solve_sensitivities(layout['cbd_conc'], layout['blocker'], per_scenario, keys,
+                                   t=layout['t'], kd_vdac=kd_vdac, ec50_trpv1=ec50_trpv1)
+    s, time, observable = layout['scenario'], layout['time'], layout['observable']
+    psi, d_psi = solution['psi'][s, time], solution['d_psi'][s, time]
+    ros, d_ros = solution['ros'][s, time], solution['d_ros'][s, time]
+    model = np.where(observable == 1, ros, psi)
+    gradient = np.where((observable == 1)[:, None], d_ros, d_psi)
+    viability = observable == 2
+    if viability.any():
+        vehicle = layout['vehicle'][viability]
+        base = solution['psi'][vehicle, time[viability]]
+        d_base = solution['d_psi'][vehicle, time[viability]]
+        ratio = psi[viability] / base
+        d_ratio = (d_psi[viability] - ratio[:, None] * d_base) / base[:, None]
+        floored = ratio <= 0
+        model[viability] = np.where(floored, 0.0, ratio)
+        gradient[viability] = np.where(floored[:, None], 0.0, d_ratio)
+    return model, gradient
+
+
+def _full_values(layout, theta, keys, fixed):
+    """(P, 4) phenotype parameter table from the fitted vector and the fixed values."""
+    values = fixed.copy()
+    columns = [PHENOTYPE_KEYS.index(key) for key in keys]
+    values[:, columns] = theta.reshape(len(layout['phenotypes']), len(keys))
+    return values
+
+
+def residual_functions(layout, keys, fixed, kd_vdac=Kd_VDAC, ec50_trpv1=EC50_TRPV1):
+    """``(residuals, jacobian, counter)`` for ``least_squares`` sharing one solve per point."""
+    last = {'theta': None}
+    counter = {'solves': 0}
+    n_points, n_phenotypes, m = layout['value'].size, len(layout['phenotypes']), len(keys)
+    owner = layout['scenario_phenotype'][layout['scenario']]
+
+    def evaluate(theta):
+        if last['theta'] is None or not np.array_equal(theta, last['theta']):
+            values = _full_values(layout, theta, keys, fixed)
+            model, gradient = _model_points(layout, values, keys, kd_vdac, ec50_trpv1)
+            counter['solves'] += 1
+            last.update(theta=np.array(theta), model=model, gradient=gradient)
+        return last['model'], last['gradient']
+
+    def residuals(theta):
+        model, _ = evaluate(theta)
+        return layout['scale'] * (model - layout['value'])
+
+    def jacobian(theta):
+        _, gradient = evaluate(theta)
+        J = np.zeros((n_points, n_phenotypes, m))
+        J[np.arange(n_points), owner] = layout['scale'][:, None] * gradient
+        return J.reshape(n_points, n_phenotypes * m)
+
+    return residuals, jacobian, counter
+
+
+def _fit(layout, keys, fixed, x0, lower, upper, kd_vdac, ec50_trpv1, options):
+    residuals, jacobian, counter = residual_functions(layout, keys, fixed, kd_vdac, ec50_trpv1)
+    result = least_squares(residuals, x0, jac=jacobian, bounds=(lower, upper), **options)
+    return {'x0': x0, 'x': result.x, 'cost': float(result.cost), 'fun': result.fun,
+            'jac': result.jac, 'success': bool(result.success), 'message': result.message,
+            'nfev': int(result.nfev), 'njev': int(result.njev or 0),
+            'n_solves': counter['solves']}
+
+
+def run_starts(layout, keys, fixed, starts, lower, upper, kd_vdac, ec50_trpv1, options):
+    """Fits from each start vector in ``starts``."""
+    return [_fit(layout, keys, fixed, x0, lower, upper, kd_vdac, ec50_trpv1, options)
+            for x0 in starts]
+
+
+def _starts(x0, lower, upper, n_starts, seed):
+    # Keep perturbed starts strictly inside finite bounds
+    margin = np.where(np.isfinite(upper), 1e-3 * (np.where(np.isfinite(upper), upper, 0.0)
+                                                 - lower), 0.0)
+    starts = [x0]
+    for start in range(1, n_starts):
+        rng = batch_rng(seed, start)
+        factor = np.exp(rng.uniform(-np.log(START_SPREAD), np.log(START_SPREAD), x0.size))
+        starts.append(np.clip(x0 * factor, lower + margin, upper - margin))
+    return starts
+
+
+def calibrate(experiments, parameters=CALIBRATED, initial=None, bounds=None, n_starts=1,
+              seed=0, max_workers=1, kd_vdac=Kd_VDAC, ec50_trpv1=EC50_TRPV1,
+              **least_squares_kwargs):
+    """Fit ``parameters`` of every phenotype in ``experiments`` by weighted least squares.
+
+    ``initial`` maps phenotype labels to parameter overrides of the start
+    (and of the fixed parameters); ``bounds`` overrides ``PARAMETER_BOUNDS``
+    entries. Extra keyword arguments go to ``scipy.optimize.least_squares``
+    (default ``x_scale='jac'``). With ``max_workers`` other than 1 (None: all
+    cores) the ``n_starts`` fits are split round-robin across a process pool.
+
+    Returns a dict with ``params`` ({phenotype: full parameter dict} of the
+    best fit), ``stderr`` ({phenotype: {parameter: standard error}}, from
+    the Gauss-Newton covariance, which assumes the ``sigma`` are true
+    measurement errors), ``covariance``, ``cost`` (half the weighted sum of
+    squares), ``residuals`` (one array per experiment), ``success``,
+    ``message``, the evaluation counts ``nfev``, ``njev`` and ``n_solves``
+    (batched sensitivity solves), and ``starts``, one summary per start.
+    """
+    keys = tuple(parameters)
+    unknown = set(keys) - set(PHENOTYPE_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown phenotype parameters: {sorted(unknown)}; "
+                         f"expected some of {PHENOTYPE_KEYS}")
+    layout = prepare(experiments)
+    initial = initial or {}
+    fixed = np.array([[{**phenotype(name), **initial.get(name, {})}[key]
+                       for key in PHENOTYPE_KEYS] for name in layout['phenotypes']], dtype=float)
+    columns = [PHENOTYPE_KEYS.index(key) for key in keys]
+    x0 = fixed[:, columns].ravel()
+    limits = {**PARAMETER_BOUNDS, **(bounds or {})}
+    lower = np.tile([limits[key][0] for key in keys], len(layout['phenotypes'])).astype(float)
+    upper = np.tile([limits[key][1] for key in keys], len(layout['phenotypes'])).astype(float)
+    x0 = np.clip(x0, lower, upper)
+    options = {'x_scale': 'jac', **least_squares_kwargs}
+    starts = _starts(x0, lower, upper, n_starts, seed)
+
+    args = (layout, keys, fixed, lower, upper, kd_vdac, ec50_trpv1, options)
+    if max_workers == 1 or n_starts == 1:
+        fits = run_starts(layout, keys, fixed, starts, *args[3:])
+    else:
+        workers = min(max_workers or os.cpu_count(), n_starts)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_starts, layout, keys, fixed, starts[w::workers],
+                                   *args[3:])
+                       for w in range(workers)]
+            parts = [future.result() for future in futures]
+        # Undo the round-robin split so fits line up with their starts
+        fits = [None] * n_starts
+        for w, part in enumerate(parts):
+            fits[w::workers] = part
+
+    best = min(fits, key=lambda fit: fit['cost'])
+    values = _full_values(layout, best['x'], keys, fixed)
+    covariance = np.linalg.pinv(best['jac'].T @ best['jac'])
+    stderr = np.sqrt(np.clip(np.diag(covariance), 0.0, None)).reshape(len(values), len(keys))
+    experiment = layout['experiment']
+    return {
+        'params': {name: dict(zip(PHENOTYPE_KEYS, row.tolist()))
+                   for name, row in zip(layout['phenotypes'], values)},
+        'stderr': {name: dict(zip(keys, row.tolist()))
+                   for name, row in zip(layout['phenotypes'], stderr)},
+        'covariance': covariance,
+        'parameters': keys,
+        'cost': best['cost'],
+        'residuals': [best['fun'][experiment == e] for e in range(layout['n_experiments'])],
+        'success': best['success'],
+        'message': best['message'],
+        'nfev': best['nfev'],
+        'njev': best['njev'],
+        'n_solves': best['n_solves'],
+        'starts': [{'x0': fit['x0'], 'x': fit['x'], 'cost': fit['cost'],
+                    'success': fit['success'], 'nfev': fit['nfev']} for fit in fits],
+    }
+
+
+def predict(experiments, params=None, kd_vdac=Kd_VDAC, ec50_trpv1=EC50_TRPV1):
+    """Model values at every experiment's time points (one array per experiment).
+
+    ``params`` maps phenotype labels to parameter overrides, such as
+    ``calibrate(...)['params']``; the rest come from ``PHENOTYPES``.
+    """
+    layout = prepare(experiments)
+    params = params or {}
+    values = np.array([[{**phenotype(name), **params.get(name, {})}[key]
+                        for key in PHENOTYPE_KEYS] for name in layout['phenotypes']], dtype=float)
+    model, _ = _model_points(layout, values, (), kd_vdac, ec50_trpv1)
+    return [model[layout['experiment'] == e] for e in range(layout['n_experiments'])]
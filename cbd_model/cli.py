@@ -0,0 +1,136 @@
+"""Command line entry point: ``python -m cbd_model``.
+
+    python -m cbd_model list
+    python -m cbd_model run v4 --format npz --output v4.npz
+    python -m cbd_model figures v1 v2 v3 v4 --out-dir figures --jobs 4
+    python -m cbd_model --no-cache --trace v4.jsonl run v4 --method odeint
+
+``run`` computes a named sweep and writes its arrays and summary as JSON
+(stdout by default) or NPZ; it never imports matplotlib. ``figures`` renders
+sweep figures, optionally in parallel worker processes with ``--jobs``.
+``--trace`` appends one line of solver statistics per solve (see ``trace``).
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from .models import STATE_LABELS
+
+FORMATS = ('json', 'npz')
+MODELS = tuple(sorted(STATE_LABELS))
+
+
+def _jsonable(value):
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def write_result(result, output=None, fmt='json'):
+    """Write a sweep result as JSON (stdout when ``output`` is None) or NPZ."""
+    if fmt == 'json':
+        text = json.dumps(result, default=_jsonable)
+        if output is None:
+            sys.stdout.write(text + '\n')
+        else:
+            with open(output, 'w') as f:
+                f.write(text)
+        return output
+    if fmt != 'npz':
+        raise ValueError(f"unknown format {fmt!r}; expected one of {FORMATS}")
+    if output is None:
+        raise ValueError("NPZ output needs a file path")
+    import numpy as np
+    with open(output, 'wb') as f:
+        np.savez(f, t=result['t'], solutions=result['solutions'],
+                 model=result['model'], state_labels=json.dumps(result['state_labels']),
+                 scenarios=json.dumps(result['scenarios']),
+                 summary=json.dumps(result['summary']))
+    return output
+
+
+def render_figure(model, out_dir, method='analytic'):
+    """Compute the sweep for ``model`` and write its figure; returns the path."""
+    from .plotting import render
+    from .sweeps import SWEEPS
+    kwargs = {'method': method} if model in ('v3', 'v4') else {}
+    return render(model, SWEEPS[model](**kwargs), out_dir)
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog='python -m cbd_model',
+                                     description='Run CBD two-pathway model sweeps.')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='bypass the on-disk result cache')
+    parser.add_argument('--trace', metavar='PATH',
+                        help='append per-solve solver statistics to PATH (JSON lines)')
+    parser.add_argument('--profile', action='store_true',
+                        help='with --trace, also sample where the RHS spends its time')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('list', help='list the named sweeps')
+
+    run = commands.add_parser('run', help='run a sweep and write its results')
+    run.add_argument('model', choices=MODELS)
+    run.add_argument('--format', choices=FORMATS, default='json')
+    run.add_argument('--output', '-o', help='output file (JSON defaults to stdout)')
+    run.add_argument('--method', choices=('analytic', 'odeint'), default='analytic',
+                     help='solver for v3/v4 (default: analytic)')
+    run.add_argument('--summary', action='store_true',
+                     help='print the numerical summary to stderr')
+
+    figures = commands.add_parser('figures', help='render sweep figures')
+    figures.add_argument('models', nargs='*', metavar='model',
+                         help=f"sweeps to render: {', '.join(MODELS)} (default: all)")
+    figures.add_argument('--out-dir', default='figures')
+    figures.add_argument('--jobs', '-j', type=int, default=1,
+                         help='worker processes for rendering (default: 1)')
+    figures.add_argument('--method', choices=('analytic', 'odeint'), default='analytic')
+    return parser
+
+
+def main(argv=None):
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.no_cache:
+        from .cache import configure
+        configure(enabled=False)
+    if args.trace:
+        from . import trace
+        trace.configure(path=args.trace, profile=args.profile)
+        # Spawned worker processes only see the environment
+        os.environ['CBD_MODEL_TRACE'] = args.trace
+        os.environ['CBD_MODEL_TRACE_PROFILE'] = '1' if args.profile else '0'
+
+    if args.command == 'list':
+        from .sweeps import SWEEPS
+        for name, sweep in sorted(SWEEPS.items()):
+            print(f'{name}\t{sweep.__doc__.splitlines()[0]}')
+        return 0
+
+    if args.command == 'run':
+        from .sweeps import SWEEPS, summary_lines
+        kwargs = {'method': args.method} if args.model in ('v3', 'v4') else {}
+        result = SWEEPS[args.model](**kwargs)
+        if args.summary:
+            for line in summary_lines(result):
+                print(line, file=sys.stderr)
+        write_result(result, args.output, args.format)
+        return 0
+
+    models = args.models or list(MODELS)
+    unknown = sorted(set(models) - set(MODELS))
+    if unknown:
+        parser.error(f"unknown sweep(s): {', '.join(unknown)}")
+    os.makedirs(args.out_dir, exist_ok=True)
+    if args.jobs > 1 and len(models) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.jobs, len(models))) as pool:
+            paths = list(pool.map(render_figure, models, [args.out_dir] * len(models),
+                                  [args.method] * len(models)))
+    else:
+        paths = [render_figure(model, args.out_dir, args.method) for model in models]
+    for path in paths:
+        print(path)
+    return 0
@@ -0,0 +1,211 @@
+"""CBD x VDAC-blocker checkerboards with Bliss and Loewe synergy scores.
+
+The scripts treat the blocker as present or absent at one CBD dose. Here it
+is a concentration: ``inhibition_factor`` maps it through a Hill curve
+(``BLOCKER_IC50``, ``BLOCKER_HILL``) to the fraction of VDAC binding left.
+Every solver reads ``blocker`` through ``models.blocker_factor``, which passes
+such factors through and maps True/False to the model's own boolean blocker,
+so a factor works anywhere a boolean does. A checkerboard evaluates
+the full CBD x blocker concentration matrix for each phenotype in closed
+form at ``t_end``. The matrix is split into chunks of CBD rows and farmed out
+to a process pool like a grid scan.
+
+Synergy needs a graded effect in [0, 1], and the model's outcome per
+phenotype is deterministic, so it comes from one of two endpoints:
+
+- ``psi_loss``: ``1 - Psi(t_end) / Psi_untreated(t_end)``, clipped to [0, 1];
+- ``early_collapse``: the share of the window left after the Apop trigger
+  first fires, ``(t_end - collapse_time) / t_end``, 0 if it never fires.
+
+Scores are excess effects, observed minus expected; positive is synergy and
+negative antagonism:
+
+- Bliss: ``E_A + E_B - E_A E_B`` from the single-agent effects at the same
+  doses.
+- Loewe: the ``E`` with ``a / D_A(E) + b / D_B(E) = 1``, where ``D_X(E)``
+  inverts the running maximum of agent X's single-agent curve on the tested
+  grid. An effect agent X alone never reaches within the grid counts as
+  needing an infinite dose of X.
+
+The blocker on its own does nothing (no CBD, no VDAC binding to inhibit).
+Its Loewe expectation is therefore the CBD-alone effect, and both scores
+measure how far the blocker rescues each phenotype.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .analytic import MODELS, analytic_final_state
+from .batch import inhibition_factor
+from .params import BLOCKER_HILL, BLOCKER_IC50, T_END
+
+ENDPOINTS = ('psi_loss', 'early_collapse')
+DEFAULT_CHUNK_POINTS = 2 ** 16
+# Bisection steps for the Loewe-additive effect on [0, 1]
+LOEWE_ITERATIONS = 60
+
+
+def resolve_phenotypes(phenotypes, model='v4'):
+    """Name -> parameter dict for cell type labels or a ``{name: overrides}`` dict."""
+    lookup = MODELS[model]['phenotype']
+    if isinstance(phenotypes, dict):
+        return {name: {**lookup(name), **overrides} for name, overrides in phenotypes.items()}
+    return {name: lookup(name) for name in phenotypes}
+
+
+def _outcomes(params, cbd, factors, model, t_end):
+    """Final Psi, ROS and collapse time, each (len(cbd), len(factors))."""
+    final, collapse_time = analytic_final_state(cbd[:, None], factors[None, :], model=model,
+                                                t_end=t_end, **params)
+    shape = (cbd.size, factors.size)
+    return final[:, 0].reshape(shape), final[:, 2].reshape(shape), collapse_time.reshape(shape)
+
+
+def run_rows(phenotype_params, cbd, factors, model, t_end, tasks):
+    """Outcomes of the ``(phenotype index, start, stop)`` CBD-row tasks."""
+    return [(p, start, stop, _outcomes(phenotype_params[p], cbd[start:stop], factors,
+                                       model, t_end))
+            for p, start, stop in tasks]
+
+
+def effect(endpoint, final_psi, collapse_time, control_psi, t_end):
+    """Graded effect in [0, 1] of ``endpoint`` (see ``ENDPOINTS``)."""
+    if endpoint == 'psi_loss':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.clip(1.0 - final_psi / control_psi, 0.0, 1.0)
+    if endpoint == 'early_collapse':
+        return np.where(np.isnan(collapse_time), 0.0, (t_end - collapse_time) / t_end)
+    raise ValueError(f"unknown endpoint {endpoint!r}; expected one of {ENDPOINTS}")
+
+
+def bliss_excess(effect, effect_a, effect_b):
+    """Observed minus Bliss-independent effect.
+
+    ``effect`` is (..., A, B) and the single-agent effects (..., A) and (..., B).
+    """
+    effect_a, effect_b = effect_a[..., :, None], effect_b[..., None, :]
+    return effect - (effect_a + effect_b - effect_a * effect_b)
+
+
+def _dose_for(level, doses, curve):
+    """Lowest dose whose running-maximum effect reaches ``level``; inf beyond the grid.
+
+    Linear between grid doses. On a plateau of the envelope ``np.interp``
+    could return any dose along it, so the first grid point reaching
+    ``level`` is found with ``searchsorted`` instead.
+    """
+    envelope = np.maximum.accumulate(curve)
+    first = np.searchsorted(envelope, level, side='left')
+    lo = np.clip(first - 1, 0, envelope.size - 1)
+    hi = np.minimum(first, envelope.size - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = (level - envelope[lo]) / (envelope[hi] - envelope[lo])
+        dose = doses[lo] + (doses[hi] - doses[lo]) * fraction
+    return np.where(first == 0, doses[0], np.where(first == envelope.size, np.inf, dose))
+
+
+def loewe_excess(effect, doses_a, doses_b, effect_a, effect_b, control=0.0,
+                 iterations=LOEWE_ITERATIONS):
+    """Observed minus Loewe-additive effect for one phenotype's (A, B) matrix.
+
+    ``effect_a`` (A,) and ``effect_b`` (B,) are the single-agent curves at
+    ``doses_a`` and ``doses_b``; ``control`` is the effect with neither
+    agent, used as the zero-dose point of a curve whose grid starts above 0.
+    """
+    doses_a, doses_b = np.asarray(doses_a, dtype=float), np.asarray(doses_b, dtype=float)
+    a, b = doses_a[:, None], doses_b[None, :]
+    if doses_a[0] > 0:
+        doses_a, effect_a = np.append(0.0, doses_a), np.append(control, effect_a)
+    if doses_b[0] > 0:
+        doses_b, effect_b = np.append(0.0, doses_b), np.append(control, effect_b)
+
+    def excess_index(level):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            term_a = np.where(a > 0, a / _dose_for(level, doses_a, effect_a), 0.0)
+            term_b = np.where(b > 0, b / _dose_for(level, doses_b, effect_b), 0.0)
+        return term_a + term_b
+
+    # a / D_A(E) + b / D_B(E) falls as E rises; bisect for where it crosses 1
+    lo, hi = np.zeros(effect.shape), np.ones(effect.shape)
+    for _ in range(iterations):
+        mid = 0.5 * (lo + hi)
+        above = excess_index(mid) > 1.0
+        lo = np.where(above, mid, lo)
+        hi = np.where(above, hi, mid)
+    return effect - 0.5 * (lo + hi)
+
+
+def run_checkerboard(cbd_doses, blocker_doses, phenotypes=('Healthy', 'Cancer (Vulnerable)'),
+                     endpoint='psi_loss', model='v4', t_end=T_END, ic50=BLOCKER_IC50,
+                     hill=BLOCKER_HILL, max_inhibition=None,
+                     chunk_points=DEFAULT_CHUNK_POINTS, max_workers=1):
+    """CBD x blocker concentration matrices per phenotype with synergy scores.
+
+    ``cbd_doses`` (C,) and ``blocker_doses`` (B,) are concentrations in uM;
+    ``phenotypes`` are cell type labels or a ``{name: parameter overrides}``
+    dict. ``max_inhibition`` defaults to the model's boolean blocker at
+    saturation. Returns a dict of arrays: ``effect``, ``bliss``, ``loewe``,
+    ``final_psi``, ``final_ros``, ``collapse_time`` and ``survived``, all
+    (P, C, B); the single-agent curves ``cbd_alone`` (P, C) and
+    ``blocker_alone`` (P, B); ``inhibition_factor`` (B,), the binding left at
+    each blocker dose; plus the axes, ``phenotypes`` (names) and ``endpoint``.
+
+    With ``max_workers`` other than 1 (None: all cores) chunks of about
+    ``chunk_points`` matrix entries are split round-robin across a process
+    pool; results are identical to the single-process run.
+    """
+    if endpoint not in ENDPOINTS:
+        raise ValueError(f"unknown endpoint {endpoint!r}; expected one of {ENDPOINTS}")
+    spec = MODELS[model]
+    cbd = np.atleast_1d(np.asarray(cbd_doses, dtype=float))
+    blocker = np.atleast_1d(np.asarray(blocker_doses, dtype=float))
+    if max_inhibition is None:
+        max_inhibition = 1.0 - spec['blocker_inhibition']
+    factors = inhibition_factor(blocker, ic50, hill, max_inhibition)
+    resolved = resolve_phenotypes(phenotypes, model)
+    params = list(resolved.values())
+    n_phenotypes, shape = len(params), (cbd.size, blocker.size)
+
+    rows = max(1, chunk_points // blocker.size)
+    tasks = [(p, start, min(start + rows, cbd.size))
+             for p in range(n_phenotypes) for start in range(0, cbd.size, rows)]
+    if max_workers == 1 or len(tasks) == 1:
+        parts = run_rows(params, cbd, factors, model, t_end, tasks)
+    else:
+        workers = min(max_workers or os.cpu_count(), len(tasks))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_rows, params, cbd, factors, model, t_end,
+                                   tasks[w::workers])
+                       for w in range(workers)]
+            parts = [part for future in futures for part in future.result()]
+    final_psi, final_ros, collapse_time = (np.empty((n_phenotypes,) + shape) for _ in range(3))
+    for p, start, stop, (psi, ros, collapse) in parts:
+        final_psi[p, start:stop] = psi
+        final_ros[p, start:stop] = ros
+        collapse_time[p, start:stop] = collapse
+
+    result = {'cbd_doses': cbd, 'blocker_doses': blocker, 'inhibition_factor': factors,
+              'phenotypes': list(resolved), 'endpoint': endpoint}
+    fields = {key: [] for key in ('effect', 'cbd_alone', 'blocker_alone', 'bliss', 'loewe')}
+    for p, values in enumerate(params):
+        # Untreated control and single agents: no blocker, and no CBD
+        control_psi, _, control_collapse = _outcomes(values, np.zeros(1), np.ones(1), model,
+                                                     t_end)
+        alone_a = _outcomes(values, cbd, np.ones(1), model, t_end)
+        alone_b = _outcomes(values, np.zeros(1), factors, model, t_end)
+        control = effect(endpoint, control_psi, control_collapse, control_psi, t_end)[0, 0]
+        effect_a = effect(endpoint, alone_a[0], alone_a[2], control_psi, t_end)[:, 0]
+        effect_b = effect(endpoint, alone_b[0], alone_b[2], control_psi, t_end)[0]
+        observed = effect(endpoint, final_psi[p], collapse_time[p], control_psi, t_end)
+        fields['effect'].append(observed)
+        fields['cbd_alone'].append(effect_a)
+        fields['blocker_alone'].append(effect_b)
+        fields['bliss'].append(bliss_excess(observed, effect_a, effect_b))
+        fields['loewe'].append(loewe_excess(observed, cbd, blocker, effect_a, effect_b,
+                                            control))
+    result.update({key: np.stack(value) for key, value in fields.items()})
+    result.update(final_psi=final_psi, final_ros=final_ros, collapse_time=collapse_time,
+                  survived=((final_psi > spec['psi_threshold'])
+                            & (final_ros < spec['ros_threshold'])))
+    return result
@@ -0,0 +1,220 @@
+"""Parallel dose x phenotype grid scans with collapse-threshold extraction.
+
+The scripts evaluate four doses for two phenotypes and leave the therapeutic
+index to be read off the 40 uM printout. A grid scan evaluates a dense dose
+grid against every point of a phenotype parameter grid (any subset of
+resilience, scavenging_capacity, g_max, respiration_max, the rest taken from a
+base phenotype), using the closed-form v4 outcome at t=50.
+
+Work is split into chunks of phenotype points, each covering the full dose
+grid, and farmed out to a process pool. Chunks only receive their index and
+the grid spec, so scaling is limited by cores rather than by pickling. When
+``out_dir`` is given every finished chunk is written as ``chunk_NNNNN.npz``
+next to a ``scan.json`` manifest that also records the chunk bounds, and
+rerunning the same scan only computes the chunks that are missing.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .analytic import analytic_final_state
+from .params import PHENOTYPE_KEYS, PSI_DEATH_THRESHOLD, ROS_TOXIC_THRESHOLD, T_END, phenotype
+
+DEFAULT_CHUNK_POINTS = 2 ** 16
+OUTCOME_KEYS = ('final_psi', 'final_ros', 'collapse_time')
+
+
+def scan_spec(doses, phenotype_axes, base='Cancer (Vulnerable)', blocker=False, t_end=T_END,
+              lookup=phenotype):
+    """JSON-serializable description of a scan; identifies it on disk.
+
+    ``lookup`` resolves ``base`` to its parameters: ``phenotype`` for v4,
+    ``v3_phenotype`` for v3.
+    """
+    unknown = set(phenotype_axes) - set(PHENOTYPE_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown phenotype parameters: {sorted(unknown)}")
+    return {
+        'doses': [float(d) for d in np.atleast_1d(doses)],
+        'axes': {key: [float(v) for v in np.atleast_1d(values)]
+                 for key, values in phenotype_axes.items()},
+        'base': lookup(base),
+        'blocker': bool(blocker) if isinstance(blocker, (bool, np.bool_)) else float(blocker),
+        't_end': float(t_end),
+    }
+
+
+def _grid_shape(spec):
+    return tuple(len(values) for values in spec['axes'].values())
+
+
+def chunk_bounds(spec, chunk_points):
+    """Phenotype-index ranges so each chunk holds about ``chunk_points`` scenarios."""
+    n_phenotypes = int(np.prod(_grid_shape(spec)))
+    per_chunk = max(1, chunk_points // len(spec['doses']))
+    return [(start, min(start + per_chunk, n_phenotypes))
+            for start in range(0, n_phenotypes, per_chunk)]
+
+
+def phenotype_params(spec, start, stop):
+    """Parameter arrays for flattened phenotype indices [start, stop)."""
+    shape = _grid_shape(spec)
+    index = np.unravel_index(np.arange(start, stop), shape)
+    params = {key: np.full(stop - start, value) for key, value in spec['base'].items()}
+    for axis, (key, values) in enumerate(spec['axes'].items()):
+        params[key] = np.asarray(values)[index[axis]]
+    return params
+
+
+def _evaluate_chunk(spec, start, stop):
+    doses = np.asarray(spec['doses'])
+    params = phenotype_params(spec, start, stop)
+    final, collapse_time = analytic_final_state(
+        doses[None, :], spec['blocker'], t_end=spec['t_end'],
+        **{key: value[:, None] for key, value in params.items()})
+    shape = (stop - start, doses.size)
+    return {'final_psi': final[:, 0].reshape(shape), 'final_ros': final[:, 2].reshape(shape),
+            'collapse_time': collapse_time.reshape(shape)}
+
+
+def _chunk_path(out_dir, index):
+    return os.path.join(out_dir, f'chunk_{index:05d}.npz')
+
+
+def _run_chunk(spec, index, start, stop, out_dir):
+    result = _evaluate_chunk(spec, start, stop)
+    if out_dir is None:
+        return index, result
+    path = _chunk_path(out_dir, index)
+    partial = path + '.partial.npz'
+    np.savez(partial, **result)
+    os.replace(partial, path)
+    return index, None
+
+
+def _prepare_out_dir(out_dir, spec, bounds):
+    """Check or write the manifest; returns the chunk bounds the directory uses.
+
+    Chunk files only line up with the bounds they were written with, so a
+    resumed scan keeps the stored bounds whatever ``chunk_points`` it is
+    given.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = os.path.join(out_dir, 'scan.json')
+    if os.path.exists(manifest):
+        with open(manifest) as f:
+            stored = json.load(f)
+        if 'chunks' not in stored:
+            raise ValueError(f"{out_dir} has no chunk bounds in its manifest; "
+                             "use a new directory")
+        if {key: value for key, value in stored.items() if key != 'chunks'} != spec:
+            raise ValueError(f"{out_dir} holds a different scan; use a new directory")
+        return [tuple(chunk) for chunk in stored['chunks']]
+    with open(manifest, 'w') as f:
+        json.dump({**spec, 'chunks': bounds}, f)
+    return bounds
+
+
+def run_grid_scan(doses, phenotype_axes, base='Cancer (Vulnerable)', blocker=False,
+                  t_end=T_END, out_dir=None, chunk_points=DEFAULT_CHUNK_POINTS,
+                  max_workers=None, reference='Healthy'):
+    """Scan ``doses`` across the cartesian product of ``phenotype_axes``.
+
+    ``phenotype_axes`` maps phenotype parameter names to 1-D value arrays;
+    parameters not listed come from ``base``. Returns a dict with
+    ``final_psi``, ``final_ros``, ``collapse_time`` and ``survived`` of shape
+    grid_shape + (len(doses),), the per-phenotype ``threshold_dose`` and the
+    ``therapeutic_index`` relative to the ``reference`` phenotype (both of
+    shape grid_shape), plus ``reference_threshold``.
+
+    ``max_workers=1`` runs in-process; otherwise chunks go to a process pool
+    (default: all cores). With ``out_dir`` set, completed chunks persist and
+    are skipped on rerun; a rerun keeps the chunk layout already on disk.
+    """
+    spec = scan_spec(doses, phenotype_axes, base, blocker, t_end)
+    shape = _grid_shape(spec)
+    n_doses = len(spec['doses'])
+    bounds = chunk_bounds(spec, chunk_points)
+    if out_dir is not None:
+        bounds = _prepare_out_dir(out_dir, spec, bounds)
+
+    results = {key: np.empty((int(np.prod(shape)), n_doses)) for key in OUTCOME_KEYS}
+    pending = []
+    for index, (start, stop) in enumerate(bounds):
+        if out_dir is not None and os.path.exists(_chunk_path(out_dir, index)):
+            continue
+        pending.append((index, start, stop))
+
+    def store(index, result):
+        start, stop = bounds[index]
+        if result is None:
+            with np.load(_chunk_path(out_dir, index)) as data:
+                result = {key: data[key] for key in OUTCOME_KEYS}
+        for key in OUTCOME_KEYS:
+            results[key][start:stop] = result[key]
+
+    if max_workers == 1 or len(pending) <= 1:
+        for index, start, stop in pending:
+            store(*_run_chunk(spec, index, start, stop, out_dir))
+    elif pending:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(_run_chunk, spec, index, start, stop, out_dir)
+                       for index, start, stop in pending]
+            for future in futures:
+                store(*future.result())
+    if out_dir is not None:
+        done = {index for index, _, _ in pending}
+        for index in range(len(bounds)):
+            if index not in done:
+                store(index, None)
+
+    doses = np.asarray(spec['doses'])
+    results = {key: value.reshape(shape + (n_doses,)) for key, value in results.items()}
+    results['survived'] = ((results['final_psi'] > PSI_DEATH_THRESHOLD)
+                           & (results['final_ros'] < ROS_TOXIC_THRESHOLD))
+    results['threshold_dose'] = collapse_threshold(doses, results['final_psi'],
+                                                   results['final_ros'])
+    final, _ = analytic_final_state(doses, spec['blocker'], cell_type=reference,
+                                    t_end=spec['t_end'])
+    results['reference_threshold'] = float(collapse_threshold(doses, final[:, 0], final[:, 2]))
+    results['therapeutic_index'] = therapeutic_index(results['reference_threshold'],
+                                                     results['threshold_dose'])
+    results['doses'] = doses
+    results['axes'] = {key: np.asarray(values) for key, values in spec['axes'].items()}
+    return results
+
+
+def collapse_threshold(doses, final_psi, final_ros):
+    """Lowest dose at which the SURVIVED/COLLAPSED outcome flips to COLLAPSED.
+
+    Uses the survival margin ``min(Psi - 0.4, 2.0 - ROS)`` at t_end along the
+    last axis and interpolates its first zero crossing linearly between grid
+    doses: the IC50-equivalent of the deterministic model. Returns the first
+    dose if the phenotype already collapses there and inf if it survives the
+    whole grid.
+    """
+    doses = np.asarray(doses, dtype=float)
+    margin = np.minimum(final_psi - PSI_DEATH_THRESHOLD, ROS_TOXIC_THRESHOLD - final_ros)
+    collapsed = margin <= 0
+    first = np.argmax(collapsed, axis=-1)
+    any_collapse = collapsed.any(axis=-1)
+    previous = np.maximum(first - 1, 0)
+    m0 = np.take_along_axis(margin, previous[..., None], axis=-1)[..., 0]
+    m1 = np.take_along_axis(margin, first[..., None], axis=-1)[..., 0]
+    d0, d1 = doses[previous], doses[first]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing = d0 + (d1 - d0) * m0 / (m0 - m1)
+    threshold = np.where(first == 0, doses[0], crossing)
+    return np.where(any_collapse, threshold, np.inf)
+
+
+def therapeutic_index(reference_threshold, threshold_dose):
+    """Healthy/cancer therapeutic index: reference collapse dose over each phenotype's.
+
+    inf where the reference never collapses within the scanned doses (the
+    index is then only bounded below by ``max(doses) / threshold_dose``).
+    """
+    with np.errstate(divide='ignore'):
+        return np.asarray(reference_threshold, dtype=float) / np.asarray(threshold_dose)
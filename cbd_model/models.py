@@ -0,0 +1,253 @@
+"""Right-hand sides of model versions v1-v4.
+
+These are the reference equations from the ``simulation_v*.py`` scripts, in
+the ``odeint`` calling convention ``f(state, t, *args)``, each with its exact
+Jacobian for ``odeint``'s ``Dfun``. The ``terms_v*`` functions hold the
+dose and phenotype dependence; the state enters only linearly plus the Apop
+trigger. The module depends only on ``params`` so that importing it costs
+milliseconds; solvers live in ``solvers``, ``batch``, ``analytic`` and
+``events``, and ``codegen`` compiles specialized right-hand sides.
+"""
+from .params import (
+    APOP_RATE, EC50_TRPV1, Kd_VDAC, PHENOTYPES, PROTECTION_MAX, PROTECTION_RESPIRATION,
+    PSI_DEATH_THRESHOLD, PSI_DECAY, ROS_BASAL_GENERATION, ROS_DAMAGE, ROS_LEAK_YIELD,
+    ROS_TOXIC_THRESHOLD, V1_CELL_RESILIENCE, V1_G_MAX, V1_PROTECTION_EC50,
+    V1_PROTECTION_MAX, V1_PSI_DEATH_THRESHOLD, V2_BLOCKER_INHIBITION, V2_G_MAX,
+    V2_PSI_DEATH_THRESHOLD, V3_BLOCKER_INHIBITION, V3_PHENOTYPES, V3_PROTECTION_RESPIRATION,
+    V3_PROTECTION_SCAVENGING, V3_PSI_DEATH_THRESHOLD, V3_ROS_BASAL_GENERATION,
+    V3_ROS_DAMAGE, V3_ROS_LEAK_YIELD, BLOCKER_INHIBITION,
+)
+
+STATE_LABELS = {
+    'v1': ('Psi', 'Apop'),
+    'v2': ('Psi', 'Apop'),
+    'v3': ('Psi', 'Apop', 'ROS'),
+    'v4': ('Psi', 'Apop', 'ROS'),
+}
+
+
+def blocker_factor(blocker, blocked):
+    """Fraction of VDAC binding the ``blocker`` argument leaves.
+
+    True stands for the model's boolean blocker and gives ``blocked``; False
+    gives 1.0. Anything else is an inhibition factor, such as
+    ``inhibition_factor`` of a blocker concentration, and passes through.
+    Sequences and arrays are converted element by element, so a mixed
+    ``[True, 0.5]`` keeps its boolean blocker.
+    """
+    if blocker is True or blocker is False:
+        return blocked if blocker else 1.0
+    dtype = getattr(blocker, 'dtype', None)
+    if isinstance(blocker, (list, tuple)) or (dtype is not None and dtype.kind in 'bO'):
+        import numpy as np
+        blocker = np.asarray(blocker, dtype=object if dtype is None else None)
+        if blocker.dtype == bool:
+            return np.where(blocker, blocked, 1.0)
+        convert = np.frompyfunc(lambda value: blocker_factor(
+            bool(value) if isinstance(value, np.bool_) else value, blocked), 1, 1)
+        return np.asarray(convert(blocker), dtype=float)
+    return blocker
+
+
+def terms_v1(cbd_conc, blocker_presence, cell_resilience=V1_CELL_RESILIENCE):
+    """``(ros_generation, ros_removal_rate, psi_drive)``; v1 has no ROS state."""
+    # Therapeutic pathway: effect peaks at low dose (2-5uM) and saturates
+    protection_signal = (cbd_conc / (V1_PROTECTION_EC50 + cbd_conc)) * V1_PROTECTION_MAX
+
+    # Cytotoxic pathway: Hill occupancy of VDAC1; a boolean blocker removes binding entirely
+    effective_binding = (blocker_factor(blocker_presence, 0.0)
+                         * (cbd_conc**2 / (Kd_VDAC**2 + cbd_conc**2)))
+    leak_current = V1_G_MAX * effective_binding
+
+    # Respiration is boosted by protection_signal, hurt by low resilience
+    respiration_rate = 1.0 + protection_signal - (1.0 - cell_resilience)
+    return 0.0, 0.0, respiration_rate - leak_current
+
+
+def terms_v2(cbd_conc, blocker_presence, cell_resilience):
+    """``(ros_generation, ros_removal_rate, psi_drive)``; v2 has no ROS state."""
+    # Therapeutic pathway (TRPV1): peaks at low dose, saturates
+    protection_signal = (cbd_conc / (EC50_TRPV1 + cbd_conc)) * PROTECTION_MAX
+
+    # Cytotoxic pathway (VDAC1); VBIT-4 reduces binding efficiency by 95%
+    inhibition_factor = blocker_factor(blocker_presence, V2_BLOCKER_INHIBITION)
+    effective_binding = inhibition_factor * (cbd_conc**2 / (Kd_VDAC**2 + cbd_conc**2))
+    leak_current = V2_G_MAX * effective_binding
+
+    respiration_rate = 1.0 + protection_signal - (1.0 - cell_resilience)
+    return 0.0, 0.0, respiration_rate - leak_current
+
+
+def terms_v3(cbd_conc, blocker_presence, cell_type):
+    """``(ros_generation, ros_removal_rate, psi_drive)`` of the v3 equations."""
+    p = V3_PHENOTYPES['Healthy' if cell_type == 'Healthy' else 'Cancer (Vulnerable)']
+
+    protection_signal = (cbd_conc / (EC50_TRPV1 + cbd_conc)) * PROTECTION_MAX
+
+    inhibition_factor = blocker_factor(blocker_presence, V3_BLOCKER_INHIBITION)
+    effective_binding = inhibition_factor * (cbd_conc**2 / (Kd_VDAC**2 + cbd_conc**2))
+    vdac_leak = p['g_max'] * effective_binding
+
+    # ROS: scavenging vs generation
+    ros_generation = V3_ROS_BASAL_GENERATION + (vdac_leak * V3_ROS_LEAK_YIELD)
+    ros_removal_rate = p['scavenging_capacity'] + (protection_signal * V3_PROTECTION_SCAVENGING)
+
+    # Potential: respiration vs leak (ROS damage and decay act on the state)
+    respiration = (p['respiration_max'] + protection_signal * V3_PROTECTION_RESPIRATION
+                   - (1.0 - p['resilience']))
+    return ros_generation, ros_removal_rate, respiration - vdac_leak
+
+
+def terms_v4(cbd_conc, blocker_presence, cell_type):
+    """``(ros_generation, ros_removal_rate, psi_drive)`` of the v4 equations."""
+    # Divergent resilience parameters; see PARAMETER JUSTIFICATION in simulation_v4_honest.py
+    p = PHENOTYPES['Healthy' if cell_type == 'Healthy' else 'Cancer (Vulnerable)']
+
+    # The "hit": CBD binds VDAC1/2
+    inhibition_factor = blocker_factor(blocker_presence, BLOCKER_INHIBITION)
+    effective_binding = inhibition_factor * (cbd_conc**2 / (Kd_VDAC**2 + cbd_conc**2))
+    vdac_leak = p['g_max'] * effective_binding
+
+    # The protective signal (TRPV1)
+    protection_signal = (cbd_conc / (EC50_TRPV1 + cbd_conc)) * PROTECTION_MAX
+
+    # ROS generation proportional to VDAC leak; scavenging boosted by protection
+    ros_generation = ROS_BASAL_GENERATION + (vdac_leak * ROS_LEAK_YIELD)
+    ros_removal_rate = p['scavenging_capacity'] + protection_signal
+
+    respiration = (p['respiration_max'] + (protection_signal * PROTECTION_RESPIRATION)
+                   - (1.0 - p['resilience']))
+    return ros_generation, ros_removal_rate, respiration - vdac_leak
+
+
+def system_dynamics_v1(state, t, cbd_conc, blocker_presence, cell_resilience=V1_CELL_RESILIENCE):
+    """
+    state[0] = Mitochondrial Membrane Potential (Psi)
+    state[1] = Apoptotic Factors (Cytochrome C release)
+    """
+    Psi, Apop = state
+    _, _, psi_drive = terms_v1(cbd_conc, blocker_presence, cell_resilience)
+
+    # Potential is maintained by respiration, drained by leak and basal decay
+    dPsi_dt = psi_drive - (PSI_DECAY * Psi)
+
+    trigger = 1.0 if Psi < V1_PSI_DEATH_THRESHOLD else 0.0
+    dApop_dt = trigger * APOP_RATE
+
+    return [dPsi_dt, dApop_dt]
+
+
+def system_dynamics_v2(state, t, cbd_conc, blocker_presence, cell_resilience):
+    """
+    state[0] = Mitochondrial Membrane Potential (Psi)
+    state[1] = Apoptotic Factors (Cytochrome C release)
+    """
+    Psi, Apop = state
+    _, _, psi_drive = terms_v2(cbd_conc, blocker_presence, cell_resilience)
+
+    dPsi_dt = psi_drive - (PSI_DECAY * Psi)
+
+    trigger = 1.0 if Psi < V2_PSI_DEATH_THRESHOLD else 0.0
+    dApop_dt = trigger * APOP_RATE
+
+    return [dPsi_dt, dApop_dt]
+
+
+def system_dynamics_v3(state, t, cbd_conc, blocker_presence, cell_type):
+    """
+    state[0] = Mitochondrial Membrane Potential (Psi)
+    state[1] = Apoptotic Factors (Cytochrome C)
+    state[2] = ROS Levels
+    """
+    Psi, Apop, ROS = state
+    ros_generation, ros_removal_rate, psi_drive = terms_v3(cbd_conc, blocker_presence, cell_type)
+
+    dROS_dt = ros_generation - ros_removal_rate * ROS
+    dPsi_dt = psi_drive - (V3_ROS_DAMAGE * ROS) - (PSI_DECAY * Psi)
+
+    trigger = 1.0 if (Psi < V3_PSI_DEATH_THRESHOLD or ROS > ROS_TOXIC_THRESHOLD) else 0.0
+    dApop_dt = trigger * APOP_RATE
+
+    return [dPsi_dt, dApop_dt, dROS_dt]
+
+
+def system_dynamics_v4(state, t, cbd_conc, blocker_presence, cell_type):
+    """
+    state[0] = Mitochondrial Membrane Potential (Psi)
+    state[1] = Apoptotic Factors (Cytochrome C)
+    state[2] = ROS Levels
+    """
+    Psi, Apop, ROS = state
+    ros_generation, ros_removal_rate, psi_drive = terms_v4(cbd_conc, blocker_presence, cell_type)
+
+    dROS_dt = ros_generation - ros_removal_rate * ROS
+    # Potential: respiration vs leak vs ROS damage
+    dPsi_dt = psi_drive - (ROS_DAMAGE * ROS) - (PSI_DECAY * Psi)
+
+    # Apoptosis trigger: Psi < 0.4 or ROS > 2.0
+    trigger = 1.0 if (Psi < PSI_DEATH_THRESHOLD or ROS > ROS_TOXIC_THRESHOLD) else 0.0
+    dApop_dt = trigger * APOP_RATE
+
+    return [dPsi_dt, dApop_dt, dROS_dt]
+
+
+# The Apop trigger is piecewise constant in Psi and ROS, so its derivative is
+# zero wherever it is defined; every Jacobian below is exact off the thresholds
+# and constant in the state, depending only on the scenario arguments.
+
+def jacobian_v1(state, t, cbd_conc, blocker_presence, cell_resilience=V1_CELL_RESILIENCE):
+    """``[[dPsi'/dPsi, dPsi'/dApop], [dApop'/dPsi, dApop'/dApop]]`` (odeint ``Dfun``)."""
+    return [[-PSI_DECAY, 0.0],
+            [0.0, 0.0]]
+
+
+def jacobian_v2(state, t, cbd_conc, blocker_presence, cell_resilience):
+    """Jacobian of ``system_dynamics_v2`` in odeint ``Dfun`` row layout."""
+    return [[-PSI_DECAY, 0.0],
+            [0.0, 0.0]]
+
+
+def jacobian_v3(state, t, cbd_conc, blocker_presence, cell_type):
+    """Jacobian of ``system_dynamics_v3`` in odeint ``Dfun`` row layout."""
+    _, ros_removal_rate, _ = terms_v3(cbd_conc, blocker_presence, cell_type)
+    return [[-PSI_DECAY, 0.0, -V3_ROS_DAMAGE],
+            [0.0, 0.0, 0.0],
+            [0.0, 0.0, -ros_removal_rate]]
+
+
+def jacobian_v4(state, t, cbd_conc, blocker_presence, cell_type):
+    """Jacobian of ``system_dynamics_v4`` in odeint ``Dfun`` row layout."""
+    _, ros_removal_rate, _ = terms_v4(cbd_conc, blocker_presence, cell_type)
+    return [[-PSI_DECAY, 0.0, -ROS_DAMAGE],
+            [0.0, 0.0, 0.0],
+            [0.0, 0.0, -ros_removal_rate]]
+
+
+SYSTEM_DYNAMICS = {
+    'v1': system_dynamics_v1,
+    'v2': system_dynamics_v2,
+    'v3': system_dynamics_v3,
+    'v4': system_dynamics_v4,
+}
+
+JACOBIANS = {
+    'v1': jacobian_v1,
+    'v2': jacobian_v2,
+    'v3': jacobian_v3,
+    'v4': jacobian_v4,
+}
+
+# Per-version constants of the common form
+#     dPsi/dt = psi_drive - ros_damage * ROS - psi_decay * Psi
+#     dROS/dt = ros_generation - ros_removal_rate * ROS
+# used by code generation; v1/v2 have no ROS state (ros_threshold None).
+LINEAR_FORMS = {
+    'v1': {'terms': terms_v1, 'ros_damage': 0.0, 'psi_threshold': V1_PSI_DEATH_THRESHOLD,
+           'ros_threshold': None},
+    'v2': {'terms': terms_v2, 'ros_damage': 0.0, 'psi_threshold': V2_PSI_DEATH_THRESHOLD,
+           'ros_threshold': None},
+    'v3': {'terms': terms_v3, 'ros_damage': V3_ROS_DAMAGE,
+           'psi_threshold': V3_PSI_DEATH_THRESHOLD, 'ros_threshold': ROS_TOXIC_THRESHOLD},
+    'v4': {'terms': terms_v4, 'ros_damage': ROS_DAMAGE,
+           'psi_threshold': PSI_DEATH_THRESHOLD, 'ros_threshold': ROS_TOXIC_THRESHOLD},
+}
@@ -0,0 +1,257 @@
+"""Streaming Monte Carlo over v4 parameter uncertainty.
+
+Every v4 constant is a point estimate; the PARAMETER JUSTIFICATION block in
+``simulation_v4_honest.py`` quotes ranges rather than values for most of them.
+This runner samples Kd_VDAC, EC50_TRPV1 and the four phenotype parameters from
+configurable distributions, pushes them through the closed-form v4 outcome in
+fixed-size batches and keeps only mergeable online statistics:
+
+- survival count (the SURVIVED rule of the v4 summary at t_end),
+- fixed-bin histograms of final Psi and ROS, from which quantiles are read,
+  plus exact min/max and running mean/variance,
+- a time-to-collapse histogram and the number of scenarios that never collapse.
+
+Memory is set by ``batch_size`` and the bin counts, not by ``n_samples``.
+Samples are drawn in blocks of ``SAMPLE_BLOCK``, block j always from
+``SeedSequence(seed, spawn_key=(j,))``, and a batch draws the blocks it
+overlaps. Sample i is therefore the same for any ``batch_size`` and whichever
+worker ran its batch: counts and histograms depend only on the seed, and
+partial summaries from any split of the batch range merge with
+``merge_summaries``.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .analytic import analytic_final_state
+from .params import PSI_DEATH_THRESHOLD, ROS_TOXIC_THRESHOLD, T_END, phenotype
+
+DEFAULT_BATCH_SIZE = 100_000
+# Samples per random stream; a batch draws at most two blocks it only partly uses
+SAMPLE_BLOCK = 4096
+DEFAULT_QUANTILES = (0.025, 0.25, 0.5, 0.75, 0.975)
+
+# Histogram ranges; values outside fall into the edge bins and are still
+# counted in the exact min/max.
+PSI_RANGE = (-250.0, 50.0)
+ROS_RANGE = (0.0, 10.0)
+N_BINS = 6000
+
+# Parameter distributions as (kind, *args). Kinds: 'fixed' (value),
+# 'uniform' (low, high), 'loguniform' (low, high), 'lognormal' (median, sigma),
+# 'triangular' (low, mode, high).
+#
+# Binding constants: spread around the literature point estimates is
+# ESTIMATED (sigma 0.25 on the log scale, about +/-28%).
+BINDING_PRIORS = {
+    'kd_vdac': ('lognormal', 11.0, 0.25),      # Rimmerman et al. 2013
+    'ec50_trpv1': ('lognormal', 3.5, 0.25),    # Bisogno et al. 2001
+}
+
+# Phenotype ranges derived from the v4 PARAMETER JUSTIFICATION block.
+PHENOTYPE_PRIORS = {
+    'Healthy': {
+        'scavenging_capacity': ('uniform', 2.0, 4.0),   # ESTIMATED around 3.0
+        'g_max': ('uniform', 2.0, 3.0),                 # ESTIMATED around 2.5
+        'respiration_max': ('uniform', 2.0, 3.0),       # ESTIMATED around 2.5
+        'resilience': ('uniform', 0.9, 1.0),            # ESTIMATED around 1.0
+    },
+    'Cancer (Vulnerable)': {
+        # Healthy 3.0 reduced 2.5-10x: >2x NAFLD reduction plus depleted
+        # baseline GSH (IRIS TYPE 0, 4/5)
+        'scavenging_capacity': ('uniform', 0.3, 1.2),
+        # VDAC1 overexpressed 2-5x over healthy 2.5 (Shoshan-Barmatz 2010)
+        'g_max': ('uniform', 5.0, 12.5),
+        'respiration_max': ('uniform', 0.75, 1.25),     # ESTIMATED around 1.0
+        'resilience': ('uniform', 0.3, 0.5),            # ESTIMATED around 0.4
+    },
+}
+
+
+def default_priors(cell_type):
+    """Binding plus phenotype priors for a cell_type label (v4 string semantics)."""
+    key = 'Healthy' if cell_type == 'Healthy' else 'Cancer (Vulnerable)'
+    return {**BINDING_PRIORS, **PHENOTYPE_PRIORS[key]}
+
+
+def sample_parameters(distributions, n, rng):
+    """Draw ``n`` samples of every parameter in ``distributions``."""
+    samples = {}
+    for name, (kind, *args) in distributions.items():
+        if kind == 'fixed':
+            samples[name] = np.full(n, float(args[0]))
+        elif kind == 'uniform':
+            samples[name] = rng.uniform(args[0], args[1], n)
+        elif kind == 'loguniform':
+            samples[name] = np.exp(rng.uniform(np.log(args[0]), np.log(args[1]), n))
+        elif kind == 'lognormal':
+            samples[name] = args[0] * np.exp(args[1] * rng.standard_normal(n))
+        elif kind == 'triangular':
+            samples[name] = rng.triangular(args[0], args[1], args[2], n)
+        else:
+            raise ValueError(f"Unknown distribution kind {kind!r} for {name}")
+    return samples
+
+
+def batch_rng(seed, batch):
+    """Generator for batch ``batch``; independent of how batches are scheduled."""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(batch,)))
+
+
+def sample_range(distributions, start, stop, seed, block=SAMPLE_BLOCK):
+    """Samples ``start:stop`` of a run, independent of how the run is batched.
+
+    Sample i comes from block ``i // block``, drawn whole from
+    ``batch_rng(seed, i // block)``.
+    """
+    blocks = range(start // block, -(-stop // block))
+    drawn = [sample_parameters(distributions, block, batch_rng(seed, j)) for j in blocks]
+    offset = start - blocks.start * block
+    return {name: np.concatenate([d[name] for d in drawn])[offset:offset + stop - start]
+            for name in distributions}
+
+
+def empty_summary(t_end=T_END, n_bins=N_BINS):
+    """Zeroed accumulator; every field merges by addition or min/max."""
+    summary = {'n': 0, 'survived': 0, 'never_collapsed': 0, 't_end': float(t_end)}
+    for name in ('psi', 'ros'):
+        summary[f'{name}_hist'] = np.zeros(n_bins, dtype=np.int64)
+        summary[f'{name}_min'] = np.inf
+        summary[f'{name}_max'] = -np.inf
+        summary[f'{name}_mean'] = 0.0
+        summary[f'{name}_m2'] = 0.0
+    summary['collapse_hist'] = np.zeros(n_bins, dtype=np.int64)
+    return summary
+
+
+def _ranges(summary):
+    return {'psi': PSI_RANGE, 'ros': ROS_RANGE, 'collapse': (0.0, summary['t_end'])}
+
+
+def _binned(values, value_range, n_bins):
+    low, high = value_range
+    index = ((values - low) * (n_bins / (high - low))).astype(np.int64)
+    return np.bincount(np.clip(index, 0, n_bins - 1), minlength=n_bins)
+
+
+def batch_summary(final_psi, final_ros, collapse_time, t_end=T_END, n_bins=N_BINS):
+    """Summary of one batch of outcomes, ready to merge into a running total."""
+    summary = empty_summary(t_end, n_bins)
+    ranges = _ranges(summary)
+    collapsed = collapse_time[~np.isnan(collapse_time)]
+    summary['n'] = final_psi.size
+    summary['survived'] = int(((final_psi > PSI_DEATH_THRESHOLD)
+                               & (final_ros < ROS_TOXIC_THRESHOLD)).sum())
+    summary['never_collapsed'] = final_psi.size - collapsed.size
+    summary['collapse_hist'] = _binned(collapsed, ranges['collapse'], n_bins)
+    for name, values in (('psi', final_psi), ('ros', final_ros)):
+        summary[f'{name}_hist'] = _binned(values, ranges[name], n_bins)
+        summary[f'{name}_min'] = float(values.min())
+        summary[f'{name}_max'] = float(values.max())
+        summary[f'{name}_mean'] = float(values.mean())
+        summary[f'{name}_m2'] = float(((values - summary[f'{name}_mean']) ** 2).sum())
+    return summary
+
+
+def merge_summaries(a, b):
+    """Combine two partial summaries (Chan et al. parallel variance update)."""
+    if a['t_end'] != b['t_end']:
+        raise ValueError("Cannot merge summaries with different t_end")
+    n = a['n'] + b['n']
+    merged = {'n': n, 't_end': a['t_end']}
+    for key in ('survived', 'never_collapsed', 'collapse_hist', 'psi_hist', 'ros_hist'):
+        merged[key] = a[key] + b[key]
+    for name in ('psi', 'ros'):
+        merged[f'{name}_min'] = min(a[f'{name}_min'], b[f'{name}_min'])
+        merged[f'{name}_max'] = max(a[f'{name}_max'], b[f'{name}_max'])
+        if n == 0:
+            merged[f'{name}_mean'] = 0.0
+            merged[f'{name}_m2'] = 0.0
+            continue
+        delta = b[f'{name}_mean'] - a[f'{name}_mean']
+        merged[f'{name}_mean'] = a[f'{name}_mean'] + delta * b['n'] / n
+        merged[f'{name}_m2'] = (a[f'{name}_m2'] + b[f'{name}_m2']
+                                + delta ** 2 * a['n'] * b['n'] / n)
+    return merged
+
+
+def _histogram_quantiles(hist, value_range, low_bound, high_bound, quantiles):
+    """Quantiles by linear interpolation within bins, clamped to exact min/max."""
+    edges = np.linspace(value_range[0], value_range[1], hist.size + 1)
+    cumulative = np.concatenate([[0], np.cumsum(hist)]) / hist.sum()
+    values = np.interp(quantiles, cumulative, edges)
+    return np.clip(values, low_bound, high_bound)
+
+
+def report(summary, quantiles=DEFAULT_QUANTILES):
+    """Survival probability, quantiles and moments from a (merged) summary."""
+    n = summary['n']
+    quantiles = np.asarray(quantiles, dtype=float)
+    ranges = _ranges(summary)
+    result = {
+        'n_samples': n,
+        'survival_probability': summary['survived'] / n,
+        'collapse_probability': 1.0 - summary['never_collapsed'] / n,
+        'quantiles': quantiles,
+        'collapse_time_hist': summary['collapse_hist'],
+        'collapse_time_edges': np.linspace(*ranges['collapse'],
+                                           summary['collapse_hist'].size + 1),
+    }
+    for name in ('psi', 'ros'):
+        result[f'final_{name}_quantiles'] = _histogram_quantiles(
+            summary[f'{name}_hist'], ranges[name], summary[f'{name}_min'],
+            summary[f'{name}_max'], quantiles)
+        result[f'final_{name}_mean'] = summary[f'{name}_mean']
+        result[f'final_{name}_std'] = np.sqrt(summary[f'{name}_m2'] / max(n - 1, 1))
+    return result
+
+
+def run_batches(distributions, cbd_conc, batches, n_samples, blocker=False, seed=0,
+                batch_size=DEFAULT_BATCH_SIZE, t_end=T_END):
+    """Partial summary over the given batch indices of an ``n_samples`` run."""
+    summary = empty_summary(t_end)
+    for batch in batches:
+        n = min(batch_size, n_samples - batch * batch_size)
+        if n <= 0:
+            continue
+        start = batch * batch_size
+        params = sample_range(distributions, start, start + n, seed)
+        final, collapse_time = analytic_final_state(cbd_conc, blocker, t_end=t_end, **params)
+        summary = merge_summaries(summary, batch_summary(final[:, 0], final[:, 2],
+                                                         collapse_time, t_end))
+    return summary
+
+
+def run_monte_carlo(n_samples, cbd_conc, cell_type='Cancer (Vulnerable)',
+                    distributions=None, blocker=False, seed=0,
+                    batch_size=DEFAULT_BATCH_SIZE, t_end=T_END, max_workers=1,
+                    quantiles=DEFAULT_QUANTILES):
+    """Monte Carlo outcome statistics for one dose; returns ``report(...)``.
+
+    ``distributions`` defaults to ``default_priors(cell_type)``; any of the
+    six v4 parameters missing from it keeps its calibrated value for
+    ``cell_type``. With ``max_workers`` other than 1 (None: all cores) the
+    batch range is split round-robin across a process pool and the partial
+    summaries are merged. Counts and histograms are identical for any
+    ``batch_size`` and ``max_workers``; means and variances are equal up to
+    rounding.
+    """
+    distributions = default_priors(cell_type) if distributions is None else distributions
+    distributions = {**{key: ('fixed', value) for key, value in phenotype(cell_type).items()},
+                     **distributions}
+    n_batches = -(-n_samples // batch_size)
+    args = (distributions, cbd_conc)
+    kwargs = dict(n_samples=n_samples, blocker=blocker, seed=seed,
+                  batch_size=batch_size, t_end=t_end)
+    if max_workers == 1 or n_batches == 1:
+        summary = run_batches(*args, range(n_batches), **kwargs)
+    else:
+        workers = min(max_workers or os.cpu_count(), n_batches)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_batches, *args, range(w, n_batches, workers), **kwargs)
+                       for w in range(workers)]
+            summary = empty_summary(t_end)
+            for future in futures:
+                summary = merge_summaries(summary, future.result())
+    return report(summary, quantiles)
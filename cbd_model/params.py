@@ -0,0 +1,110 @@
+"""V4.1 "Honest Calibration" parameters shared by the cbd_model package.
+
+Values mirror ``simulation/simulation_v4_honest.py``; see the PARAMETER
+JUSTIFICATION block in that script for literature sources and IRIS Gate Evo
+validation of each constant.
+"""
+
+Kd_VDAC = 11.0  # uM, Rimmerman et al. 2013
+EC50_TRPV1 = 3.5  # uM, Bisogno et al. 2001
+
+# VBIT-4 style blocker: reduces VDAC binding efficiency by 90%
+BLOCKER_INHIBITION = 0.1
+# Blocker as a concentration: binding is scaled by 1 - (1 - BLOCKER_INHIBITION)
+# * B^h / (IC50^h + B^h), so a saturating dose reproduces the boolean blocker
+BLOCKER_IC50 = 2.0  # uM, ESTIMATED: VBIT-4 acts at low micromolar
+BLOCKER_HILL = 1.0  # ESTIMATED
+
+# Apoptosis trigger thresholds and cytochrome c release rate
+PSI_DEATH_THRESHOLD = 0.4
+ROS_TOXIC_THRESHOLD = 2.0
+APOP_RATE = 0.8
+
+# Basal kinetics of the ROS / Psi equations
+ROS_BASAL_GENERATION = 0.1
+ROS_LEAK_YIELD = 0.3
+ROS_DAMAGE = 0.4
+PROTECTION_MAX = 0.4
+PROTECTION_RESPIRATION = 0.2
+PSI_DECAY = 0.1
+
+# [Psi, Apop, ROS] at t=0 and the default observation window
+INITIAL_STATE = (1.0, 0.0, 0.1)
+T_END = 50.0
+N_TIMEPOINTS = 400
+
+# Per-phenotype parameters, keyed by the cell_type labels used in the scripts.
+# Any cell_type other than "Healthy" is treated as the vulnerable phenotype.
+PHENOTYPES = {
+    'Healthy': {
+        'resilience': 1.0,            # Full metabolic flexibility
+        'scavenging_capacity': 3.0,   # GSH 5-10 mM baseline
+        'g_max': 2.5,                 # Normal VDAC1 density
+        'respiration_max': 2.5,       # Intact oxidative phosphorylation
+    },
+    'Cancer (Vulnerable)': {
+        'resilience': 0.4,            # Warburg-limited metabolic rerouting
+        'scavenging_capacity': 0.6,   # GSH 2-8 mM, synthesis reduced >2x
+        'g_max': 5.0,                 # VDAC1 overexpressed 2-5x
+        'respiration_max': 1.0,       # Glycolysis-dependent, limited OXPHOS
+    },
+}
+
+PHENOTYPE_KEYS = ('resilience', 'scavenging_capacity', 'g_max', 'respiration_max')
+
+
+def phenotype(cell_type):
+    """Return the parameter dict for a cell_type label (v4 string semantics)."""
+    if cell_type == 'Healthy':
+        return dict(PHENOTYPES['Healthy'])
+    return dict(PHENOTYPES['Cancer (Vulnerable)'])
+
+
+# --- V3 "EXECUTIONER ROS" CALIBRATION (simulation_v3.py) ---
+# Kept alongside v4 so the constant-dose analytic solver covers both versions.
+V3_BLOCKER_INHIBITION = 0.05
+V3_PSI_DEATH_THRESHOLD = 0.5
+V3_ROS_BASAL_GENERATION = 0.05
+V3_ROS_LEAK_YIELD = 0.15
+V3_ROS_DAMAGE = 0.5
+V3_PROTECTION_SCAVENGING = 1.0
+V3_PROTECTION_RESPIRATION = 1.0
+
+V3_PHENOTYPES = {
+    'Healthy': {
+        'resilience': 1.0,
+        'scavenging_capacity': 2.0,
+        'g_max': 0.8,
+        'respiration_max': 2.0,
+    },
+    'Cancer (Vulnerable)': {
+        'resilience': 0.4,
+        'scavenging_capacity': 0.4,
+        'g_max': 6.0,
+        'respiration_max': 1.0,
+    },
+}
+
+
+def v3_phenotype(cell_type):
+    """Return the v3 parameter dict for a cell_type label."""
+    if cell_type == 'Healthy':
+        return dict(V3_PHENOTYPES['Healthy'])
+    return dict(V3_PHENOTYPES['Cancer (Vulnerable)'])
+
+
+# --- V1 BASELINE VDAC BLOCKADE (simulation_v1.py) ---
+V1_G_MAX = 5.0                 # Max rate of ion leakage when VDAC is fully open
+V1_CELL_RESILIENCE = 0.4       # Vulnerable cell; healthy cells would be 1.0
+V1_PROTECTION_EC50 = 2.0
+V1_PROTECTION_MAX = 0.5
+V1_PSI_DEATH_THRESHOLD = 0.5
+
+# --- V2 DOSE-RESPONSE SWEEP (simulation_v2.py) ---
+V2_G_MAX = 5.0
+V2_BLOCKER_INHIBITION = 0.05   # VBIT-4 reduces binding efficiency by 95%
+V2_PSI_DEATH_THRESHOLD = 0.5
+V2_RESILIENCE = {
+    'Healthy': 0.95,
+    'Cancer (Vulnerable)': 0.4,
+}
@@ -0,0 +1,269 @@
+"""Pharmacokinetic dosing schedules driving the v4 model over weeks.
+
+Every script holds ``cbd_conc`` constant over t in [0, 50]; the justification
+block instead describes chronic oral dosing with binding that resets
+overnight. This module puts a one-compartment PK model with first-order
+absorption in front of the v4 dynamics:
+
+    d(gut)/dt = -ka * gut
+    dC/dt     =  ka * gut - ke * C,      ke = ln 2 / half_life
+
+where ``gut`` is the unabsorbed dose and C the effect-site concentration, both
+in uM of effect-site concentration. Oral doses add ``bioavailability * amount``
+to ``gut``; bolus doses add ``amount`` to C. C is fed to the v4 equations as
+``cbd_conc``, so the integrated state is [Psi, Apop, ROS, gut, C].
+
+Time is in hours, taking one v4 time unit as one hour (ESTIMATED). Runs are
+split into segments at every dose, so the solver never steps across a
+concentration jump, and within a segment the Apop thresholds are root-finding
+events as in ``cbd_model.events``. The default solver is LSODA, which switches
+to BDF when the weeks-long horizon makes the system stiff. Output is sampled
+every ``output_interval`` hours. With ``checkpoint_path`` set, the state and
+output so far are saved at every dose boundary. A rerun with the same setup
+resumes from the checkpoint, and a rerun with a later ``t_end`` extends the
+run without recomputing the earlier part.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+from scipy.integrate import solve_ivp
+
+from . import trace
+from .batch import scalar_phenotype
+from .cache import cached
+from .events import IMPLICIT_METHODS, solver_counts, threshold_events
+from .params import (
+    APOP_RATE, EC50_TRPV1, INITIAL_STATE, Kd_VDAC, PROTECTION_MAX, PROTECTION_RESPIRATION,
+    PSI_DEATH_THRESHOLD, PSI_DECAY, ROS_BASAL_GENERATION, ROS_DAMAGE, ROS_LEAK_YIELD,
+)
+
+CBD_MOLAR_MASS = 314.46  # g/mol
+
+# Human oral CBD: half-life after repeated dosing 2-5 days, 18-32 h after
+# single doses; Tmax about 2-4 h (Millar et al. 2018, Front Pharmacol 9:1365).
+# ka and the 24 h half-life are ESTIMATED from those ranges.
+PK_DEFAULTS = {
+    'ka': 0.5,               # 1/h, first-order absorption
+    'half_life': 24.0,       # h, elimination
+    'bioavailability': 1.0,  # fraction of an oral amount reaching the effect site
+}
+
+STATE_LABELS = ('Psi', 'Apop', 'ROS', 'gut', 'cbd_conc')
+
+
+def mg_to_uM(dose_mg, volume_l):
+    """Concentration (uM) of ``dose_mg`` of CBD dissolved in ``volume_l`` litres."""
+    return dose_mg / volume_l / CBD_MOLAR_MASS * 1e3
+
+
+def repeated_dosing(amount, interval=24.0, n_doses=None, start=0.0, route='oral'):
+    """Regimen of ``amount`` uM every ``interval`` hours; ``n_doses=None`` repeats forever."""
+    if route not in ('oral', 'bolus'):
+        raise ValueError(f"route must be 'oral' or 'bolus', not {route!r}")
+    return {'amount': float(amount), 'interval': float(interval),
+            'n_doses': None if n_doses is None else int(n_doses),
+            'start': float(start), 'route': route}
+
+
+def dose_events(regimens, t_end):
+    """Sorted ``(time, amount, route)`` of every dose before ``t_end``."""
+    events = []
+    for regimen in regimens:
+        n = regimen['n_doses']
+        if n is None:
+            n = max(0, int(np.ceil((t_end - regimen['start']) / regimen['interval'])))
+        for k in range(n):
+            time = regimen['start'] + k * regimen['interval']
+            if time < t_end:
+                events.append((time, regimen['amount'], regimen['route']))
+    return sorted(events, key=lambda event: event[0])
+
+
+def _v4_terms(C, phenotype_params):
+    """v4 ``(ros_generation, ros_removal_rate, psi_drive)`` at concentration C.
+
+    Scalar version of ``v4_coefficients`` without blocker (same operations, so
+    the same values), also returning the three derivatives with respect to C.
+    """
+    p = phenotype_params
+    c = max(C, 0.0)
+    vdac_leak = p['g_max'] * (c**2 / (Kd_VDAC**2 + c**2))
+    protection_signal = (c / (EC50_TRPV1 + c)) * PROTECTION_MAX
+    terms = (ROS_BASAL_GENERATION + vdac_leak * ROS_LEAK_YIELD,
+             p['scavenging_capacity'] + protection_signal,
+             (p['respiration_max'] + protection_signal * PROTECTION_RESPIRATION
+              - (1.0 - p['resilience'])) - vdac_leak)
+    if C <= 0.0:
+        return terms, (0.0, 0.0, 0.0)
+    dleak = p['g_max'] * 2.0 * c * Kd_VDAC**2 / (Kd_VDAC**2 + c**2)**2
+    dprotection = PROTECTION_MAX * EC50_TRPV1 / (EC50_TRPV1 + c)**2
+    return terms, (dleak * ROS_LEAK_YIELD, dprotection,
+                   dprotection * PROTECTION_RESPIRATION - dleak)
+
+
+def system_dynamics_v4_pk(t, y, ka, ke, triggered, phenotype_params):
+    """v4 RHS driven by the PK concentration, trigger held fixed per segment."""
+    Psi, _, ROS, gut, C = y
+    (ros_generation, ros_removal_rate, psi_drive), _ = _v4_terms(C, phenotype_params)
+    return [psi_drive - ROS_DAMAGE * ROS - PSI_DECAY * Psi,
+            APOP_RATE if triggered else 0.0,
+            ros_generation - ros_removal_rate * ROS,
+            -ka * gut,
+            ka * gut - ke * C]
+
+
+def jacobian_v4_pk(t, y, ka, ke, triggered, phenotype_params):
+    """Exact Jacobian of ``system_dynamics_v4_pk`` (``solve_ivp`` ``jac``)."""
+    _, _, ROS, _, C = y
+    (_, ros_removal_rate, _), (dgeneration, dremoval, ddrive) = _v4_terms(C, phenotype_params)
+    return np.array([
+        [-PSI_DECAY, 0.0, -ROS_DAMAGE, 0.0, ddrive],
+        [0.0, 0.0, 0.0, 0.0, 0.0],
+        [0.0, 0.0, -ros_removal_rate, 0.0, dgeneration - dremoval * ROS],
+        [0.0, 0.0, 0.0, -ka, 0.0],
+        [0.0, 0.0, 0.0, ka, -ke],
+    ])
+
+
+def _run_key(regimens, pk, phenotype_params, output_interval, method, rtol, atol):
+    """Hash of everything except t_end, so a longer run can extend a shorter one."""
+    spec = json.dumps({'regimens': regimens, 'pk': pk, 'phenotype': phenotype_params,
+                       'output_interval': output_interval, 'method': method,
+                       'rtol': rtol, 'atol': atol}, sort_keys=True)
+    return hashlib.sha256(spec.encode()).hexdigest()
+
+
+def _save_checkpoint(path, run):
+    partial = path + '.partial.npz'
+    np.savez(partial, **{key: np.asarray(value) for key, value in run.items()})
+    os.replace(partial, path)
+
+
+def _load_checkpoint(path, key):
+    with np.load(path) as data:
+        run = {name: data[name] for name in data.files}
+    if str(run['key']) != key:
+        raise ValueError(f"Checkpoint {path} belongs to a different run")
+    run['key'] = key
+    for name in ('t', 'psi_low', 'ros_high', 'collapse_time', 'n_applied'):
+        run[name] = run[name].item()
+    return run
+
+
+@cached('v4-pk', bypass=('checkpoint_path',))
+def simulate_pk(regimens, t_end, cell_type='Healthy', resilience=None,
+                scavenging_capacity=None, g_max=None, respiration_max=None, pk=None,
+                output_interval=0.25, method='LSODA', rtol=1e-8, atol=1e-10,
+                checkpoint_path=None, jacobian=True):
+    """Integrate the v4 model under dosing ``regimens`` up to ``t_end`` hours.
+
+    ``regimens`` is a list of ``repeated_dosing`` dicts; ``pk`` overrides
+    entries of ``PK_DEFAULTS``. Returns ``(t, sol, info)``: output times every
+    ``output_interval`` hours, ``sol`` with columns ``STATE_LABELS``, and
+    ``info`` with ``collapse_time`` (hours, nan if never), the number of doses
+    given and the summed solver counters. ``counted_until`` is the horizon
+    those counters cover: ``t_end``, or the checkpoint's later time when a
+    longer checkpointed run is truncated to ``t_end``. Rows on a dose time
+    show the state just after the dose, except at ``t_end`` itself: doses at
+    ``t_end`` fall outside the run. ``jacobian`` passes the exact Jacobian to
+    the implicit methods instead of letting them difference the RHS.
+    """
+    if isinstance(regimens, dict):
+        regimens = [regimens]
+    pk = {**PK_DEFAULTS, **(pk or {})}
+    params = scalar_phenotype(cell_type, resilience=resilience,
+                              scavenging_capacity=scavenging_capacity,
+                              g_max=g_max, respiration_max=respiration_max)
+    key = _run_key(regimens, pk, params, output_interval, method, rtol, atol)
+    ka, ke = pk['ka'], np.log(2.0) / pk['half_life']
+    events = dose_events(regimens, t_end)
+    n_out = int(np.floor(t_end / output_interval + 1e-9)) + 1
+    t_out = np.arange(n_out) * output_interval
+
+    if checkpoint_path is not None and os.path.exists(checkpoint_path):
+        run = _load_checkpoint(checkpoint_path, key)
+    else:
+        y0 = np.array(list(INITIAL_STATE) + [0.0, 0.0])
+        run = {'key': key, 't': 0.0, 'y': y0, 'output': np.empty((0, 5)),
+               'psi_low': bool(y0[0] < PSI_DEATH_THRESHOLD), 'ros_high': False,
+               'collapse_time': np.nan, 'n_applied': 0,
+               'stats': np.zeros(4, dtype=np.int64)}
+    t_now, y = run['t'], np.array(run['y'], dtype=float)
+    psi_low, ros_high = run['psi_low'], run['ros_high']
+    collapse_time, n_applied, stats = run['collapse_time'], run['n_applied'], run['stats']
+
+    if t_now > t_end:
+        # Checkpoint already covers this horizon: truncate, and undo the doses
+        # given exactly at t_end since they fall outside a run ending there
+        sol = run['output'][:n_out].copy()
+        if t_out[-1] == t_end:
+            for time, amount, route in dose_events(regimens, t_end + output_interval):
+                if time == t_end:
+                    sol[-1, 3 if route == 'oral' else 4] -= (
+                        pk['bioavailability'] * amount if route == 'oral' else amount)
+        if collapse_time > t_end:
+            collapse_time = np.nan
+        n_applied = len(events)
+        output = [sol]
+        # The counters are those of the longer run and are reported as such
+        counted_until = t_now
+    else:
+        output = [run['output']]
+        counted_until = t_end
+    n_done = output[0].shape[0]
+    with trace.recording('simulate_pk', method, regimens=regimens, t_end=t_end, t_start=t_now,
+                         pk=pk, jacobian=jacobian, **params) as record:
+        options = ({'jac': trace.timed(record, jacobian_v4_pk, 'jac')}
+                   if jacobian and method in IMPLICIT_METHODS else {})
+        rhs = trace.timed(record, system_dynamics_v4_pk)
+
+        while t_now < t_end:
+            while n_applied < len(events) and events[n_applied][0] <= t_now:
+                _, amount, route = events[n_applied]
+                if route == 'oral':
+                    y[3] += pk['bioavailability'] * amount
+                else:
+                    y[4] += amount
+                n_applied += 1
+            t_stop = events[n_applied][0] if n_applied < len(events) else t_end
+            triggered = psi_low or ros_high
+            segment = solve_ivp(rhs, (t_now, t_stop), y, method=method,
+                                dense_output=True, events=threshold_events(psi_low, ros_high),
+                                args=(ka, ke, triggered, params), rtol=rtol, atol=atol,
+                                **options)
+            if not segment.success:
+                raise RuntimeError(segment.message)
+            counts = solver_counts(segment, method)
+            trace.add_solve_ivp(record, counts)
+            stats = stats + np.array(counts[:4])
+
+            # Emit output strictly before the segment end; a point on a dose time
+            # belongs to the next segment and so shows the post-dose state
+            t_reached = segment.t[-1]
+            stop = np.searchsorted(t_out, t_reached, side='left')
+            if stop > n_done:
+                output.append(segment.sol(t_out[n_done:stop]).T)
+                n_done = stop
+            t_now, y = t_reached, segment.y[:, -1].copy()
+
+            if segment.status == 1:
+                psi_low ^= segment.t_events[0].size > 0
+                ros_high ^= segment.t_events[1].size > 0
+                if not triggered and (psi_low or ros_high) and np.isnan(collapse_time):
+                    collapse_time = t_reached
+            elif checkpoint_path is not None:
+                _save_checkpoint(checkpoint_path, {
+                    'key': key, 't': t_now, 'y': y, 'output': np.concatenate(output),
+                    'psi_low': psi_low, 'ros_high': ros_high, 'collapse_time': collapse_time,
+                    'n_applied': n_applied, 'stats': stats})
+        if n_done < n_out:
+            output.append(y[None, :])
+
+        sol = np.concatenate(output)
+        trace.end(record, n_doses=n_applied, collapse_time=collapse_time)
+    info = {'collapse_time': collapse_time, 'n_doses': n_applied,
+            'nfev': int(stats[0]), 'njev': int(stats[1]), 'nlu': int(stats[2]),
+            'n_steps': int(stats[3]), 'counted_until': float(counted_until)}
+    return t_out, sol, info
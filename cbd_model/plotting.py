@@ -0,0 +1,163 @@
+"""Figures for the sweep results in ``sweeps``.
+
+matplotlib is imported inside each function, so the rest of the package
+never pays for it. Figures are built with the object-oriented ``Figure`` API
+rather than pyplot: no GUI backend is selected, nothing is kept in global
+state, and figures can be rendered headless from worker processes.
+"""
+import os
+
+from .params import (
+    PSI_DEATH_THRESHOLD, ROS_TOXIC_THRESHOLD, V1_CELL_RESILIENCE, V1_PSI_DEATH_THRESHOLD,
+    V2_PSI_DEATH_THRESHOLD, V2_RESILIENCE, V3_PSI_DEATH_THRESHOLD,
+)
+
+COLORS = ['blue', 'green', 'orange', 'red']
+
+FIGURE_NAMES = {
+    'v1': 'vdac1_blockade_simulation.png',
+    'v2': 'cbd_resilience_sweep.png',
+    'v3': 'cbd_ros_executioner_v3.png',
+    'v4': 'v4_honest_resilience.png',
+}
+
+
+def _figure(**kwargs):
+    from matplotlib.figure import Figure
+    return Figure(**kwargs)
+
+
+def _save(fig, path):
+    fig.savefig(path, dpi=150, bbox_inches='tight')
+    return path
+
+
+def _by_cell_type(result, cell_type):
+    return [(scenario, sol) for scenario, sol in zip(result['scenarios'], result['solutions'])
+            if scenario['cell_type'] == cell_type]
+
+
+def plot_v1(result, path):
+    t, (sol_A, sol_B) = result['t'], result['solutions']
+    fig = _figure(figsize=(10, 6))
+    ax = fig.subplots()
+    ax.plot(t, sol_A[:, 0], 'r--', label='High Dose CBD (Unblocked)')
+    ax.plot(t, sol_B[:, 0], 'g-', label='High Dose CBD + VDAC1 Blocker')
+    ax.axhline(V1_PSI_DEATH_THRESHOLD, color='k', linestyle=':', label='Death Threshold')
+    ax.set_title(f'In Silico Test: VDAC1 Blockade in Vulnerable Cells '
+                 f'(Resilience={V1_CELL_RESILIENCE})')
+    ax.set_xlabel('Time (Arbitrary Units)')
+    ax.set_ylabel('Mitochondrial Potential')
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    return _save(fig, path)
+
+
+def plot_v2(result, path):
+    t = result['t']
+    fig = _figure(figsize=(12, 10))
+    axes = fig.subplots(len(V2_RESILIENCE), 1, sharex=True)
+    for ax, (label, resilience) in zip(axes, V2_RESILIENCE.items()):
+        doses = []
+        for scenario, sol in _by_cell_type(result, label):
+            if scenario['cbd_conc'] not in doses:
+                doses.append(scenario['cbd_conc'])
+            color = COLORS[doses.index(scenario['cbd_conc']) % len(COLORS)]
+            dose = scenario['cbd_conc']
+            if scenario['blocker']:
+                ax.plot(t, sol[:, 0], color=color, linestyle='--', alpha=0.6,
+                        label=f'CBD {dose}uM + Blocker')
+            else:
+                ax.plot(t, sol[:, 0], color=color, linestyle='-', label=f'CBD {dose}uM')
+
+        ax.axhline(V2_PSI_DEATH_THRESHOLD, color='black', linestyle=':', label='Death Threshold')
+        ax.set_title(f'Cell Type: {label} (Resilience={resilience})')
+        ax.set_ylabel(r'Mitochondrial Potential ($\Psi$)')
+        ax.legend(loc='upper right', fontsize='small', ncol=2)
+        ax.grid(True, alpha=0.3)
+
+    axes[-1].set_xlabel('Time (Arbitrary Units)')
+    fig.tight_layout()
+    return _save(fig, path)
+
+
+def plot_v3(result, path):
+    t = result['t']
+    cell_types = list(dict.fromkeys(s['cell_type'] for s in result['scenarios']))
+    fig = _figure(figsize=(15, 10))
+    axes = fig.subplots(len(cell_types), 2, sharex=True)
+    for i, cell_type in enumerate(cell_types):
+        ax_psi, ax_ros = axes[i, 0], axes[i, 1]
+        doses = []
+        for scenario, sol in _by_cell_type(result, cell_type):
+            if scenario['cbd_conc'] not in doses:
+                doses.append(scenario['cbd_conc'])
+            color = COLORS[doses.index(scenario['cbd_conc']) % len(COLORS)]
+            dose = scenario['cbd_conc']
+            if scenario['blocker']:
+                style = {'linestyle': '--', 'alpha': 0.6, 'label': f'CBD {dose}uM + Blocker'}
+            else:
+                style = {'linestyle': '-', 'label': f'CBD {dose}uM'}
+            ax_psi.plot(t, sol[:, 0], color=color, **style)
+            ax_ros.plot(t, sol[:, 2], color=color, **style)
+
+        ax_psi.axhline(V3_PSI_DEATH_THRESHOLD, color='black', linestyle=':',
+                       label=r'Death Threshold ($\Psi < 0.5$)')
+        ax_psi.set_title(rf'Cell Type: {cell_type} - Potential ($\Psi$)')
+        ax_psi.set_ylabel(r'Potential ($\Psi$)')
+        ax_psi.set_ylim(-0.5, 2.5)
+        ax_psi.grid(True, alpha=0.3)
+        ax_psi.legend(loc='upper right', fontsize='x-small', ncol=2)
+
+        ax_ros.axhline(ROS_TOXIC_THRESHOLD, color='darkred', linestyle=':',
+                       label='ROS Toxicity Threshold ($>2.0$)')
+        ax_ros.set_title(f'Cell Type: {cell_type} - ROS Levels')
+        ax_ros.set_ylabel('ROS (Arbitrary Units)')
+        ax_ros.set_ylim(0, 3.0)
+        ax_ros.grid(True, alpha=0.3)
+        ax_ros.legend(loc='upper right', fontsize='x-small', ncol=2)
+
+    axes[-1, 0].set_xlabel('Time')
+    axes[-1, 1].set_xlabel('Time')
+    fig.tight_layout()
+    return _save(fig, path)
+
+
+def plot_v4(result, path):
+    t = result['t']
+    cell_types = list(dict.fromkeys(s['cell_type'] for s in result['scenarios']))
+    fig = _figure(figsize=(15, 10))
+    axes = fig.subplots(len(cell_types), 2, sharex=True)
+    for i, cell_type in enumerate(cell_types):
+        for j, (scenario, sol) in enumerate(_by_cell_type(result, cell_type)):
+            color = COLORS[j % len(COLORS)]
+            axes[i, 0].plot(t, sol[:, 0], color=color, label=f"CBD {scenario['cbd_conc']}uM")
+            axes[i, 1].plot(t, sol[:, 2], color=color, label=f"CBD {scenario['cbd_conc']}uM")
+
+        axes[i, 0].set_title(rf'{cell_type} - Potential ($\Psi$)')
+        axes[i, 0].axhline(PSI_DEATH_THRESHOLD, color='k', linestyle='--', alpha=0.5,
+                           label='Death Threshold')
+        axes[i, 0].set_ylim(-0.5, 3.0)
+        axes[i, 0].legend(fontsize='x-small', ncol=2)
+
+        axes[i, 1].set_title(f'{cell_type} - ROS')
+        axes[i, 1].axhline(ROS_TOXIC_THRESHOLD, color='r', linestyle='--', alpha=0.5,
+                           label='Toxicity Threshold')
+        axes[i, 1].set_ylim(0, 3.0)
+        axes[i, 1].legend(fontsize='x-small', ncol=2)
+
+    fig.tight_layout()
+    return _save(fig, path)
+
+
+PLOTTERS = {
+    'v1': plot_v1,
+    'v2': plot_v2,
+    'v3': plot_v3,
+    'v4': plot_v4,
+}
+
+
+def render(model, result, out_dir):
+    """Write the figure for a sweep result into ``out_dir``; returns its path."""
+    return PLOTTERS[model](result, os.path.join(out_dir, FIGURE_NAMES[model]))
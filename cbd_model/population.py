@@ -0,0 +1,207 @@
+"""Heterogeneous cell populations: a tissue as a distribution of v4 phenotypes.
+
+``system_dynamics_v4`` knows two phenotypes. Real tissue is a spread of
+resilience, GSH scavenging capacity and VDAC1 density, and a tumour also
+carries healthy stroma. A tissue here is a mixture of components, each a
+base cell type plus distributions for its parameters (the ``montecarlo``
+prior format), and a population is ``n_cells`` individual cells drawn from it.
+
+Cells are stored as a struct of arrays: one contiguous float32 array per
+parameter plus an int8 component code, 25 bytes per cell with no per-cell
+Python objects. The population is never materialized whole during a run.
+Cells are generated and solved in chunks of ``chunk_size``. A chunk draws
+the fixed blocks of ``SAMPLE_BLOCK`` cells it overlaps, block j from
+``batch_rng(seed, j)``, so a cell's parameters depend only on the seed and
+its index, never on chunk size, worker count or scheduling. Each
+chunk is widened to float64 for the closed-form v4 solve (threshold
+crossings are sensitive to rounding), one dose at a time, and reduced to
+integer death counts per time point before the next chunk is drawn. Memory
+is set by ``chunk_size``, not ``n_cells``.
+
+A cell counts as lost from its collapse time on: the first time its Apop
+trigger fires, as in the ``montecarlo`` collapse histogram.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .analytic import analytic_final_state
+from .batch import default_time_grid
+from .montecarlo import PHENOTYPE_PRIORS, SAMPLE_BLOCK, batch_rng, sample_parameters
+from .params import (
+    EC50_TRPV1, INITIAL_STATE, Kd_VDAC, PSI_DEATH_THRESHOLD, ROS_TOXIC_THRESHOLD, phenotype,
+)
+
+DEFAULT_CHUNK_SIZE = 2 ** 17
+
+PARAMETERS = ('resilience', 'scavenging_capacity', 'g_max', 'respiration_max',
+              'kd_vdac', 'ec50_trpv1')
+
+# Tissue -> {component: (fraction, base cell type, parameter distributions)}.
+# Parameters missing from a component's distributions keep the calibrated
+# value of its base cell type (binding constants: Kd_VDAC, EC50_TRPV1).
+TISSUES = {
+    'Healthy liver': {
+        'Hepatocyte': (1.0, 'Healthy', PHENOTYPE_PRIORS['Healthy']),
+    },
+    'NAFLD liver': {
+        # GSH synthesis drops >2x in NAFLD (IRIS chronic dosing run, TYPE 0,
+        # 4/5); healthy scavenging 2.0-4.0 halved
+        'Hepatocyte (NAFLD)': (1.0, 'Healthy', {
+            **PHENOTYPE_PRIORS['Healthy'],
+            'scavenging_capacity': ('uniform', 1.0, 2.0),
+        }),
+    },
+    'HCC tumour': {
+        # Stromal share of the tumour mass is ESTIMATED
+        'HCC cell': (0.8, 'Cancer (Vulnerable)', PHENOTYPE_PRIORS['Cancer (Vulnerable)']),
+        'Stroma': (0.2, 'Healthy', PHENOTYPE_PRIORS['Healthy']),
+    },
+}
+
+
+def tissue_components(tissue):
+    """Components of a tissue name or components dict, with full distributions."""
+    components = TISSUES[tissue] if isinstance(tissue, str) else tissue
+    resolved = {}
+    for name, (fraction, cell_type, distributions) in components.items():
+        defaults = {**phenotype(cell_type), 'kd_vdac': Kd_VDAC, 'ec50_trpv1': EC50_TRPV1}
+        resolved[name] = (float(fraction), {**{key: ('fixed', value)
+                                               for key, value in defaults.items()},
+                                            **distributions})
+    return resolved
+
+
+def _sample_block(components, n, rng, dtype):
+    fractions = np.array([fraction for fraction, _ in components.values()])
+    component = rng.choice(len(fractions), n, p=fractions / fractions.sum()).astype(np.int8)
+    cells = {key: np.empty(n, dtype=dtype) for key in PARAMETERS}
+    for code, (_, distributions) in enumerate(components.values()):
+        members = np.nonzero(component == code)[0]
+        drawn = sample_parameters(distributions, members.size, rng)
+        for key in PARAMETERS:
+            cells[key][members] = drawn[key]
+    cells['component'] = component
+    return cells
+
+
+def sample_cells(components, start, stop, seed, dtype=np.float32):
+    """Struct-of-arrays for cells ``start:stop``: ``dtype`` parameters, int8 component.
+
+    Cell i comes from block ``i // SAMPLE_BLOCK``, drawn whole from
+    ``batch_rng(seed, i // SAMPLE_BLOCK)``. ``dtype`` sets the storage of the
+    parameters; the draws themselves are float64.
+    """
+    blocks = range(start // SAMPLE_BLOCK, -(-stop // SAMPLE_BLOCK))
+    drawn = [_sample_block(components, SAMPLE_BLOCK, batch_rng(seed, j), dtype)
+             for j in blocks]
+    offset = start - blocks.start * SAMPLE_BLOCK
+    return {key: np.concatenate([d[key] for d in drawn])[offset:offset + stop - start]
+            for key in drawn[0]}
+
+
+def _chunk_bounds(n_cells, chunk_size):
+    return [(start, min(start + chunk_size, n_cells))
+            for start in range(0, n_cells, chunk_size)]
+
+
+def sample_population(tissue, n_cells, seed=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """The whole population as a struct of arrays (the cells ``run_population`` solves)."""
+    components = tissue_components(tissue)
+    chunks = [sample_cells(components, start, stop, seed)
+              for start, stop in _chunk_bounds(n_cells, chunk_size)]
+    return {key: np.concatenate([c[key] for c in chunks]) for key in chunks[0]}
+
+
+def run_chunks(components, doses, tau, chunks, seed=0, blocker=False,
+               initial_state=INITIAL_STATE, keep_state=False):
+    """Death and survivor counts over the given ``(start, stop)`` cell ranges."""
+    n_components, n_times = len(components), tau.size
+    deaths = np.zeros((n_components, len(doses), n_times + 1), dtype=np.int64)
+    survived = np.zeros((n_components, len(doses)), dtype=np.int64)
+    states = []
+    for start, stop in chunks:
+        cells = sample_cells(components, start, stop, seed)
+        component = cells.pop('component').astype(np.int64)
+        params = {key: value.astype(float) for key, value in cells.items()}
+        chunk_states = []
+        for d, dose in enumerate(doses):
+            final, collapse_time = analytic_final_state(dose, blocker, t_end=tau[-1],
+                                                        initial_state=initial_state, **params)
+            # First time point at or after the collapse; n_times if never
+            index = np.searchsorted(tau, collapse_time, side='left')
+            index[np.isnan(collapse_time)] = n_times
+            deaths[:, d] += np.bincount(component * (n_times + 1) + index,
+                                        minlength=n_components * (n_times + 1)
+                                        ).reshape(n_components, n_times + 1)
+            alive = (final[:, 0] > PSI_DEATH_THRESHOLD) & (final[:, 2] < ROS_TOXIC_THRESHOLD)
+            survived[:, d] += np.bincount(component[alive], minlength=n_components)
+            if keep_state:
+                chunk_states.append((final.astype(np.float32), collapse_time.astype(np.float32)))
+        if keep_state:
+            states.append((start, chunk_states))
+    return deaths, survived, states
+
+
+def run_population(tissue, n_cells, doses, t=None, blocker=False, seed=0,
+                   chunk_size=DEFAULT_CHUNK_SIZE, initial_state=INITIAL_STATE,
+                   keep_state=False, max_workers=1):
+    """Surviving fraction of an ``n_cells`` population over time and dose.
+
+    ``tissue`` is a ``TISSUES`` name or a components dict in the same format.
+    Returns a dict with ``doses`` (D,), ``t`` (T,), ``components`` (names),
+    ``component_counts`` (C,), ``surviving_fraction`` (D, T), the fraction
+    not yet collapsed at each time, ``component_surviving_fraction``
+    (C, D, T) for each component on its own, and ``survived_fraction`` (D,),
+    the v4 summary's SURVIVED rule applied to the final state. With
+    ``keep_state`` it also holds the per-cell float32 ``final_state``
+    (D, N, 3) and ``collapse_time`` (D, N, nan if none), which cost
+    16 bytes per cell and dose.
+
+    With ``max_workers`` other than 1 (None: all cores) chunks are split
+    round-robin across a process pool. Counts are identical for any
+    ``chunk_size`` and ``max_workers``.
+    """
+    components = tissue_components(tissue)
+    doses = np.atleast_1d(np.asarray(doses, dtype=float))
+    t = default_time_grid() if t is None else np.asarray(t, dtype=float)
+    tau = t - t[0]
+    bounds = _chunk_bounds(n_cells, chunk_size)
+    kwargs = dict(seed=seed, blocker=blocker, initial_state=initial_state,
+                  keep_state=keep_state)
+    if max_workers == 1 or len(bounds) == 1:
+        parts = [run_chunks(components, doses, tau, bounds, **kwargs)]
+    else:
+        workers = min(max_workers or os.cpu_count(), len(bounds))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_chunks, components, doses, tau, bounds[w::workers],
+                                   **kwargs)
+                       for w in range(workers)]
+            parts = [future.result() for future in futures]
+    deaths = sum(part[0] for part in parts)
+    survived = sum(part[1] for part in parts)
+
+    counts = deaths[:, 0].sum(axis=-1)
+    lost = np.cumsum(deaths[..., :-1], axis=-1)
+    result = {
+        'tissue': tissue if isinstance(tissue, str) else None,
+        'doses': doses,
+        't': t,
+        'components': list(components),
+        'component_counts': counts,
+        'surviving_fraction': 1.0 - lost.sum(axis=0) / n_cells,
+        'component_surviving_fraction': 1.0 - lost / np.maximum(counts, 1)[:, None, None],
+        'survived_fraction': survived.sum(axis=0) / n_cells,
+    }
+    if keep_state:
+        final_state = np.empty((doses.size, n_cells, 3), dtype=np.float32)
+        collapse_time = np.empty((doses.size, n_cells), dtype=np.float32)
+        for part in parts:
+            for start, chunk_states in part[2]:
+                for d, (final, collapse) in enumerate(chunk_states):
+                    final_state[d, start:start + final.shape[0]] = final
+                    collapse_time[d, start:start + collapse.size] = collapse
+        result['final_state'] = final_state
+        result['collapse_time'] = collapse_time
+    return result
@@ -0,0 +1,226 @@
+"""Global sensitivity analysis (Sobol' and Morris) of the v4 outcome.
+
+Which v4 parameters separate the healthy and cancer outcomes? One-at-a-time
+edits of the constants miss interactions, so this module varies all six
+(Kd_VDAC, EC50_TRPV1 and the four phenotype parameters) together. The default
+bounds span the healthy and cancer Monte Carlo priors, so each parameter moves
+across the whole healthy-to-cancer gap.
+
+- Sobol': Saltelli design of N * (d + 2) points from a scrambled Sobol'
+  sequence; first-order indices by the Saltelli (2010) estimator, total-order
+  by Jansen's, with percentile bootstrap confidence intervals.
+- Morris: r one-at-a-time trajectories on a p-level grid; mu* (mean absolute
+  elementary effect, in output units per full parameter range), mu and sigma,
+  with a bootstrap interval on mu*.
+
+Outputs are final Psi, final ROS and the collapse time, censored at t_end for
+scenarios that never collapse. Designs are evaluated with the closed-form
+model in chunks, optionally across a process pool.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.stats import qmc
+
+from .analytic import analytic_final_state
+from .montecarlo import BINDING_PRIORS, PHENOTYPE_PRIORS
+from .params import T_END, phenotype
+
+OUTPUTS = ('final_psi', 'final_ros', 'collapse_time')
+DEFAULT_CHUNK_SIZE = 2 ** 16
+BOOTSTRAP_BLOCK_VALUES = 2 ** 22
+
+
+def bounds_from_priors(priors):
+    """(low, high) bounds from Monte Carlo priors; lognormal spans +/- 2 sigma."""
+    bounds = {}
+    for name, (kind, *args) in priors.items():
+        if kind in ('uniform', 'loguniform'):
+            bounds[name] = (args[0], args[1])
+        elif kind == 'triangular':
+            bounds[name] = (args[0], args[2])
+        elif kind == 'lognormal':
+            bounds[name] = (args[0] * np.exp(-2 * args[1]), args[0] * np.exp(2 * args[1]))
+    return bounds
+
+
+def outcome_gap_bounds():
+    """Bounds enveloping both phenotype priors plus the binding constants."""
+    healthy = bounds_from_priors(PHENOTYPE_PRIORS['Healthy'])
+    cancer = bounds_from_priors(PHENOTYPE_PRIORS['Cancer (Vulnerable)'])
+    bounds = bounds_from_priors(BINDING_PRIORS)
+    for name in healthy:
+        bounds[name] = (min(healthy[name][0], cancer[name][0]),
+                        max(healthy[name][1], cancer[name][1]))
+    return bounds
+
+
+def _scale(unit, bounds):
+    low = np.array([b[0] for b in bounds.values()])
+    high = np.array([b[1] for b in bounds.values()])
+    return low + unit * (high - low)
+
+
+def _evaluate_rows(X, names, cbd_conc, blocker, t_end, fixed):
+    params = {**fixed, **{name: X[:, j] for j, name in enumerate(names)}}
+    final, collapse_time = analytic_final_state(cbd_conc, blocker, t_end=t_end, **params)
+    return np.stack([final[:, 0], final[:, 2],
+                     np.where(np.isnan(collapse_time), t_end, collapse_time)], axis=1)
+
+
+def evaluate_design(X, names, cbd_conc=40.0, blocker=False, cell_type='Cancer (Vulnerable)',
+                    t_end=T_END, chunk_size=DEFAULT_CHUNK_SIZE, max_workers=1):
+    """Evaluate design rows ``X`` (columns ``names``) into a dict of OUTPUTS.
+
+    Parameters not in ``names`` keep their calibrated ``cell_type`` values.
+    Rows are processed ``chunk_size`` at a time; ``max_workers`` other than 1
+    (None: all cores) spreads the chunks over a process pool.
+    """
+    fixed = {key: value for key, value in phenotype(cell_type).items() if key not in names}
+    bounds = [(start, min(start + chunk_size, len(X))) for start in range(0, len(X), chunk_size)]
+    args = (names, cbd_conc, blocker, t_end, fixed)
+    if max_workers == 1 or len(bounds) <= 1:
+        parts = [_evaluate_rows(X[start:stop], *args) for start, stop in bounds]
+    else:
+        workers = min(max_workers or os.cpu_count(), len(bounds))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_evaluate_rows, (X[start:stop] for start, stop in bounds),
+                                  *([a] * len(bounds) for a in args)))
+    Y = np.concatenate(parts)
+    return {name: Y[:, j] for j, name in enumerate(OUTPUTS)}
+
+
+def saltelli_design(bounds, n_base, seed=0):
+    """Saltelli design rows [A; B; AB_1; ...; AB_d], shape (n_base * (d + 2), d)."""
+    d = len(bounds)
+    sampler = qmc.Sobol(d=2 * d, scramble=True, seed=seed)
+    if n_base & (n_base - 1) == 0:
+        base = sampler.random_base2(int(np.log2(n_base)))
+    else:
+        base = sampler.random(n_base)
+    A, B = base[:, :d], base[:, d:]
+    AB = np.repeat(A[None], d, axis=0)
+    for i in range(d):
+        AB[i, :, i] = B[:, i]
+    return _scale(np.concatenate([A, B, AB.reshape(-1, d)]), bounds)
+
+
+def _sobol_estimates(fA, fB, fAB):
+    """S1 and ST for one or more bootstrap replicates (leading axes broadcast)."""
+    variance = np.concatenate([fA, fB], axis=-1).var(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        first = (fB[..., None, :] * (fAB - fA[..., None, :])).mean(axis=-1) / variance[..., None]
+        total = 0.5 * ((fA[..., None, :] - fAB) ** 2).mean(axis=-1) / variance[..., None]
+    return first, total
+
+
+def sobol_indices(y, n_base, d, n_bootstrap=1000, confidence=0.95, seed=0):
+    """First- and total-order indices from outputs of a Saltelli design.
+
+    Returns ``S1``, ``ST`` (d,) and their bootstrap intervals ``S1_conf``,
+    ``ST_conf`` (d, 2) at the given ``confidence`` level.
+    """
+    fA, fB = y[:n_base], y[n_base:2 * n_base]
+    fAB = y[2 * n_base:].reshape(d, n_base)
+    first, total = _sobol_estimates(fA, fB, fAB)
+
+    # Resample in blocks so memory stays at about BOOTSTRAP_BLOCK_VALUES floats
+    rng = np.random.default_rng(seed)
+    block = max(1, BOOTSTRAP_BLOCK_VALUES // (n_base * (d + 2)))
+    boot_first, boot_total = [], []
+    for start in range(0, n_bootstrap, block):
+        rows = rng.integers(0, n_base, size=(min(block, n_bootstrap - start), n_base))
+        first_b, total_b = _sobol_estimates(fA[rows], fB[rows], fAB[:, rows].transpose(1, 0, 2))
+        boot_first.append(first_b)
+        boot_total.append(total_b)
+    boot_first, boot_total = np.concatenate(boot_first), np.concatenate(boot_total)
+    tail = 100 * (1 - confidence) / 2
+    return {
+        'S1': first, 'ST': total,
+        'S1_conf': np.percentile(boot_first, [tail, 100 - tail], axis=0).T,
+        'ST_conf': np.percentile(boot_total, [tail, 100 - tail], axis=0).T,
+    }
+
+
+def run_sobol(bounds=None, n_base=4096, cbd_conc=40.0, blocker=False,
+              cell_type='Cancer (Vulnerable)', t_end=T_END, n_bootstrap=1000,
+              confidence=0.95, seed=0, max_workers=1):
+    """Sobol' indices of each output over ``bounds`` (default ``outcome_gap_bounds()``).
+
+    Returns ``{'names': [...], 'n_evaluations': int, output: sobol_indices(...)}``.
+    """
+    bounds = outcome_gap_bounds() if bounds is None else bounds
+    names = list(bounds)
+    X = saltelli_design(bounds, n_base, seed)
+    Y = evaluate_design(X, names, cbd_conc, blocker, cell_type, t_end, max_workers=max_workers)
+    result = {'names': names, 'n_evaluations': len(X)}
+    for output in OUTPUTS:
+        result[output] = sobol_indices(Y[output], n_base, len(names), n_bootstrap,
+                                       confidence, seed)
+    return result
+
+
+def morris_design(bounds, n_trajectories, levels=4, seed=0):
+    """Morris trajectories, shape (n_trajectories * (d + 1), d), plus step signs.
+
+    Each trajectory starts on a random grid point and moves every factor once,
+    in random order, by delta = levels / (2 (levels - 1)) of its range, up
+    where that stays in range and down otherwise. ``signs`` (r, d) records the
+    direction of each factor's step.
+    """
+    d = len(bounds)
+    rng = np.random.default_rng(seed)
+    delta = levels / (2 * (levels - 1))
+    grid = np.arange(levels) / (levels - 1)
+    unit = np.empty((n_trajectories, d + 1, d))
+    signs = np.empty((n_trajectories, d))
+    for r in range(n_trajectories):
+        x = rng.choice(grid, size=d)
+        unit[r, 0] = x
+        for step, i in enumerate(rng.permutation(d), start=1):
+            signs[r, i] = 1.0 if x[i] + delta <= 1.0 + 1e-12 else -1.0
+            x = x.copy()
+            x[i] += signs[r, i] * delta
+            unit[r, step] = x
+    return _scale(unit.reshape(-1, d), bounds), signs, delta
+
+
+def morris_effects(y, X, bounds, signs, delta, n_bootstrap=1000, confidence=0.95, seed=0):
+    """mu*, mu and sigma of the elementary effects, with a bootstrap CI on mu*."""
+    r, d = signs.shape
+    y = y.reshape(r, d + 1)
+    low = np.array([b[0] for b in bounds.values()])
+    high = np.array([b[1] for b in bounds.values()])
+    unit = ((X - low) / (high - low)).reshape(r, d + 1, d)
+    moved = np.argmax(np.abs(np.diff(unit, axis=1)) > 1e-12, axis=2)
+    effects = np.empty((r, d))
+    rows = np.arange(r)
+    for step in range(d):
+        effects[rows, moved[:, step]] = (y[:, step + 1] - y[:, step]) / (
+            signs[rows, moved[:, step]] * delta)
+
+    rng = np.random.default_rng(seed)
+    boot = np.abs(effects[rng.integers(0, r, size=(n_bootstrap, r))]).mean(axis=1)
+    tail = 100 * (1 - confidence) / 2
+    return {
+        'mu_star': np.abs(effects).mean(axis=0),
+        'mu': effects.mean(axis=0),
+        'sigma': effects.std(axis=0, ddof=1),
+        'mu_star_conf': np.percentile(boot, [tail, 100 - tail], axis=0).T,
+    }
+
+
+def run_morris(bounds=None, n_trajectories=1000, levels=4, cbd_conc=40.0, blocker=False,
+               cell_type='Cancer (Vulnerable)', t_end=T_END, n_bootstrap=1000,
+               confidence=0.95, seed=0, max_workers=1):
+    """Morris screening of each output over ``bounds`` (default ``outcome_gap_bounds()``)."""
+    bounds = outcome_gap_bounds() if bounds is None else bounds
+    names = list(bounds)
+    X, signs, delta = morris_design(bounds, n_trajectories, levels, seed)
+    Y = evaluate_design(X, names, cbd_conc, blocker, cell_type, t_end, max_workers=max_workers)
+    result = {'names': names, 'n_evaluations': len(X)}
+    for output in OUTPUTS:
+        result[output] = morris_effects(Y[output], X, bounds, signs, delta, n_bootstrap,
+                                        confidence, seed)
+    return result
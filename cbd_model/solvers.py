@@ -0,0 +1,88 @@
+"""Per-scenario solvers for model versions v1-v4.
+
+Each ``run_simulation_v*`` reproduces the run function of the matching
+``simulation_v*.py`` script: same time grid, initial state and integrator.
+v3 and v4 default to the closed-form solution from ``analytic``; pass
+``method='odeint'`` for the scripts' original numerical integration.
+
+``odeint`` runs get the exact Jacobian from ``models`` (``jacobian=False``
+falls back to LSODA's finite differences) and, with ``generated=True``, the
+scenario-specialized RHS from ``codegen``. They report solver statistics
+to ``trace`` when tracing is on.
+"""
+import numpy as np
+from scipy.integrate import odeint
+
+from . import trace
+from .analytic import run_analytic
+from .cache import cached
+from .codegen import compile_rhs
+from .models import JACOBIANS, SYSTEM_DYNAMICS
+from .params import INITIAL_STATE, N_TIMEPOINTS, T_END
+
+
+def odeint_functions(model, args, jacobian=True, generated=False):
+    """``(func, Dfun, args)`` to pass to ``odeint`` for one scenario of ``model``."""
+    args = tuple(args)
+    if generated:
+        rhs, jac = compile_rhs(model, args)
+        return rhs, (jac if jacobian else None), ()
+    return SYSTEM_DYNAMICS[model], (JACOBIANS[model] if jacobian else None), args
+
+
+@cached('reference')
+def odeint_reference(model, t, initial_state, args, jacobian=True, generated=False):
+    """``odeint`` of a scalar model right-hand side; returns ``(t, sol)``."""
+    func, Dfun, func_args = odeint_functions(model, args, jacobian, generated)
+    with trace.recording(f'run_simulation_{model}', 'odeint', args=args, jacobian=jacobian,
+                         generated=generated) as record:
+        sol = odeint(trace.timed(record, func), list(initial_state), t, args=func_args,
+                     Dfun=trace.timed(record, Dfun, 'jac'), full_output=record is not None)
+        if record is not None:
+            sol, info = sol
+            trace.add_odeint(record, info)
+    return t, sol
+
+
+def run_simulation_v1(cbd_conc, blocker, jacobian=True, generated=False):
+    t = np.linspace(0, 50, 100)
+    initial_state = [1.0, 0.0]  # [Full Potential, No Apoptosis]
+    return odeint_reference('v1', t, initial_state, (cbd_conc, blocker), jacobian, generated)
+
+
+def run_simulation_v2(cbd_conc, blocker, resilience, jacobian=True, generated=False):
+    t = np.linspace(0, 50, 200)
+    initial_state = [1.0, 0.0]
+    return odeint_reference('v2', t, initial_state, (cbd_conc, blocker, resilience),
+                            jacobian, generated)
+
+
+def _run_linear(model, cbd_conc, blocker, cell_type, method, jacobian, generated):
+    t = np.linspace(0, T_END, N_TIMEPOINTS)
+    if method == 'analytic':
+        # Constant dose: closed-form trajectory, no integration
+        _, sol = run_analytic(cbd_conc, blocker, cell_type=cell_type, t=t,
+                              initial_state=INITIAL_STATE, model=model)
+        return t, sol[0]
+    if method != 'odeint':
+        raise ValueError(f"unknown method {method!r}; expected 'analytic' or 'odeint'")
+    return odeint_reference(model, t, INITIAL_STATE, (cbd_conc, blocker, cell_type),
+                            jacobian, generated)
+
+
+def run_simulation_v3(cbd_conc, blocker, cell_type, method='analytic', jacobian=True,
+                      generated=False):
+    return _run_linear('v3', cbd_conc, blocker, cell_type, method, jacobian, generated)
+
+
+def run_simulation_v4(cbd_conc, blocker, cell_type, method='analytic', jacobian=True,
+                      generated=False):
+    return _run_linear('v4', cbd_conc, blocker, cell_type, method, jacobian, generated)
+
+
+RUNNERS = {
+    'v1': run_simulation_v1,
+    'v2': run_simulation_v2,
+    'v3': run_simulation_v3,
+    'v4': run_simulation_v4,
+}
@@ -0,0 +1,305 @@
+"""Reaction-diffusion mode: CBD penetrating a tumour spheroid or tissue slice.
+
+Every other entry point gives all cells the same ``cbd_conc``. In spheroids
+and tissue slices the drug has to diffuse in from the medium and is taken up
+on the way, so cells deep inside see less of it. Here the concentration is a
+field C(x, t) on a grid,
+
+    dC/dt = D_cbd * laplacian(C) - uptake_rate * C,     C = C_medium outside,
+
+and every grid node carries its own v4 Psi/ROS kinetics driven by the local
+C (method of lines). Geometries:
+
+- 'radial': a spheroid of radius ``radius``, spherically symmetric, on
+  ``n_nodes`` finite-volume shells.
+- 'slice': a ``width`` x ``height`` tissue cross-section on an
+  ``n_nodes = (ny, nx)`` grid, exposed to the medium on all four edges.
+  Phenotype parameters may vary from node to node.
+
+The medium is switched to ``cbd_conc`` at t = 0 with drug-free tissue.
+
+The state is interleaved per node as [C, Psi, ROS]. Apop never feeds back,
+so, as in ``run_batch``, it is left out of the stiff solve and integrated
+afterwards from the sampled trajectories. Each node couples only to itself
+and its grid neighbours. The radial system is therefore banded (3 rows
+either side of the diagonal) and is solved by ``odeint`` with the exact
+Jacobian in LAPACK banded form. The slice couples rows ``3 * nx`` apart, so
+it goes to ``solve_ivp`` BDF with an exact sparse Jacobian factored by
+SuperLU. No dense Jacobian is ever formed.
+
+Length is in um, time in v4 units, taken as hours as in ``cbd_model.pk``
+(ESTIMATED).
+"""
+import numpy as np
+from scipy import sparse
+from scipy.integrate import odeint, solve_ivp
+
+from .batch import apoptosis_from_trajectory, resolve_phenotype, v4_coefficients
+from .models import blocker_factor
+from .params import (
+    BLOCKER_INHIBITION, EC50_TRPV1, INITIAL_STATE, Kd_VDAC, PROTECTION_MAX,
+    PROTECTION_RESPIRATION, PSI_DEATH_THRESHOLD, PSI_DECAY, ROS_DAMAGE, ROS_LEAK_YIELD,
+    ROS_TOXIC_THRESHOLD, T_END,
+)
+
+SPHEROID_RADIUS = 250.0     # um; 500 um spheroids are the usual assay size
+# Effective diffusivity in tissue, ESTIMATED: free aqueous diffusion of a
+# small molecule (~2e6 um^2/h) retarded ~200x by CBD's lipid and protein binding
+CBD_DIFFUSIVITY = 1.0e4     # um^2 / h
+# First-order cellular uptake and binding loss, ESTIMATED; with the
+# diffusivity this gives a penetration length sqrt(D / k) of 100 um
+UPTAKE_RATE = 1.0           # 1 / h
+
+GEOMETRIES = ('radial', 'slice')
+N_OUTPUT_TIMES = 51
+N_DEPTH_BINS = 50
+
+
+def _radial_grid(n, radius, diffusivity):
+    """Shell centres, depths, volumes, the diffusion operator and the medium source."""
+    dr = radius / n
+    faces = dr * np.arange(n + 1)
+    r = faces[:-1] + 0.5 * dr
+    volume = (faces[1:] ** 3 - faces[:-1] ** 3) / 3.0
+    # Conductance of each face per unit C difference; the outer face is half
+    # a cell from the medium
+    conductance = diffusivity * faces ** 2 / dr
+    conductance[-1] *= 2.0
+    lower = conductance[1:-1] / volume[1:]          # row i from C[i - 1]
+    upper = conductance[1:-1] / volume[:-1]         # row i from C[i + 1]
+    source = np.zeros(n)
+    source[-1] = conductance[-1] / volume[-1]       # times C_medium
+    diag = -(conductance[:-1] + conductance[1:]) / volume
+    laplacian = sparse.diags([lower, diag, upper], [-1, 0, 1], format='csr')
+    return r, radius - r, volume, laplacian, source
+
+
+def _slice_grid(shape, width, height, diffusivity):
+    """Node centres, depths, areas, the 5-point diffusion operator and the medium source."""
+    ny, nx = shape
+    hx, hy = width / nx, height / ny
+    x = (np.arange(nx) + 0.5) * hx
+    y = (np.arange(ny) + 0.5) * hy
+    X, Y = np.meshgrid(x, y)
+    depth = np.minimum.reduce([X, width - X, Y, height - Y]).ravel()
+
+    index = np.arange(nx * ny).reshape(ny, nx)
+    rows, cols, values = [], [], []
+    source = np.zeros((ny, nx))
+    diag = np.zeros((ny, nx))
+    for axis, h in ((1, hx), (0, hy)):
+        coupling = diffusivity / h ** 2
+        for shift in (-1, 1):
+            inside = np.roll(index, -shift, axis=axis)
+            edge = np.zeros((ny, nx), dtype=bool)
+            if axis == 1:
+                edge[:, -1 if shift == 1 else 0] = True
+            else:
+                edge[-1 if shift == 1 else 0, :] = True
+            rows.append(index[~edge])
+            cols.append(inside[~edge])
+            values.append(np.full(rows[-1].size, coupling))
+            diag -= np.where(edge, 2.0 * coupling, coupling)
+            source += np.where(edge, 2.0 * coupling, 0.0)
+    rows.append(index.ravel())
+    cols.append(index.ravel())
+    values.append(diag.ravel())
+    laplacian = sparse.csr_matrix((np.concatenate(values),
+                                   (np.concatenate(rows), np.concatenate(cols))),
+                                  shape=(nx * ny, nx * ny))
+    area = np.full(nx * ny, hx * hy)
+    return np.stack([X.ravel(), Y.ravel()], axis=-1), depth, area, laplacian, source.ravel()
+
+
+def coefficient_derivatives(cbd_conc, blocker, g_max, kd_vdac=Kd_VDAC, ec50_trpv1=EC50_TRPV1):
+    """d/dC of ``v4_coefficients``' ``(ros_generation, ros_removal_rate, psi_drive)``.
+
+    Zero where C <= 0, matching the clamp the field applies before the
+    Hill terms (``cbd_model.pk`` does the same).
+    """
+    c = np.asarray(cbd_conc, dtype=float)
+    inhibition = np.asarray(blocker_factor(blocker, BLOCKER_INHIBITION), dtype=float)
+    dleak = inhibition * g_max * 2.0 * c * kd_vdac ** 2 / (kd_vdac ** 2 + c ** 2) ** 2
+    dprotection = PROTECTION_MAX * ec50_trpv1 / (ec50_trpv1 + c) ** 2
+    positive = c > 0
+    return (np.where(positive, dleak * ROS_LEAK_YIELD, 0.0),
+            np.where(positive, dprotection, 0.0),
+            np.where(positive, dprotection * PROTECTION_RESPIRATION - dleak, 0.0))
+
+
+def _dynamics(laplacian, source, uptake_rate, blocker, given):
+    """RHS over the interleaved [C, Psi, ROS] state and the per-node v4 terms."""
+    def terms(C):
+        return v4_coefficients(np.maximum(C, 0.0), blocker, **given)
+
+    def rhs(y, t, cbd_conc):
+        state = y.reshape(-1, 3)
+        C, Psi, ROS = state[:, 0], state[:, 1], state[:, 2]
+        ros_generation, ros_removal_rate, psi_drive = terms(C)
+        dydt = np.empty_like(state)
+        dydt[:, 0] = laplacian @ C + source * cbd_conc - uptake_rate * C
+        dydt[:, 1] = psi_drive - ROS_DAMAGE * ROS - PSI_DECAY * Psi
+        dydt[:, 2] = ros_generation - ros_removal_rate * ROS
+        return dydt.ravel()
+    return rhs, terms
+
+
+def _node_jacobian(y, blocker, given, terms):
+    """Per-node entries: dPsi'/dC, dROS'/dC and dROS'/dROS."""
+    state = y.reshape(-1, 3)
+    C, ROS = np.maximum(state[:, 0], 0.0), state[:, 2]
+    _, ros_removal_rate, _ = terms(state[:, 0])
+    dgeneration, dremoval, ddrive = coefficient_derivatives(C, blocker, given['g_max'])
+    return ddrive, dgeneration - dremoval * ROS, -ros_removal_rate
+
+
+def _banded_jacobian(laplacian, uptake_rate, blocker, given, terms):
+    """``odeint`` Dfun for the radial system, ``ml = mu = 3``, row ``i - j + 3``."""
+    n = laplacian.shape[0]
+    jac = np.zeros((7, 3 * n))
+    jac[3, 0::3] = laplacian.diagonal() - uptake_rate
+    jac[0, 3::3] = laplacian.diagonal(1)            # dC_i'/dC_{i+1}
+    jac[6, 0:-3:3] = laplacian.diagonal(-1)         # dC_{i+1}'/dC_i
+    jac[3, 1::3] = -PSI_DECAY
+    jac[2, 2::3] = -ROS_DAMAGE                      # dPsi_i'/dROS_i
+
+    def Dfun(y, t, *args):
+        ddrive, dros, removal = _node_jacobian(y, blocker, given, terms)
+        jac[4, 0::3] = ddrive                       # dPsi_i'/dC_i
+        jac[5, 0::3] = dros                         # dROS_i'/dC_i
+        jac[3, 2::3] = removal
+        return jac
+    return Dfun
+
+
+def _sparse_jacobian(laplacian, uptake_rate, blocker, given, terms):
+    """``solve_ivp`` jac returning the exact Jacobian as a CSC matrix."""
+    n = laplacian.shape[0]
+    coo = laplacian.tocoo()
+    node = np.arange(n)
+    rows = np.concatenate([3 * coo.row, 3 * node, 3 * node + 1, 3 * node + 1,
+                           3 * node + 1, 3 * node + 2, 3 * node + 2])
+    cols = np.concatenate([3 * coo.col, 3 * node, 3 * node, 3 * node + 1,
+                           3 * node + 2, 3 * node, 3 * node + 2])
+    fixed = [coo.data, np.full(n, -uptake_rate)]
+
+    def jac(t, y, *args):
+        ddrive, dros, removal = _node_jacobian(y, blocker, given, terms)
+        data = np.concatenate(fixed + [ddrive, np.full(n, -PSI_DECAY), np.full(n, -ROS_DAMAGE),
+                                       dros, removal])
+        return sparse.csc_matrix((data, (rows, cols)), shape=(3 * n, 3 * n))
+    return jac
+
+
+def _profile(depth, weight, collapsed, bins):
+    """Weighted fraction of nodes not yet collapsed per depth bin, (T, n_bins)."""
+    index = np.clip(np.digitize(depth, bins) - 1, 0, bins.size - 2)
+    total = np.bincount(index, weights=weight, minlength=bins.size - 1)
+    alive = np.stack([np.bincount(index, weights=weight * ~row, minlength=bins.size - 1)
+                      for row in collapsed])
+    with np.errstate(invalid='ignore'):
+        return alive / total
+
+
+def _dead_extents(depth, collapsed, max_depth):
+    """Thickness of the contiguous dead rim and radius of the dead core, per time."""
+    order = np.argsort(depth)
+    depth, collapsed = depth[order], collapsed[:, order]
+    rim, core = np.zeros(collapsed.shape[0]), np.zeros(collapsed.shape[0])
+    for j, dead in enumerate(collapsed):
+        alive = np.nonzero(~dead)[0]
+        if alive.size == 0:
+            rim[j] = core[j] = max_depth
+            continue
+        rim[j] = depth[alive[0] - 1] if alive[0] > 0 else 0.0
+        core[j] = max_depth - depth[alive[-1] + 1] if alive[-1] + 1 < depth.size else 0.0
+    return rim, core
+
+
+def run_spheroid(cbd_conc, geometry='radial', n_nodes=1000, radius=SPHEROID_RADIUS,
+                 width=2 * SPHEROID_RADIUS, height=2 * SPHEROID_RADIUS, blocker=False,
+                 resilience=None, scavenging_capacity=None, g_max=None, respiration_max=None,
+                 cell_type='Cancer (Vulnerable)', t=None, diffusivity=CBD_DIFFUSIVITY,
+                 uptake_rate=UPTAKE_RATE, initial_state=INITIAL_STATE,
+                 n_depth_bins=N_DEPTH_BINS, rtol=1e-6, atol=1e-8, **solver_kwargs):
+    """Drug penetration and v4 outcome across a spheroid or tissue slice.
+
+    ``cbd_conc`` is the medium concentration from t = 0. For 'radial',
+    ``n_nodes`` is the number of shells; for 'slice', a ``(ny, nx)`` pair.
+    Phenotype parameters left as None come from ``cell_type``; given ones
+    may be arrays broadcasting to the nodes (shells, or the ``(ny, nx)``
+    grid). Extra keyword arguments go to ``odeint`` (radial) or
+    ``solve_ivp`` (slice).
+
+    Returns a dict with ``t`` (T,), node ``position`` (radius, or (x, y)),
+    ``depth`` below the exposed surface and ``volume`` (per-node weight),
+    trajectories ``cbd``, ``psi``, ``ros`` and ``apop`` (T, nodes),
+    ``survived`` (nodes,; the v4 SURVIVED rule at the final time),
+    ``depth_edges`` with ``survival_vs_depth`` (T, n_depth_bins), the
+    volume fraction of each depth bin whose Apop trigger has not yet fired,
+    and per time ``rim_depth``, the thickness of the contiguous dead layer
+    under the surface, and ``necrotic_core_radius``, the radius of the
+    contiguous dead region around the deepest point (both to the nearest
+    node). ``info`` holds the solver's function and Jacobian counts.
+    """
+    if geometry not in GEOMETRIES:
+        raise ValueError(f"Unknown geometry {geometry!r}; expected one of {GEOMETRIES}")
+    t = np.linspace(0.0, T_END, N_OUTPUT_TIMES) if t is None else np.asarray(t, dtype=float)
+    if geometry == 'radial':
+        position, depth, volume, laplacian, source = _radial_grid(int(n_nodes), radius,
+                                                                  diffusivity)
+        max_depth, node_shape = radius, (int(n_nodes),)
+    else:
+        node_shape = tuple(int(n) for n in n_nodes)
+        position, depth, volume, laplacian, source = _slice_grid(node_shape, width, height,
+                                                                 diffusivity)
+        max_depth = 0.5 * min(width, height)
+    n = depth.size
+
+    given = resolve_phenotype(cell_type, resilience=resilience,
+                              scavenging_capacity=scavenging_capacity,
+                              g_max=g_max, respiration_max=respiration_max)
+    given = {key: np.broadcast_to(np.asarray(value, dtype=float), node_shape).ravel()
+             for key, value in given.items()}
+    rhs, terms = _dynamics(laplacian, source, uptake_rate, blocker, given)
+
+    y0 = np.empty((n, 3))
+    y0[:, 0] = 0.0
+    y0[:, 1] = initial_state[0]
+    y0[:, 2] = initial_state[2]
+    y0 = y0.ravel()
+    if geometry == 'radial':
+        Dfun = _banded_jacobian(laplacian, uptake_rate, blocker, given, terms)
+        solver_kwargs.setdefault('mxstep', 50000)
+        flat, output = odeint(rhs, y0, t, args=(cbd_conc,), Dfun=Dfun, ml=3, mu=3,
+                              rtol=rtol, atol=atol, full_output=True, **solver_kwargs)
+        info = {'nfev': int(output['nfe'][-1]), 'njev': int(output['nje'][-1]),
+                'n_steps': int(output['nst'][-1])}
+    else:
+        jac = _sparse_jacobian(laplacian, uptake_rate, blocker, given, terms)
+        solution = solve_ivp(lambda t_, y: rhs(y, t_, cbd_conc), (t[0], t[-1]), y0, method='BDF',
+                             t_eval=t, jac=jac, rtol=rtol, atol=atol, **solver_kwargs)
+        if not solution.success:
+            raise RuntimeError(f"Spheroid solve failed: {solution.message}")
+        flat = solution.y.T
+        info = {'nfev': int(solution.nfev), 'njev': int(solution.njev),
+                'nlu': int(solution.nlu)}
+
+    state = flat.reshape(t.size, n, 3)
+    C, psi, ros = state[..., 0], state[..., 1], state[..., 2]
+    ros_generation, ros_removal_rate, psi_drive = terms(C)
+    dpsi = psi_drive - ROS_DAMAGE * ros - PSI_DECAY * psi
+    dros = ros_generation - ros_removal_rate * ros
+    apop = initial_state[1] + apoptosis_from_trajectory(t, psi.T, ros.T, dpsi.T, dros.T).T
+    collapsed = apop > initial_state[1]
+
+    edges = np.linspace(0.0, max_depth, n_depth_bins + 1)
+    rim, core = _dead_extents(depth, collapsed, max_depth)
+    return {
+        't': t, 'position': position, 'depth': depth, 'volume': volume,
+        'cbd': C, 'psi': psi, 'ros': ros, 'apop': apop,
+        'survived': (psi[-1] > PSI_DEATH_THRESHOLD) & (ros[-1] < ROS_TOXIC_THRESHOLD),
+        'depth_edges': edges,
+        'survival_vs_depth': _profile(depth, volume, collapsed, edges),
+        'rim_depth': rim, 'necrotic_core_radius': core, 'info': info,
+    }
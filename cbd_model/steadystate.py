@@ -0,0 +1,154 @@
+"""Equilibria of the v3/v4 Psi/ROS subsystem and the dose at which viability is lost.
+
+The scripts decide survival from ``sol[-1]`` after 50 time units, which
+depends on the horizon. Here survival is judged from the equilibrium instead.
+At constant dose the Psi/ROS subsystem is affine,
+
+    f(y) = J y + c,    J = [[-b, -a], [0, -k]],    c = [D, g]
+
+so its equilibrium is the root of f that a single Newton step reaches exactly
+from any state: ROS* = g / k, Psi* = (D - a ROS*) / b. J is triangular with
+eigenvalues -b and -k, so the equilibrium is unique and, for positive
+scavenging, a globally attracting stable node. There are no folds: a phenotype
+"loses its viable equilibrium" when the equilibrium crosses an apoptosis
+threshold (Psi* < 0.4 or ROS* > 2.0 in v4), a boundary-crossing bifurcation of
+the piecewise-smooth Apop trigger. Past it the trigger fires eventually, from
+any initial state, however long the run.
+
+``threshold_dose`` finds that dose by bracketing the viability margin on a
+dose grid and bisecting to a given tolerance (machine precision by default).
+``continuation`` follows it along a phenotype or binding parameter, such as
+resilience or g_max, in one vectorized pass.
+"""
+import numpy as np
+
+from .analytic import MODELS
+from .batch import resolve_phenotype
+from .params import EC50_TRPV1, Kd_VDAC
+
+STABILITY = ('stable node', 'saddle', 'unstable node', 'non-hyperbolic')
+
+
+def classify(eigenvalues):
+    """Stability label per equilibrium from its real eigenvalues (..., 2)."""
+    negative = (eigenvalues < 0).sum(axis=-1)
+    positive = (eigenvalues > 0).sum(axis=-1)
+    index = np.select([negative == 2, (negative == 1) & (positive == 1), positive == 2],
+                      [0, 1, 2], default=3)
+    return np.asarray(STABILITY)[index]
+
+
+def _equilibrium(spec, cbd_conc, blocker, given, kd_vdac, ec50_trpv1):
+    g, k, D = spec['coefficients'](cbd_conc, blocker, kd_vdac=kd_vdac,
+                                   ec50_trpv1=ec50_trpv1, **given)
+    a, b = spec['ros_damage'], spec['psi_decay']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ros = g / k
+        psi = (D - a * ros) / b
+    eigenvalues = np.stack(np.broadcast_arrays(-b, -k), axis=-1)
+    stable = (k > 0) & (b > 0)
+    margin = np.where(stable, np.minimum(psi - spec['psi_threshold'],
+                                         spec['ros_threshold'] - ros), -np.inf)
+    return psi, ros, eigenvalues, margin
+
+
+def equilibrium(cbd_conc, blocker=False, resilience=None, scavenging_capacity=None,
+                g_max=None, respiration_max=None, cell_type=None, model='v4',
+                kd_vdac=Kd_VDAC, ec50_trpv1=EC50_TRPV1):
+    """Psi/ROS equilibrium, stability and viability for broadcast scenarios.
+
+    Arguments broadcast as in ``run_batch``. Returns a dict of arrays with the
+    broadcast shape: ``psi``, ``ros``, ``eigenvalues`` (trailing axis of 2),
+    ``stability`` (labels from ``STABILITY``), ``margin`` (the survival
+    margin ``min(Psi* - psi_threshold, ros_threshold - ROS*)``, -inf where
+    the equilibrium is not a stable node) and ``viable`` (``margin > 0``).
+    """
+    spec = MODELS[model]
+    given = resolve_phenotype(cell_type, lookup=spec['phenotype'], resilience=resilience,
+                              scavenging_capacity=scavenging_capacity, g_max=g_max,
+                              respiration_max=respiration_max)
+    psi, ros, eigenvalues, margin = _equilibrium(spec, cbd_conc, blocker, given,
+                                                 kd_vdac, ec50_trpv1)
+    return {'psi': psi, 'ros': ros, 'eigenvalues': eigenvalues,
+            'stability': classify(eigenvalues), 'margin': margin, 'viable': margin > 0}
+
+
+def threshold_dose(dose_range=(0.0, 200.0), blocker=False, resilience=None,
+                   scavenging_capacity=None, g_max=None, respiration_max=None,
+                   cell_type=None, model='v4', kd_vdac=Kd_VDAC, ec50_trpv1=EC50_TRPV1,
+                   n_grid=2001, xtol=0.0):
+    """Lowest dose in ``dose_range`` at which the equilibrium stops being viable.
+
+    Scenario arguments other than the dose broadcast against each other.
+    The margin is scanned on ``n_grid`` doses to bracket its first sign
+    change, which is then bisected until the bracket is narrower than
+    ``xtol`` (or cannot shrink further in floating point). Returns a dict of
+    arrays: ``threshold_dose`` (the lower end of the range if the phenotype
+    is not viable there, inf if it stays viable throughout), ``binding``
+    ('psi' or 'ros', the threshold the equilibrium crosses; '' if none) and
+    ``psi``/``ros``, the equilibrium at the threshold dose.
+
+    The grid must be fine enough not to step over a dose window of
+    viability loss narrower than its spacing.
+    """
+    spec = MODELS[model]
+    given = resolve_phenotype(cell_type, lookup=spec['phenotype'], resilience=resilience,
+                              scavenging_capacity=scavenging_capacity, g_max=g_max,
+                              respiration_max=respiration_max)
+    params = np.broadcast_arrays(np.asarray(blocker), np.asarray(kd_vdac, dtype=float),
+                                 np.asarray(ec50_trpv1, dtype=float),
+                                 *(np.asarray(v, dtype=float) for v in given.values()))
+    shape = params[0].shape
+    blocker, kd_vdac, ec50_trpv1 = params[:3]
+    given = dict(zip(given, params[3:]))
+
+    def margin_at(doses, expand=False):
+        if expand:
+            args = [p[..., None] for p in (blocker, kd_vdac, ec50_trpv1)]
+            phenotype = {key: value[..., None] for key, value in given.items()}
+        else:
+            args, phenotype = (blocker, kd_vdac, ec50_trpv1), given
+        return _equilibrium(spec, doses, args[0], phenotype, args[1], args[2])
+
+    grid = np.linspace(dose_range[0], dose_range[1], n_grid)
+    margin = margin_at(grid, expand=True)[3]
+    lost = margin <= 0
+    first = np.argmax(lost, axis=-1)
+    any_lost = lost.any(axis=-1)
+
+    lo = grid[np.maximum(first - 1, 0)]
+    hi = grid[first]
+    bracketed = any_lost & (first > 0)
+    while True:
+        mid = 0.5 * (lo + hi)
+        open_ = bracketed & (hi - lo > xtol) & (mid > lo) & (mid < hi)
+        if not open_.any():
+            break
+        mid_lost = margin_at(mid)[3] <= 0
+        hi = np.where(open_ & mid_lost, mid, hi)
+        lo = np.where(open_ & ~mid_lost, mid, lo)
+
+    dose = np.where(any_lost, hi, np.inf)
+    psi, ros, _, _ = margin_at(np.where(any_lost, hi, dose_range[1]))
+    psi_margin = psi - spec['psi_threshold']
+    ros_margin = spec['ros_threshold'] - ros
+    binding = np.where(psi_margin <= ros_margin, 'psi', 'ros')
+    return {'threshold_dose': np.broadcast_to(dose, shape),
+            'binding': np.where(any_lost, binding, ''),
+            'psi': np.where(any_lost, psi, np.nan), 'ros': np.where(any_lost, ros, np.nan)}
+
+
+def continuation(parameter, values, cell_type='Cancer (Vulnerable)', dose_range=(0.0, 200.0),
+                 blocker=False, model='v4', n_grid=2001, xtol=0.0, **fixed):
+    """Threshold dose as a function of one parameter, holding the rest at ``cell_type``.
+
+    ``parameter`` is a phenotype key ('resilience', 'scavenging_capacity',
+    'g_max', 'respiration_max') or a binding constant ('kd_vdac',
+    'ec50_trpv1'), swept over ``values``; ``fixed`` overrides other
+    parameters. Returns the ``threshold_dose`` dict with ``values`` added.
+    """
+    values = np.asarray(values, dtype=float)
+    result = threshold_dose(dose_range, blocker=blocker, cell_type=cell_type, model=model,
+                            n_grid=n_grid, xtol=xtol, **{parameter: values}, **fixed)
+    result['values'] = values
+    return result
@@ -0,0 +1,244 @@
+"""Stochastic v4: noisy ROS generation and membrane potential.
+
+The deterministic model gives every cell of a phenotype the same fate, so it
+cannot produce the partial kills seen in viability assays. This module adds
+noise to the v4 Psi/ROS equations,
+
+    dROS = (g - k ROS) dt         + b_ros(ROS) dW_1
+    dPsi = (D - a ROS - b Psi) dt + b_psi(Psi) dW_2
+
+with ``noise='additive'`` (b = sigma) or ``'multiplicative'`` (b = sigma * X).
+The equations are integrated by Euler-Maruyama, or by Milstein, which adds the
+``0.5 b b' (dW^2 - dt)`` correction. The correction is zero for additive
+noise. ROS is truncated at zero after each step. Trajectories advance in
+lockstep as NumPy arrays, ``chunk_size`` at a time.
+
+Each Gaussian increment is a pure function of ``(seed, trajectory, step)``.
+A counter built from the trajectory and step is hashed with the SplitMix64
+finalizer, and two 24-bit fields of the hash feed Box-Muller for the two
+noise channels. There is no generator state, so trajectory i gets the same
+path whatever the chunk size, worker count or scheduling. Every dose reuses
+the same paths (common random numbers), which keeps dose-response curves
+smooth. Box-Muller from 25-bit uniforms truncates the normal at about 5.9
+sigma.
+
+A trajectory collapses at its first passage across an Apop threshold (Psi <
+0.4 or ROS > 2.0). The crossing time is interpolated linearly within the step.
+Crossings that start and end within a single step are missed, which biases
+first-passage probabilities low by O(sqrt(dt)).
+
+Noise amplitudes are ESTIMATED; nothing in the calibration constrains them.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .batch import scalar_phenotype, v4_coefficients
+from .params import (
+    APOP_RATE, INITIAL_STATE, PSI_DEATH_THRESHOLD, PSI_DECAY, ROS_DAMAGE,
+    ROS_TOXIC_THRESHOLD, T_END,
+)
+
+NOISE_KINDS = ('additive', 'multiplicative')
+SCHEMES = ('euler_maruyama', 'milstein')
+
+SIGMA_PSI = 0.1     # ESTIMATED
+SIGMA_ROS = 0.1     # ESTIMATED
+DEFAULT_DT = 0.05
+DEFAULT_CHUNK_SIZE = 2 ** 14
+N_FPT_BINS = 200
+
+_GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+_LOW_24 = np.uint64(0xFFFFFF)
+_2_POW_M25 = np.float32(2.0 ** -25)
+_TWO_PI_2_POW_M24 = np.float32(2.0 * np.pi / 2.0 ** 24)
+
+
+def stream_key(seed):
+    """64-bit key of the counter-based streams for ``seed``."""
+    return np.random.SeedSequence(seed).generate_state(1, np.uint64)[0]
+
+
+def counter_normals(key, trajectories, step):
+    """Standard normals ``(2, n)`` (float32) for trajectory ids ``trajectories`` at ``step``.
+
+    The counter ``trajectory * 2**32 + step`` is spread by the golden-ratio
+    increment and hashed with the (bijective) SplitMix64 finalizer, so
+    distinct counters never share a draw. Box-Muller runs in float32, where
+    NumPy's trigonometric functions are vectorized.
+    """
+    x = key + ((trajectories << np.uint64(32)) | np.uint64(step)) * _GOLDEN_GAMMA
+    x = (x ^ (x >> np.uint64(30))) * _MIX_1
+    x = (x ^ (x >> np.uint64(27))) * _MIX_2
+    x ^= x >> np.uint64(31)
+    u1 = ((x >> np.uint64(39)) | np.uint64(1)).astype(np.float32) * _2_POW_M25
+    angle = ((x >> np.uint64(8)) & _LOW_24).astype(np.float32) * _TWO_PI_2_POW_M24
+    radius = np.sqrt(np.float32(-2.0) * np.log(u1))
+    return np.stack([radius * np.cos(angle), radius * np.sin(angle)])
+
+
+def system_dynamics_v4_sde(Psi, ROS, ros_generation, ros_removal_rate, psi_drive,
+                           sigma_psi=SIGMA_PSI, sigma_ros=SIGMA_ROS, noise='additive'):
+    """Drift and diffusion ``(dPsi, dROS, b_psi, b_ros)`` of the stochastic v4 model."""
+    drift_psi = psi_drive - ROS_DAMAGE * ROS - PSI_DECAY * Psi
+    drift_ros = ros_generation - ros_removal_rate * ROS
+    if noise == 'additive':
+        return drift_psi, drift_ros, sigma_psi, sigma_ros
+    return drift_psi, drift_ros, sigma_psi * Psi, sigma_ros * ROS
+
+
+def _first_passage(psi_old, ros_old, psi, ros):
+    """Fraction of the step at which the trigger first switches on (nan if it does not)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s_psi = np.where(psi < PSI_DEATH_THRESHOLD,
+                         (psi_old - PSI_DEATH_THRESHOLD) / (psi_old - psi), np.inf)
+        s_ros = np.where(ros > ROS_TOXIC_THRESHOLD,
+                         (ROS_TOXIC_THRESHOLD - ros_old) / (ros - ros_old), np.inf)
+    s = np.clip(np.minimum(s_psi, s_ros), 0.0, 1.0)
+    return np.where(np.isfinite(np.minimum(s_psi, s_ros)), s, np.nan)
+
+
+def simulate_chunk(coefficients, trajectories, key, n_steps, dt, sigma_psi=SIGMA_PSI,
+                   sigma_ros=SIGMA_ROS, noise='additive', scheme='euler_maruyama',
+                   initial_state=INITIAL_STATE):
+    """Advance the trajectories with ids ``trajectories`` in lockstep.
+
+    Each step applies ``system_dynamics_v4_sde`` with the constants folded:
+    additive noise adds ``sigma sqrt(dt) Z``, multiplicative noise scales X by
+    ``1 + sigma sqrt(dt) Z`` (plus ``sigma^2 dt (Z^2 - 1) / 2`` for Milstein).
+    Returns ``(first_passage_time, final_psi, final_apop, final_ros)``, each of
+    shape (n,); first-passage times are nan for trajectories that never
+    trigger. Apop integrates the trigger by the trapezoid rule.
+    """
+    ros_generation, ros_removal_rate, psi_drive = coefficients
+    n = trajectories.size
+    psi = np.full(n, float(initial_state[0]))
+    ros = np.full(n, float(initial_state[2]))
+    psi_new, ros_new = np.empty(n), np.empty(n)
+    on = (psi < PSI_DEATH_THRESHOLD) | (ros > ROS_TOXIC_THRESHOLD)
+    on_start = on.copy()
+    on_steps = np.zeros(n, dtype=np.int64)
+    passage = np.where(on, 0.0, np.nan)
+    pending = ~on
+
+    psi_keep, ros_keep = 1.0 - PSI_DECAY * dt, 1.0 - ros_removal_rate * dt
+    psi_in, ros_in, damage = psi_drive * dt, ros_generation * dt, ROS_DAMAGE * dt
+    scale_psi, scale_ros = sigma_psi * np.sqrt(dt), sigma_ros * np.sqrt(dt)
+    additive = noise == 'additive'
+    milstein = scheme == 'milstein' and not additive
+    for step in range(n_steps):
+        z_ros, z_psi = counter_normals(key, trajectories, step)
+        if additive:
+            np.multiply(psi, psi_keep, out=psi_new)
+            psi_new += z_psi * scale_psi
+            np.multiply(ros, ros_keep, out=ros_new)
+            ros_new += z_ros * scale_ros
+        else:
+            factor_psi = z_psi * scale_psi
+            factor_ros = z_ros * scale_ros
+            if milstein:
+                factor_psi += 0.5 * scale_psi ** 2 * (z_psi * z_psi - 1.0)
+                factor_ros += 0.5 * scale_ros ** 2 * (z_ros * z_ros - 1.0)
+            np.multiply(psi, factor_psi + psi_keep, out=psi_new)
+            np.multiply(ros, factor_ros + ros_keep, out=ros_new)
+        psi_new += psi_in
+        psi_new -= damage * ros
+        ros_new += ros_in
+        np.maximum(ros_new, 0.0, out=ros_new)
+
+        on = (psi_new < PSI_DEATH_THRESHOLD) | (ros_new > ROS_TOXIC_THRESHOLD)
+        on_steps += on
+        first = on & pending
+        if first.any():
+            fraction = _first_passage(psi[first], ros[first], psi_new[first], ros_new[first])
+            passage[first] = (step + np.nan_to_num(fraction, nan=1.0)) * dt
+            pending &= ~on
+        psi, psi_new = psi_new, psi
+        ros, ros_new = ros_new, ros
+    triggered_time = dt * (on_steps - 0.5 * on + 0.5 * on_start)
+    return passage, psi, initial_state[1] + APOP_RATE * triggered_time, ros
+
+
+def run_chunks(cbd_conc, chunks, key, t_end, dt, given, blocker=False, **kwargs):
+    """``simulate_chunk`` over every dose for the given ``(start, stop)`` id ranges."""
+    doses = np.atleast_1d(np.asarray(cbd_conc, dtype=float))
+    n_steps = int(round(t_end / dt))
+    results = []
+    for start, stop in chunks:
+        trajectories = np.arange(start, stop, dtype=np.uint64)
+        per_dose = []
+        for dose in doses:
+            coefficients = [float(np.ravel(c)[0])
+                            for c in v4_coefficients(dose, blocker, **given)]
+            per_dose.append(simulate_chunk(coefficients, trajectories, key, n_steps, dt,
+                                           **kwargs))
+        results.append((start, per_dose))
+    return results
+
+
+def run_sde(cbd_conc, n_trajectories, cell_type='Cancer (Vulnerable)', resilience=None,
+            scavenging_capacity=None, g_max=None, respiration_max=None, blocker=False,
+            sigma_psi=SIGMA_PSI, sigma_ros=SIGMA_ROS, noise='additive',
+            scheme='euler_maruyama', t_end=T_END, dt=DEFAULT_DT, seed=0,
+            initial_state=INITIAL_STATE, chunk_size=DEFAULT_CHUNK_SIZE, max_workers=1,
+            n_fpt_bins=N_FPT_BINS):
+    """Collapse probability and first-passage times of the stochastic v4 model.
+
+    ``cbd_conc`` is a dose or array of D doses; phenotype parameters left as
+    None come from ``cell_type``. Returns a dict with ``doses`` (D,),
+    ``collapse_probability`` (D,), the fraction of trajectories whose
+    trigger fired by ``t_end``, ``first_passage_time`` (D, N; nan if none),
+    ``fpt_edges`` with ``fpt_density`` (D, n_fpt_bins), the first-passage
+    density over [0, t_end] (it integrates to the collapse probability),
+    ``survived_fraction`` (D,; the v4 SURVIVED rule at ``t_end``) and the
+    final ``psi``, ``apop`` and ``ros`` (D, N).
+
+    With ``max_workers`` other than 1 (None: all cores) chunks are spread
+    over a process pool; results are identical to the single-process run.
+    """
+    if noise not in NOISE_KINDS:
+        raise ValueError(f"Unknown noise {noise!r}; expected one of {NOISE_KINDS}")
+    if scheme not in SCHEMES:
+        raise ValueError(f"Unknown scheme {scheme!r}; expected one of {SCHEMES}")
+    if np.size(blocker) != 1:
+        raise ValueError("blocker must be a single value; run one run_sde per blocker")
+    doses = np.atleast_1d(np.asarray(cbd_conc, dtype=float))
+    given = scalar_phenotype(cell_type, resilience=resilience,
+                             scavenging_capacity=scavenging_capacity,
+                             g_max=g_max, respiration_max=respiration_max)
+    key = stream_key(seed)
+    chunks = [(start, min(start + chunk_size, n_trajectories))
+              for start in range(0, n_trajectories, chunk_size)]
+    args = (doses, key, t_end, dt, given)
+    kwargs = dict(blocker=blocker, sigma_psi=sigma_psi, sigma_ros=sigma_ros, noise=noise,
+                  scheme=scheme, initial_state=initial_state)
+    if max_workers == 1 or len(chunks) == 1:
+        parts = run_chunks(doses, chunks, *args[1:], **kwargs)
+    else:
+        workers = min(max_workers or os.cpu_count(), len(chunks))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_chunks, doses, chunks[w::workers], *args[1:], **kwargs)
+                       for w in range(workers)]
+            parts = [part for future in futures for part in future.result()]
+
+    outputs = np.empty((4, doses.size, n_trajectories))
+    for start, per_dose in parts:
+        for d, values in enumerate(per_dose):
+            outputs[:, d, start:start + values[0].size] = values
+    passage, psi, apop, ros = outputs
+    edges = np.linspace(0.0, t_end, n_fpt_bins + 1)
+    density = np.stack([np.histogram(p[~np.isnan(p)], bins=edges)[0] for p in passage])
+    density = density / (n_trajectories * np.diff(edges))
+    return {
+        'doses': doses,
+        'collapse_probability': (~np.isnan(passage)).mean(axis=-1),
+        'first_passage_time': passage,
+        'fpt_edges': edges,
+        'fpt_density': density,
+        'survived_fraction': ((psi > PSI_DEATH_THRESHOLD)
+                              & (ros < ROS_TOXIC_THRESHOLD)).mean(axis=-1),
+        'psi': psi, 'apop': apop, 'ros': ros,
+    }
@@ -0,0 +1,351 @@
+"""Chunked, memory-mapped store for sweeps too large to hold in memory.
+
+A dense sweep (many doses x phenotypes x 400 time points x 3 states) outgrows
+RAM long before it outgrows disk. A store is a directory:
+
+- ``store.json``: time grid, state labels, scenario parameter names, dtype,
+  chunk capacity and decimation factor.
+- ``chunk_NNNNNN.data``: raw array (capacity, T, S) of trajectories, opened
+  through ``numpy.memmap``.
+- ``chunk_NNNNNN.minmaxL``: min/max pyramid level L, an array
+  (capacity, ceil(T / factor**L), S, 2), written together with the data.
+- ``chunk_NNNNNN.index.npy``: the chunk's index, one row of scenario
+  parameters per stored trajectory.
+
+Writers claim chunk numbers by exclusive file creation, so any number of
+processes can append to one store at once without coordination. A chunk
+becomes visible when its index is renamed into place at sealing (when it is
+full, or when the writer closes), so readers never see half-written results.
+
+Readers load only the indexes. ``select`` finds scenarios by parameter value
+or range, and ``read`` maps just the chunks that hold them. For plotting,
+``read_decimated`` serves per-bin min/max envelopes from the coarsest pyramid
+level that still has enough points, so a 1000-point plot of a long
+trajectory touches a few kB per scenario.
+"""
+import contextlib
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .analytic import MODELS, run_analytic
+from .batch import default_time_grid
+from .gridscan import chunk_bounds, phenotype_params, scan_spec
+from .models import STATE_LABELS
+from .params import PHENOTYPE_KEYS
+
+STORE_FORMAT = 1
+DEFAULT_CHUNK_SCENARIOS = 4096
+DEFAULT_DECIMATION = 16
+# Pyramid levels stop once they are this short
+MIN_LEVEL_POINTS = 16
+
+
+def _meta_path(path):
+    return os.path.join(path, 'store.json')
+
+
+def _chunk_prefix(path, chunk):
+    return os.path.join(path, f'chunk_{chunk:06d}')
+
+
+def _level_lengths(n_times, decimation):
+    """Time points at each pyramid level; level 0 is the raw grid."""
+    lengths = [n_times]
+    while -(-lengths[-1] // decimation) >= MIN_LEVEL_POINTS:
+        lengths.append(-(-lengths[-1] // decimation))
+    return lengths
+
+
+def create_store(path, t, state_labels, param_names, dtype='float32',
+                 chunk_scenarios=DEFAULT_CHUNK_SCENARIOS, decimation=DEFAULT_DECIMATION):
+    """Create an empty store at ``path``, or check that an existing one matches.
+
+    ``param_names`` are the scenario parameters every appended trajectory is
+    indexed by (for example ``('cbd_conc', 'resilience')``). Returns the
+    store metadata.
+    """
+    t = np.asarray(t, dtype=float)
+    meta = {
+        'format': STORE_FORMAT,
+        't': t.tolist(),
+        'state_labels': list(state_labels),
+        'param_names': list(param_names),
+        'dtype': np.dtype(dtype).name,
+        'chunk_scenarios': int(chunk_scenarios),
+        'decimation': int(decimation),
+        'level_lengths': _level_lengths(t.size, int(decimation)),
+    }
+    os.makedirs(path, exist_ok=True)
+    if os.path.exists(_meta_path(path)):
+        with open(_meta_path(path)) as f:
+            if json.load(f) != meta:
+                raise ValueError(f"{path} holds a different store; use a new directory")
+        return meta
+    partial = _meta_path(path) + '.partial'
+    with open(partial, 'w') as f:
+        json.dump(meta, f)
+    os.replace(partial, _meta_path(path))
+    return meta
+
+
+def load_meta(path):
+    """Metadata of the store at ``path``."""
+    with open(_meta_path(path)) as f:
+        meta = json.load(f)
+    if meta.get('format') != STORE_FORMAT:
+        raise ValueError(f"{path} has store format {meta.get('format')}, "
+                         f"expected {STORE_FORMAT}")
+    return meta
+
+
+def _claim_chunk(path):
+    """Next free chunk number, reserved by exclusive creation of its data file."""
+    existing = glob.glob(os.path.join(path, 'chunk_*.data'))
+    chunk = 1 + max((int(os.path.basename(p)[6:12]) for p in existing), default=-1)
+    while True:
+        try:
+            os.close(os.open(_chunk_prefix(path, chunk) + '.data',
+                             os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return chunk
+        except FileExistsError:
+            chunk += 1
+
+
+def _level_array(path, meta, chunk, level, mode='r'):
+    """Memmap of a chunk's raw data (level 0) or min/max pyramid level."""
+    capacity, n_states = meta['chunk_scenarios'], len(meta['state_labels'])
+    length = meta['level_lengths'][level]
+    prefix = _chunk_prefix(path, chunk)
+    if level == 0:
+        return np.memmap(prefix + '.data', dtype=meta['dtype'], mode=mode,
+                         shape=(capacity, length, n_states))
+    return np.memmap(f'{prefix}.minmax{level}', dtype=meta['dtype'], mode=mode,
+                     shape=(capacity, length, n_states, 2))
+
+
+def _min_max(values, factor):
+    """Blockwise min/max over the time axis (1) of (n, T, S) or (n, T, S, 2) arrays."""
+    starts = np.arange(0, values.shape[1], factor)
+    if values.ndim == 3:
+        return np.stack([np.minimum.reduceat(values, starts, axis=1),
+                         np.maximum.reduceat(values, starts, axis=1)], axis=-1)
+    return np.stack([np.minimum.reduceat(values[..., 0], starts, axis=1),
+                     np.maximum.reduceat(values[..., 1], starts, axis=1)], axis=-1)
+
+
+@contextlib.contextmanager
+def store_writer(path):
+    """Context manager yielding ``append(params, solutions)`` for the store at ``path``.
+
+    ``params`` maps each of the store's parameter names to an (n,) array (or
+    scalar) and ``solutions`` is (n, T, S). Each writer fills its own chunks,
+    so writers in separate processes can append concurrently. The open chunk
+    is sealed when the block exits, even on error, keeping what was written.
+    """
+    meta = load_meta(path)
+    capacity = meta['chunk_scenarios']
+    decimation = meta['decimation']
+    shape = (len(meta['t']), len(meta['state_labels']))
+    names = meta['param_names']
+    current = {'chunk': None, 'arrays': None, 'index': []}
+
+    def seal():
+        if current['chunk'] is None:
+            return
+        for array in current['arrays']:
+            array.flush()
+        index = (np.concatenate(current['index']) if current['index']
+                 else np.empty((0, len(names))))
+        prefix = _chunk_prefix(path, current['chunk'])
+        partial = prefix + '.index.partial.npy'
+        np.save(partial, index)
+        os.replace(partial, prefix + '.index.npy')
+        current.update(chunk=None, arrays=None, index=[])
+
+    def append(params, solutions):
+        solutions = np.asarray(solutions)
+        if solutions.shape[1:] != shape:
+            raise ValueError(f"Expected solutions of shape (n, {shape[0]}, {shape[1]}), "
+                             f"got {solutions.shape}")
+        missing = set(names) - set(params)
+        if missing:
+            raise ValueError(f"Missing scenario parameters: {sorted(missing)}")
+        n = solutions.shape[0]
+        rows = np.stack([np.broadcast_to(np.asarray(params[name], dtype=float), (n,))
+                         for name in names], axis=-1)
+        start = 0
+        while start < n:
+            if current['chunk'] is None:
+                current['chunk'] = _claim_chunk(path)
+                current['arrays'] = [_level_array(path, meta, current['chunk'], level, 'w+')
+                                     for level in range(len(meta['level_lengths']))]
+            filled = sum(len(block) for block in current['index'])
+            stop = min(n, start + capacity - filled)
+            block = solutions[start:stop].astype(meta['dtype'])
+            arrays = current['arrays']
+            arrays[0][filled:filled + len(block)] = block
+            level = block
+            for array in arrays[1:]:
+                level = _min_max(level, decimation)
+                array[filled:filled + len(block)] = level
+            current['index'].append(rows[start:stop])
+            if filled + len(block) == capacity:
+                seal()
+            start = stop
+
+    try:
+        yield append
+    finally:
+        seal()
+
+
+def open_store(path):
+    """Lazy reader: metadata plus the concatenated index of every sealed chunk.
+
+    Returns a dict with ``path``, ``meta``, ``t``, ``state_labels``,
+    ``params`` (name -> (N,) array), and ``chunk``/``row`` (N,), the location
+    of each scenario. No trajectory data is read.
+    """
+    meta = load_meta(path)
+    chunks, indexes = [], []
+    for index_path in sorted(glob.glob(os.path.join(path, 'chunk_*.index.npy'))):
+        index = np.load(index_path)
+        chunks.append(np.full(len(index), int(os.path.basename(index_path)[6:12]),
+                              dtype=np.int64))
+        indexes.append(index)
+    n_params = len(meta['param_names'])
+    index = np.concatenate(indexes) if indexes else np.empty((0, n_params))
+    chunk = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+    row = np.concatenate([np.arange(len(i)) for i in indexes]) if indexes else chunk.copy()
+    return {
+        'path': path, 'meta': meta, 't': np.asarray(meta['t']),
+        'state_labels': meta['state_labels'],
+        'params': {name: index[:, k] for k, name in enumerate(meta['param_names'])},
+        'chunk': chunk, 'row': row,
+    }
+
+
+def select(store, **conditions):
+    """Indices of the scenarios matching every condition, in store order.
+
+    A condition is a value (matched with ``np.isclose``), a ``(low, high)``
+    tuple (inclusive range) or a list/array of accepted values.
+    """
+    mask = np.ones(store['chunk'].size, dtype=bool)
+    for name, condition in conditions.items():
+        if name not in store['params']:
+            raise ValueError(f"Unknown scenario parameter {name!r}; "
+                             f"expected one of {list(store['params'])}")
+        values = store['params'][name]
+        if isinstance(condition, tuple):
+            mask &= (values >= condition[0]) & (values <= condition[1])
+        elif np.ndim(condition):
+            mask &= np.isclose(values[:, None], np.asarray(condition, dtype=float)).any(axis=1)
+        else:
+            mask &= np.isclose(values, condition)
+    return np.nonzero(mask)[0]
+
+
+def _state_index(store, states):
+    if states is None:
+        return np.arange(len(store['state_labels']))
+    return np.array([store['state_labels'].index(s) if isinstance(s, str) else s
+                     for s in np.atleast_1d(states)])
+
+
+def _gather(store, indices, level, states, time=slice(None)):
+    """Rows ``indices`` of pyramid ``level`` (0: raw data), reading chunk by chunk."""
+    indices = np.atleast_1d(np.asarray(indices, dtype=np.int64))
+    chunks, rows = store['chunk'][indices], store['row'][indices]
+    out = None
+    for chunk in np.unique(chunks):
+        members = np.nonzero(chunks == chunk)[0]
+        array = _level_array(store['path'], store['meta'], int(chunk), level)
+        # Slice time on the memmap view first so only the needed span is read
+        values = array[:, time][rows[members]][:, :, states]
+        if out is None:
+            out = np.empty((indices.size,) + values.shape[1:], dtype=values.dtype)
+        out[members] = values
+        del array
+    if out is None:
+        n_times = len(np.arange(store['meta']['level_lengths'][level])[time])
+        tail = (2,) if level else ()
+        out = np.empty((0, n_times, len(states)) + tail, dtype=store['meta']['dtype'])
+    return out
+
+
+def read(store, indices, states=None, time=slice(None)):
+    """Trajectories (n, T', S') of scenarios ``indices``; ``time`` slices the grid."""
+    return _gather(store, indices, 0, _state_index(store, states), time)
+
+
+def read_decimated(store, indices, n_points=1000, states=None):
+    """Min/max envelope of scenarios ``indices`` in at most ``n_points`` time bins.
+
+    Reads the coarsest pyramid level with at least ``n_points`` samples (the
+    raw data if none is that fine) and reduces it to the bins. Returns a
+    dict with ``t`` (bin start times), ``t_last`` (bin end times), and
+    ``min`` and ``max`` of shape (n, bins, S').
+    """
+    meta = store['meta']
+    lengths = meta['level_lengths']
+    states = _state_index(store, states)
+    level = max(k for k, length in enumerate(lengths) if length >= n_points or k == 0)
+    factor = meta['decimation'] ** level
+    values = _gather(store, indices, level, states)
+    if level == 0:
+        values = np.stack([values, values], axis=-1)
+    n_bins = min(n_points, lengths[level])
+    starts = np.unique(np.linspace(0, lengths[level], n_bins + 1).astype(int)[:-1])
+    low = np.minimum.reduceat(values[..., 0], starts, axis=1)
+    high = np.maximum.reduceat(values[..., 1], starts, axis=1)
+    t = store['t']
+    first = starts * factor
+    last = np.minimum(np.append(starts[1:], lengths[level]) * factor, t.size) - 1
+    return {'t': t[first], 't_last': t[last], 'min': low, 'max': high}
+
+
+def _write_sweep_chunk(path, spec, t, model, start, stop):
+    doses = np.asarray(spec['doses'])
+    params = phenotype_params(spec, start, stop)
+    # The store is where these trajectories live; caching them too would double the disk use
+    _, sol = run_analytic(doses[None, :], spec['blocker'], t=t, model=model, use_cache=False,
+                          **{key: value[:, None] for key, value in params.items()})
+    scenario_params = {key: np.repeat(value, doses.size) for key, value in params.items()}
+    scenario_params['cbd_conc'] = np.tile(doses, stop - start)
+    with store_writer(path) as append:
+        append(scenario_params, sol)
+    return sol.shape[0]
+
+
+def write_sweep(path, doses, phenotype_axes, base='Cancer (Vulnerable)', blocker=False,
+                t=None, model='v4', dtype='float32', chunk_scenarios=DEFAULT_CHUNK_SCENARIOS,
+                max_workers=1):
+    """Write the v3/v4 trajectories of a dose x phenotype grid into a store.
+
+    The grid is that of ``run_grid_scan`` (``phenotype_axes`` maps phenotype
+    parameters to value arrays, the rest from ``base``, looked up in
+    ``model``'s phenotype table); every scenario is
+    indexed by ``cbd_conc`` and the four phenotype parameters. Work is split
+    into tasks of about ``chunk_scenarios`` scenarios solved in closed form.
+    With ``max_workers`` other than 1 (None: all cores) tasks run in a
+    process pool, and each worker appends its results to the store itself.
+    Returns the number of scenarios written.
+    """
+    t = default_time_grid() if t is None else np.asarray(t, dtype=float)
+    spec = scan_spec(doses, phenotype_axes, base, blocker, t_end=t[-1],
+                     lookup=MODELS[model]['phenotype'])
+    create_store(path, t, STATE_LABELS[model], ('cbd_conc',) + PHENOTYPE_KEYS, dtype=dtype,
+                 chunk_scenarios=chunk_scenarios)
+    bounds = chunk_bounds(spec, chunk_scenarios)
+    if max_workers == 1 or len(bounds) == 1:
+        return sum(_write_sweep_chunk(path, spec, t, model, start, stop)
+                   for start, stop in bounds)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(_write_sweep_chunk, path, spec, t, model, start, stop)
+                   for start, stop in bounds]
+        return sum(future.result() for future in futures)
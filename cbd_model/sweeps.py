@@ -0,0 +1,119 @@
+"""The named experiments behind each ``simulation_v*.py`` script.
+
+A sweep returns plain data: the time grid, one solution per scenario stacked
+into ``solutions`` (S, T, n_states), scenario metadata, and the numerical
+summary the script prints. ``plotting`` turns a sweep result into the script's
+figure; the CLI writes it to JSON or NPZ without touching matplotlib.
+"""
+import numpy as np
+
+from .models import STATE_LABELS
+from .params import PSI_DEATH_THRESHOLD, ROS_TOXIC_THRESHOLD, V2_RESILIENCE, V3_PSI_DEATH_THRESHOLD
+from .solvers import RUNNERS
+
+CELL_TYPES = ('Healthy', 'Cancer (Vulnerable)')
+SUMMARY_DOSE = 40
+
+
+def _result(model, scenarios, runs, summary):
+    t = runs[0][0]
+    return {
+        'model': model,
+        't': t,
+        'state_labels': list(STATE_LABELS[model]),
+        'scenarios': scenarios,
+        'solutions': np.stack([sol for _, sol in runs]),
+        'summary': summary,
+    }
+
+
+def sweep_v1():
+    """Scenario A/B of simulation_v1.py: 20 uM CBD with and without blocker."""
+    scenarios = [
+        {'label': 'High Dose CBD (Unblocked)', 'cbd_conc': 20.0, 'blocker': False},
+        {'label': 'High Dose CBD + VDAC1 Blocker', 'cbd_conc': 20.0, 'blocker': True},
+    ]
+    runs = [RUNNERS['v1'](s['cbd_conc'], s['blocker']) for s in scenarios]
+    return _result('v1', scenarios, runs, [])
+
+
+def sweep_v2(doses=(0, 5, 20, 50), blocker_dose=20):
+    """Dose x resilience sweep of simulation_v2.py."""
+    scenarios = []
+    for cell_type, resilience in V2_RESILIENCE.items():
+        for dose in doses:
+            blockers = (False, True) if dose == blocker_dose else (False,)
+            for blocker in blockers:
+                scenarios.append({'cell_type': cell_type, 'resilience': resilience,
+                                  'cbd_conc': dose, 'blocker': blocker})
+    runs = [RUNNERS['v2'](s['cbd_conc'], s['blocker'], s['resilience']) for s in scenarios]
+    return _result('v2', scenarios, runs, [])
+
+
+def _cell_type_sweep(model, doses, blocker_dose, psi_threshold, labels, method):
+    scenarios = []
+    for cell_type in CELL_TYPES:
+        for dose in doses:
+            blockers = (False, True) if dose == blocker_dose else (False,)
+            for blocker in blockers:
+                scenarios.append({'cell_type': cell_type, 'cbd_conc': dose, 'blocker': blocker})
+    runs = [RUNNERS[model](s['cbd_conc'], s['blocker'], s['cell_type'], method=method)
+            for s in scenarios]
+
+    summary = []
+    for (cell_type, blocker), label in labels.items():
+        index = scenarios.index({'cell_type': cell_type, 'cbd_conc': SUMMARY_DOSE,
+                                 'blocker': blocker})
+        final_psi, final_ros = runs[index][1][-1, 0], runs[index][1][-1, 2]
+        survived = bool(final_psi > psi_threshold and final_ros < ROS_TOXIC_THRESHOLD)
+        summary.append({'label': label, 'cell_type': cell_type, 'cbd_conc': SUMMARY_DOSE,
+                        'blocker': blocker, 'final_psi': float(final_psi),
+                        'final_ros': float(final_ros), 'survived': survived})
+    return _result(model, scenarios, runs, summary)
+
+
+def sweep_v3(doses=(0, 5, 20, 40), method='analytic'):
+    """Cell type x dose sweep of simulation_v3.py, blocker at 40 uM."""
+    labels = {
+        ('Healthy', False): '[Healthy] at 40uM',
+        ('Cancer (Vulnerable)', False): '[Cancer (Vulnerable)] at 40uM',
+        ('Cancer (Vulnerable)', True): '[Cancer + VDAC Blocker] at 40uM',
+    }
+    return _cell_type_sweep('v3', doses, SUMMARY_DOSE, V3_PSI_DEATH_THRESHOLD, labels, method)
+
+
+def sweep_v4(doses=(0, 5, 20, 40), method='analytic'):
+    """Cell type x dose sweep of simulation_v4_honest.py."""
+    labels = {
+        ('Healthy', False): '[Healthy]',
+        ('Cancer (Vulnerable)', False): '[Cancer (Vulnerable)]',
+    }
+    return _cell_type_sweep('v4', doses, None, PSI_DEATH_THRESHOLD, labels, method)
+
+
+SWEEPS = {
+    'v1': sweep_v1,
+    'v2': sweep_v2,
+    'v3': sweep_v3,
+    'v4': sweep_v4,
+}
+
+SUMMARY_HEADERS = {
+    'v3': '--- THERAPEUTIC INDEX ANALYSIS (40uM CBD) ---',
+    'v4': '--- HONEST MODEL RESULTS (40uM CBD) ---',
+}
+
+
+def summary_lines(result):
+    """The script's printed summary for a sweep result, one string per line."""
+    if not result['summary']:
+        return []
+    lines = [SUMMARY_HEADERS[result['model']]]
+    for row in result['summary']:
+        if row['survived']:
+            status = 'RESCUED' if row['blocker'] else 'SURVIVED'
+        else:
+            status = 'COLLAPSED'
+        lines.append(f"{row['label']}: Potential={row['final_psi']:.2f}, "
+                     f"ROS={row['final_ros']:.2f} -> {status}")
+    return lines
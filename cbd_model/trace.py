@@ -0,0 +1,285 @@
+"""Per-scenario solver instrumentation, written as a JSON-lines trace.
+
+A slow sweep does not say which scenarios are expensive. With tracing on,
+each solve made by an instrumented entry point appends one JSON line to the
+trace file. The instrumented entry points are ``run_simulation_v1`` to
+``run_simulation_v4`` with ``method='odeint'``, ``run_batch`` (one line per
+stacked chunk), ``run_event_driven``, ``simulate_pk`` and the calibration's
+``solve_sensitivities`` (one line per optimizer step). Each line holds:
+
+- ``entry``, ``scenario`` (its arguments), ``solver``, ``pid`` and ``time``;
+- the solver counters ``nfe``, ``nje``, ``n_steps``, plus ``nlu`` for
+  ``solve_ivp``;
+- for ``odeint``, ``method_switches`` between Adams and BDF and the
+  ``methods`` used. These come from ``mused``, which LSODA reports once per
+  output interval, so switches inside one interval are not seen;
+- ``wall_s``; ``rhs_s``, ``rhs_calls`` and ``jac_s`` (time inside the RHS
+  and Jacobian callbacks); and ``rhs_share`` (``rhs_s / wall_s``). The rest
+  of the wall time is spent in the integrator and its Python glue.
+
+With ``profile`` on, a sampling thread reads the solving thread's stack
+every ``interval`` seconds, and the interpreter's switch interval is lowered
+to match while the solve runs. A sample inside the RHS or Jacobian is
+tallied by source line under ``profile['lines']``. Any other sample is
+tallied by its innermost Python function under ``profile['other']``, for
+example ``solve_ivp``'s step code. A sample can only be taken when the
+solving thread yields the GIL, which biases where samples land. ``odeint``
+holds the GIL inside Fortran, so its samples fall in Python code, mostly the
+RHS. ``solve_ivp``'s LSODA releases the GIL inside Fortran, so its samples
+land in the step code and rarely catch the short RHS calls. ``rhs_share``
+is the reliable measure of how much of the run the RHS takes. The samples
+show where that time goes.
+
+Closed-form solves (``run_analytic``, the default v3/v4 method) integrate
+nothing and are not traced. Cached results are returned without a solve,
+so disable the cache to trace every scenario.
+
+A solve that raises still writes its record, with the exception under
+``error``. When tracing is off, an entry point pays one context-manager
+entry per solve (a few microseconds) and one dictionary lookup per helper
+call. Turn tracing on with ``configure(path=...)``, the ``tracing()``
+context manager, or ``CBD_MODEL_TRACE=<path>``. Worker processes started
+by spawn read only the environment variable. Lines are appended with a
+single ``O_APPEND`` write, so processes can share one trace file.
+"""
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_INTERVAL = 0.001
+# LSODA method codes in odeint's ``mused``
+ODEINT_METHODS = {1: 'adams', 2: 'bdf'}
+
+_CONFIG = {
+    'path': os.environ.get('CBD_MODEL_TRACE') or None,
+    'profile': os.environ.get('CBD_MODEL_TRACE_PROFILE', '0') != '0',
+    'interval': DEFAULT_INTERVAL,
+}
+
+
+def configure(path=None, profile=None, interval=None, enabled=None):
+    """Change trace settings for this process; returns the active settings.
+
+    ``path`` turns tracing on, writing to that file; ``enabled=False`` turns
+    it off.
+    """
+    if path is not None:
+        _CONFIG['path'] = os.fspath(path)
+    if enabled is False:
+        _CONFIG['path'] = None
+    if profile is not None:
+        _CONFIG['profile'] = bool(profile)
+    if interval is not None:
+        _CONFIG['interval'] = float(interval)
+    return dict(_CONFIG)
+
+
+@contextlib.contextmanager
+def tracing(path, profile=False, interval=DEFAULT_INTERVAL):
+    """Trace the solves in the block to ``path``, restoring the settings after."""
+    previous = dict(_CONFIG)
+    configure(path=path, profile=profile, interval=interval)
+    try:
+        yield path
+    finally:
+        _CONFIG.update(previous)
+
+
+def _jsonable(value):
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return repr(value)
+
+
+def _sampler(record, thread_id, interval, stop):
+    """Tally where ``thread_id`` is: source lines inside callbacks, functions outside."""
+    lines, other = record['_profile']
+    counts = record['_samples']
+    while not stop.wait(interval):
+        frame = sys._current_frames().get(thread_id)
+        if frame is None:
+            continue
+        counts['samples'] += 1
+        inner, in_callback = frame, False
+        while frame is not None:
+            if frame.f_code is _CALLBACK_CODE:
+                in_callback = True
+                break
+            frame = frame.f_back
+        code = inner.f_code
+        name = os.path.basename(code.co_filename)
+        if in_callback:
+            counts['callback_samples'] += 1
+            key = f'{name}:{inner.f_lineno} ({code.co_name})'
+            lines[key] = lines.get(key, 0) + 1
+        else:
+            key = f'{name} ({code.co_name})'
+            other[key] = other.get(key, 0) + 1
+
+
+def begin(entry, solver, **scenario):
+    """Start a trace record for one solve; None (and no work) when tracing is off.
+
+    Entry points use ``recording``, which also ends the record when the
+    solve raises.
+    """
+    if _CONFIG['path'] is None:
+        return None
+    record = {'entry': entry, 'scenario': scenario, 'solver': solver,
+              'nfe': 0, 'nje': 0, 'n_steps': 0, 'rhs_calls': 0, 'rhs_s': 0.0, 'jac_s': 0.0}
+    if _CONFIG['profile']:
+        record['_profile'] = ({}, {})
+        record['_samples'] = {'samples': 0, 'callback_samples': 0}
+        stop = threading.Event()
+        sampler = threading.Thread(target=_sampler, daemon=True,
+                                   args=(record, threading.get_ident(),
+                                         _CONFIG['interval'], stop))
+        # The sampler runs when the solving thread yields the GIL, by default
+        # only every 5 ms in Python code
+        record['_sampler'] = (sampler, stop, sys.getswitchinterval())
+        sys.setswitchinterval(_CONFIG['interval'])
+        sampler.start()
+    record['_start'] = time.perf_counter()
+    return record
+
+
+def _callback(record, function, key):
+    perf_counter = time.perf_counter
+
+    def timed(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record[key] += perf_counter() - start
+            if key == 'rhs_s':
+                record['rhs_calls'] += 1
+    return timed
+
+
+# The profiler recognizes callback frames by this code object
+_CALLBACK_CODE = _callback(None, None, None).__code__
+
+
+def timed(record, function, key='rhs'):
+    """``function`` wrapped to time its calls into ``record`` ('rhs' or 'jac')."""
+    if record is None or function is None:
+        return function
+    return _callback(record, function, f'{key}_s')
+
+
+def add_odeint(record, info):
+    """Add the counters of an ``odeint(..., full_output=True)`` info dict."""
+    if record is None:
+        return
+    record['nfe'] += int(info['nfe'][-1])
+    record['nje'] += int(info['nje'][-1])
+    record['n_steps'] += int(info['nst'][-1])
+    mused = np.asarray(info['mused'])
+    used = record.setdefault('methods', [])
+    for code in np.unique(mused):
+        name = ODEINT_METHODS.get(int(code), str(code))
+        if name not in used:
+            used.append(name)
+    record['method_switches'] = (record.get('method_switches', 0)
+                                 + int(np.count_nonzero(np.diff(mused))))
+
+
+def add_solve_ivp(record, counts):
+    """Add the ``(nfev, njev, nlu, n_steps, ...)`` counters of a ``solve_ivp`` segment."""
+    if record is None:
+        return
+    nfev, njev, nlu, n_steps = counts[:4]
+    record['nfe'] += int(nfev)
+    record['nje'] += int(njev)
+    record['nlu'] = record.get('nlu', 0) + int(nlu)
+    record['n_steps'] += int(n_steps)
+    record['n_segments'] = record.get('n_segments', 0) + 1
+
+
+def end(record, **extra):
+    """Finish ``record`` and append it as one line to the trace file.
+
+    Only the first call writes; later calls on the same record do nothing.
+    """
+    if record is None or '_start' not in record:
+        return
+    wall = time.perf_counter() - record.pop('_start')
+    if '_sampler' in record:
+        sampler, stop, switch_interval = record.pop('_sampler')
+        stop.set()
+        sampler.join()
+        sys.setswitchinterval(switch_interval)
+        lines, other = record.pop('_profile')
+        record['profile'] = {
+            'interval_s': _CONFIG['interval'],
+            **record.pop('_samples'),
+            'lines': dict(sorted(lines.items(), key=lambda item: -item[1])),
+            'other': dict(sorted(other.items(), key=lambda item: -item[1])),
+        }
+    record.update(extra)
+    record['wall_s'] = wall
+    record['rhs_share'] = record['rhs_s'] / wall if wall > 0 else 0.0
+    record['pid'] = os.getpid()
+    record['time'] = time.time()
+    line = (json.dumps(_jsonable(record)) + '\n').encode()
+    fd = os.open(_CONFIG['path'], os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+@contextlib.contextmanager
+def recording(entry, solver, **scenario):
+    """``begin`` as a context manager that always ends the record.
+
+    ``end`` may still be called inside the block to add fields. If the block
+    raises first, the record is written with the exception under ``error``,
+    and a profiling sampler is stopped and the switch interval restored.
+    """
+    record = begin(entry, solver, **scenario)
+    try:
+        yield record
+    except BaseException as error:
+        end(record, error=f'{type(error).__name__}: {error}')
+        raise
+    end(record)
+
+
+def load(path):
+    """The records of a trace file, in the order they were written."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(records, by='entry'):
+    """Totals per value of ``by`` (a record key): count, times and solver counters."""
+    groups = {}
+    for record in records:
+        key = record.get(by)
+        group = groups.setdefault(key, {'n': 0, 'wall_s': 0.0, 'rhs_s': 0.0, 'jac_s': 0.0,
+                                        'nfe': 0, 'nje': 0, 'n_steps': 0,
+                                        'method_switches': 0})
+        group['n'] += 1
+        for field in ('wall_s', 'rhs_s', 'jac_s', 'nfe', 'nje', 'n_steps', 'method_switches'):
+            group[field] += record.get(field) or 0
+    for group in groups.values():
+        group['rhs_share'] = group['rhs_s'] / group['wall_s'] if group['wall_s'] > 0 else 0.0
+    return groups
+
+
+def slowest(records, n=10, key='wall_s'):
+    """The ``n`` records with the largest ``key``, most expensive first."""
+    return sorted(records, key=lambda record: record.get(key) or 0, reverse=True)[:n]
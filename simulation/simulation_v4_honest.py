@@ -1,10 +1,9 @@
-import numpy as np
-import matplotlib.pyplot as plt
-from scipy.integrate import odeint
 import os
+import sys
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 FIGURES_DIR = os.path.join(SCRIPT_DIR, '..', 'figures')
+sys.path.insert(0, os.path.join(SCRIPT_DIR, '..'))
 
 # --- PARAMETERS: THE "UNIVERSAL HIT" MODEL (V4.1 HONEST CALIBRATION) ---
 # Purpose: Show that BOTH cell types take a hit, but Healthy survives via resilience.
@@ -57,99 +56,20 @@ FIGURES_DIR = os.path.join(SCRIPT_DIR, '..', 'figures')
 #     - 3/5 TYPE 1: Safety margin 5-10x healthy, 2-3x compromised
 #     - First INDEPENDENT REPLICATION: sub-Kd hepatic CBD confirmed
 # ====================================================================
+#
+# Values: cbd_model/params.py; equations: cbd_model/models.py.
+# run_simulation solves the constant-dose model in closed form
+# (cbd_model.analytic); method='odeint' integrates it numerically.
+from cbd_model.models import system_dynamics_v4  # noqa: E402,F401
+from cbd_model.solvers import run_simulation_v4 as run_simulation  # noqa: E402,F401
+from cbd_model.sweeps import summary_lines, sweep_v4  # noqa: E402
 
-Kd_VDAC = 11.0  # uM, Rimmerman et al. 2013
-EC50_TRPV1 = 3.5  # uM, Bisogno et al. 2001
-
-def system_dynamics_v4(state, t, cbd_conc, blocker_presence, cell_type):
-    """
-    state[0] = Mitochondrial Membrane Potential (Psi)
-    state[1] = Apoptotic Factors (Cytochrome C)
-    state[2] = ROS Levels
-    """
-    Psi, Apop, ROS = state
-    
-    # --- DIVERGENT RESILIENCE PARAMETERS ---
-    # See PARAMETER JUSTIFICATION block above for sources and IRIS validation.
-    if cell_type == "Healthy":
-        resilience = 1.0       # Full metabolic flexibility
-        scavenging_capacity = 3.0  # GSH 5-10 mM baseline, synthesis 0.5-2.3 umol/g/hr
-        g_max = 2.5            # Normal VDAC1 density
-        respiration_max = 2.5  # Intact oxidative phosphorylation
-    else:
-        resilience = 0.4       # Warburg-limited metabolic rerouting
-        scavenging_capacity = 0.6  # GSH 2-8 mM, synthesis reduced >2x (IRIS TYPE 0)
-        g_max = 5.0            # VDAC1 overexpressed 2-5x (Shoshan-Barmatz 2010)
-        respiration_max = 1.0  # Glycolysis-dependent, limited OXPHOS reserve
-
-    # --- 1. THE "HIT": CBD Binds VDAC1/2 ---
-    inhibition_factor = 0.1 if blocker_presence else 1.0
-    effective_binding = inhibition_factor * (cbd_conc**2 / (Kd_VDAC**2 + cbd_conc**2))
-    vdac_leak = g_max * effective_binding
-
-    # --- 2. THE PROTECTIVE SIGNAL (TRPV1) ---
-    protection_signal = (cbd_conc / (EC50_TRPV1 + cbd_conc)) * 0.4
-
-    # --- DIFFERENTIAL EQUATIONS ---
-    
-    # ROS Generation: Proportional to VDAC leak
-    ros_generation = 0.1 + (vdac_leak * 0.3) 
-    # ROS Scavenging: Boosted by protection signal
-    ros_removal = (scavenging_capacity + protection_signal) * ROS
-    dROS_dt = ros_generation - ros_removal
-
-    # Potential: Respiration vs Leak vs ROS damage
-    ros_damage = 0.4 * ROS
-    respiration = respiration_max + (protection_signal * 0.2) - (1.0 - resilience)
-    # The potential equation:
-    dPsi_dt = respiration - vdac_leak - ros_damage - (0.1 * Psi)
-    
-    # Apoptosis Trigger
-    # Thresholds: Psi < 0.4 or ROS > 2.0
-    trigger = 1.0 if (Psi < 0.4 or ROS > 2.0) else 0.0
-    dApop_dt = trigger * 0.8 
-    
-    return [dPsi_dt, dApop_dt, dROS_dt]
-
-def run_simulation(cbd_conc, blocker, cell_type):
-    t = np.linspace(0, 50, 400)
-    initial_state = [1.0, 0.0, 0.1]
-    sol = odeint(system_dynamics_v4, initial_state, t, args=(cbd_conc, blocker, cell_type))
-    return t, sol
-
-# --- VISUALIZING THE "RESILIENCE" MODEL ---
-cell_types = ['Healthy', 'Cancer (Vulnerable)']
-doses = [0, 5, 20, 40] 
-
-fig, axes = plt.subplots(2, 2, figsize=(15, 10), sharex=True)
-colors = ['blue', 'green', 'orange', 'red']
-
-for i, cell_type in enumerate(cell_types):
-    for dose, color in zip(doses, colors):
-        t, sol = run_simulation(dose, False, cell_type)
-        
-        # Plot Psi
-        axes[i, 0].plot(t, sol[:, 0], color=color, label=f'CBD {dose}uM')
-        # Plot ROS
-        axes[i, 1].plot(t, sol[:, 2], color=color, label=f'CBD {dose}uM')
-
-    # Formatting
-    axes[i, 0].set_title(f'{cell_type} - Potential ($\Psi$)')
-    axes[i, 0].axhline(0.4, color='k', linestyle='--', alpha=0.5, label='Death Threshold')
-    axes[i, 0].set_ylim(-0.5, 3.0)
-    axes[i, 0].legend(fontsize='x-small', ncol=2)
-    
-    axes[i, 1].set_title(f'{cell_type} - ROS')
-    axes[i, 1].axhline(2.0, color='r', linestyle='--', alpha=0.5, label='Toxicity Threshold')
-    axes[i, 1].set_ylim(0, 3.0)
-    axes[i, 1].legend(fontsize='x-small', ncol=2)
+if __name__ == '__main__':
+    # --- VISUALIZING THE "RESILIENCE" MODEL ---
+    result = sweep_v4()
 
-plt.tight_layout()
-plt.savefig(os.path.join(FIGURES_DIR, 'v4_honest_resilience.png'), dpi=150, bbox_inches='tight')
+    from cbd_model.plotting import plot_v4
+    plot_v4(result, os.path.join(FIGURES_DIR, 'v4_honest_resilience.png'))
 
-print("\n--- HONEST MODEL RESULTS (40uM CBD) ---")
-for cell_type in cell_types:
-    _, sol = run_simulation(40, False, cell_type)
-    final_psi, final_ros = sol[-1, 0], sol[-1, 2]
-    status = "SURVIVED" if (final_psi > 0.4 and final_ros < 2.0) else "COLLAPSED"
-    print(f"[{cell_type}]: Potential={final_psi:.2f}, ROS={final_ros:.2f} -> {status}")
+    print()
+    print('\n'.join(summary_lines(result)))
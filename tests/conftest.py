@@ -0,0 +1,9 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cbd_model import cache  # noqa: E402
+
+# Every test solves; cached results from earlier runs would hide regressions
+cache.configure(enabled=False)
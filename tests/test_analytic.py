@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from scipy.integrate import odeint
+
+from cbd_model.analytic import (
+    _psi_root, _psi_turning_point, analytic_collapse_time, closed_form_psi, run_analytic,
+)
+from cbd_model.solvers import RUNNERS
+
+CELL_TYPES = ('Healthy', 'Cancer (Vulnerable)')
+
+
+@pytest.mark.parametrize('model', ['v3', 'v4'])
+@pytest.mark.parametrize('cell_type', CELL_TYPES)
+@pytest.mark.parametrize('blocker', [False, True])
+def test_closed_form_matches_odeint(model, cell_type, blocker):
+    for dose in (0.0, 5.0, 20.0, 40.0, 100.0):
+        t, closed = RUNNERS[model](dose, blocker, cell_type, method='analytic')
+        t_ref, ref = RUNNERS[model](dose, blocker, cell_type, method='odeint')
+        np.testing.assert_allclose(t, t_ref)
+        # odeint runs at its default tolerances; the closed form is exact
+        np.testing.assert_allclose(closed, ref, rtol=0, atol=1e-5)
+
+
+def test_collapse_time_is_where_apop_starts():
+    t = np.linspace(0, 50, 5001)
+    collapse = analytic_collapse_time(40.0, cell_type='Cancer (Vulnerable)')
+    _, sol = run_analytic(40.0, cell_type='Cancer (Vulnerable)', t=t)
+    apop = sol[0, :, 1]
+    assert np.isfinite(collapse)
+    assert np.all(apop[t < collapse] == apop[0])
+    assert np.all(apop[t > collapse + t[1]] > apop[0])
+
+
+def _turning_scenarios(n=200, seed=3):
+    """v4-like coefficients whose Psi rises to a maximum and then falls within t_end."""
+    rng = np.random.default_rng(seed)
+    g, k, D = rng.uniform(0.5, 6.0, n), rng.uniform(0.05, 1.0, n), rng.uniform(0.1, 1.0, n)
+    a, b, psi0, ros0 = 0.4, 0.1, 1.0, rng.uniform(0.0, 0.2, n)
+    coefficients = np.broadcast_arrays(g, k, D, a, b, psi0, ros0)
+    turn = _psi_turning_point(*coefficients)
+    keep = turn < 20.0
+    return [c[keep] for c in coefficients], turn[keep]
+
+
+def _bisect(lo, hi, coefficients, threshold, steps=200):
+    gap_lo = closed_form_psi(lo, *coefficients) - threshold
+    gap_hi = closed_form_psi(hi, *coefficients) - threshold
+    bracketed = (gap_lo > 0) != (gap_hi > 0)
+    rising = gap_lo <= 0
+    for _ in range(steps):
+        mid = 0.5 * (lo + hi)
+        below = (closed_form_psi(mid, *coefficients) - threshold <= 0) == rising
+        lo, hi = np.where(below, mid, lo), np.where(below, hi, mid)
+    return np.where(bracketed, 0.5 * (lo + hi), np.nan)
+
+
+@pytest.mark.parametrize('depth', [0.5, 1e-3, 1e-8])
+def test_psi_root_matches_bisection(depth):
+    # depth is how far below the Psi maximum the threshold sits; a small depth
+    # puts the two crossings either side of a near-tangent maximum
+    coefficients, turn = _turning_scenarios()
+    assert turn.size > 50
+    zero, end = np.zeros_like(turn), np.full_like(turn, 40.0)
+    peak = closed_form_psi(turn, *coefficients)
+    threshold = peak - depth * (peak - closed_form_psi(zero, *coefficients))
+    for lo, hi in ((zero, turn), (turn, end)):
+        # trigger_segments passes one threshold for all scenarios
+        root = np.array([_psi_root(lo[i:i + 1], hi[i:i + 1],
+                                   *[c[i:i + 1] for c in coefficients], threshold[i])[0]
+                         for i in range(turn.size)])
+        reference = _bisect(lo, hi, coefficients, threshold)
+        np.testing.assert_array_equal(np.isnan(root), np.isnan(reference))
+        assert np.isfinite(root).sum() > 50
+        # Near a tangency the root is ill-conditioned in t: compare the residual too
+        np.testing.assert_allclose(root, reference, rtol=0, atol=1e-11 / np.sqrt(depth))
+        gap = np.abs(closed_form_psi(root, *coefficients) - threshold)
+        scale = np.abs(closed_form_psi(reference, *coefficients) - threshold)
+        assert np.all((gap <= 4 * scale + 1e-13) | np.isnan(root))
+
+
+@pytest.mark.parametrize('depth', [0.5, 1e-2])
+def test_psi_root_matches_dense_odeint_crossings(depth):
+    coefficients, turn = _turning_scenarios(n=20)
+    zero = np.zeros_like(turn)
+    peak = closed_form_psi(turn, *coefficients)
+    threshold = peak - depth * (peak - closed_form_psi(zero, *coefficients))
+    t = np.linspace(0.0, 40.0, 100001)
+    for row, (g, k, D, a, b, psi0, ros0) in enumerate(zip(*coefficients)):
+        sol = odeint(lambda y, _: [g - k * y[0], D - a * y[0] - b * y[1]], [ros0, psi0], t,
+                     rtol=1e-12, atol=1e-12)
+        gap = sol[:, 1] - threshold[row]
+        i = np.nonzero(np.sign(gap[1:]) != np.sign(gap[:-1]))[0]
+        crossings = t[i] - gap[i] * (t[i + 1] - t[i]) / (gap[i + 1] - gap[i])
+        one = [c[row:row + 1] for c in coefficients]
+        roots = [_psi_root(np.array([lo]), np.array([hi]), *one, threshold[row])[0]
+                 for lo, hi in ((0.0, turn[row]), (turn[row], 40.0))]
+        roots = [r for r in roots if np.isfinite(r)]
+        np.testing.assert_allclose(roots, crossings, rtol=0, atol=1e-5)
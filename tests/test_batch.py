@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from cbd_model.batch import run_batch, scenario_grid
+from cbd_model.solvers import run_simulation_v4
+
+DOSES = (0.0, 5.0, 20.0, 40.0, 100.0)
+
+
+def test_run_batch_matches_per_scenario_odeint():
+    grid = scenario_grid(DOSES, blockers=(False, True))
+    t, sol = run_batch(**grid)
+    for i, (dose, cell_type, blocker) in enumerate(zip(grid['cbd_conc'], grid['cell_type'],
+                                                       grid['blocker'])):
+        t_ref, ref = run_simulation_v4(dose, bool(blocker), cell_type, method='odeint')
+        np.testing.assert_allclose(t, t_ref)
+        # Tolerances documented in the batch module docstring
+        np.testing.assert_allclose(sol[i, :, [0, 2]], ref[:, [0, 2]].T, rtol=0, atol=1e-5)
+        np.testing.assert_allclose(sol[i, :, 1], ref[:, 1], rtol=0, atol=1e-4)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3])
+def test_run_batch_chunks_are_independent(chunk_size):
+    grid = scenario_grid(DOSES)
+    _, whole = run_batch(**grid)
+    _, chunked = run_batch(**grid, chunk_size=chunk_size)
+    np.testing.assert_allclose(chunked, whole, rtol=0, atol=1e-5)
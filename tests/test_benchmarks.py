@@ -0,0 +1,57 @@
+import importlib.util
+import json
+import os
+
+import pytest
+
+SUITE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks', 'suite.py')
+spec = importlib.util.spec_from_file_location('benchmark_suite', SUITE)
+suite = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(suite)
+
+
+def _record(commit, **results):
+    return {'timestamp': '2026-01-01T00:00:00+00:00', 'commit': commit, 'host': 'test',
+            'results': {name: dict(zip(suite.METRICS, values))
+                        for name, values in results.items()}}
+
+
+BASELINE = _record('aaaa', steady=(1.0, 100, 10.0), faster=(2.0, 500, 20.0),
+                   growing=(1.0, 100, 10.0), removed=(1.0, 1, 1.0))
+CURRENT = _record('bbbb', steady=(1.05, 100, 10.5), faster=(1.0, 250, 20.0),
+                  growing=(1.0, 150, 10.0), added=(5.0, 5, 5.0))
+
+
+def test_compare_flags_growth_beyond_the_threshold():
+    rows, regressions = suite.compare(BASELINE, CURRENT, threshold=0.1)
+    assert regressions == ['growing']
+    rows = {name: (ratios, worse) for name, ratios, worse in rows}
+    assert rows['growing'][1] == ['rhs_evals']
+    assert rows['steady'][1] == []
+    assert rows['faster'] == ({'wall_min_s': 0.5, 'rhs_evals': 0.5, 'peak_mb': 1.0}, [])
+    # A tighter threshold catches the 5 % drift too
+    assert suite.compare(BASELINE, CURRENT, threshold=0.01)[1] == ['steady', 'growing']
+
+
+def test_compare_skips_cases_without_a_baseline():
+    rows, regressions = suite.compare(BASELINE, CURRENT)
+    assert {name for name, _, _ in rows} == {'steady', 'faster', 'growing'}
+    assert suite.compare(_record('cccc'), CURRENT) == ([], [])
+
+
+def test_zero_baselines_only_regress_when_they_grow():
+    before = _record('aaaa', idle=(1.0, 0, 0.0))
+    assert suite.compare(before, _record('bbbb', idle=(1.0, 0, 0.0)))[1] == []
+    assert suite.compare(before, _record('bbbb', idle=(1.0, 3, 0.0)))[1] == ['idle']
+
+
+def test_compare_command_exit_codes(tmp_path, capsys):
+    history = tmp_path / 'history.json'
+    history.write_text(json.dumps([BASELINE, CURRENT]))
+    assert suite.main(['compare', '--history', str(history)]) == 1
+    assert 'REGRESSION (rhs_evals)' in capsys.readouterr().out
+    assert suite.main(['compare', '--history', str(history), '--baseline', 'bbbb']) == 0
+    with pytest.raises(SystemExit):
+        suite.main(['compare', '--history', str(history), '--baseline', 'ffff'])
+    with pytest.raises(SystemExit):
+        suite.main(['compare', '--history', str(tmp_path / 'missing.json')])
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from cbd_model.analytic import run_analytic
+from cbd_model.batch import inhibition_factor
+from cbd_model.calibration import calibrate, predict, solve_sensitivities
+from cbd_model.params import PHENOTYPE_KEYS, phenotype
+
+CANCER = 'Cancer (Vulnerable)'
+
+
+def test_sensitivities_match_finite_differences():
+    t = np.linspace(0, 48, 13)
+    doses = np.array([0.0, 5.0, 20.0, 60.0])
+    blocker = np.array([1.0, 0.1, 1.0, 0.4])
+    params = phenotype(CANCER)
+    solution = solve_sensitivities(doses, blocker, {k: np.full(4, v) for k, v in params.items()},
+                                   PHENOTYPE_KEYS, t=t, rtol=1e-10, atol=1e-12)
+    _, exact = run_analytic(doses, blocker, t=t, **params)
+    np.testing.assert_allclose(solution['psi'], exact[..., 0], atol=1e-8)
+    np.testing.assert_allclose(solution['ros'], exact[..., 2], atol=1e-8)
+    step = 1e-6
+    for j, key in enumerate(PHENOTYPE_KEYS):
+        _, up = run_analytic(doses, blocker, t=t, **{**params, key: params[key] + step})
+        _, down = run_analytic(doses, blocker, t=t, **{**params, key: params[key] - step})
+        numeric = (up - down) / (2 * step)
+        np.testing.assert_allclose(solution['d_psi'][..., j], numeric[..., 0], atol=1e-7)
+        np.testing.assert_allclose(solution['d_ros'][..., j], numeric[..., 2], atol=1e-7)
+
+
+def test_boolean_and_factor_blockers_mix():
+    t = [2.0, 10.0]
+    boolean = {'phenotype': CANCER, 'cbd_conc': 20.0, 'blocker': True, 't': t,
+               'observable': 'psi', 'values': 0.0}
+    factor = dict(boolean, blocker=float(inhibition_factor(5.0)))
+    _, exact = run_analytic(20.0, True, cell_type=CANCER, t=[0.0] + t)
+    np.testing.assert_allclose(predict([boolean, factor])[0], exact[0, 1:, 0], rtol=1e-6)
+    np.testing.assert_allclose(predict([factor, boolean])[1], exact[0, 1:, 0], rtol=1e-6)
+
+
+def test_recovers_parameters_from_synthetic_data():
+    rng = np.random.default_rng(0)
+    truth = {CANCER: {**phenotype(CANCER), 'g_max': 4.0, 'scavenging_capacity': 0.5}}
+    t = np.linspace(2, 48, 8)
+    experiments = [{'phenotype': CANCER, 'cbd_conc': dose, 'blocker': blocker, 't': t,
+                    'observable': observable, 'values': 0.0, 'sigma': 0.01}
+                   for dose in (5.0, 20.0, 60.0) for blocker in (False, True)
+                   for observable in ('viability', 'ros')]
+    for experiment, clean in zip(experiments, predict(experiments, truth)):
+        experiment['values'] = clean + rng.normal(0, 0.01, clean.shape)
+    fit = calibrate(experiments, n_starts=3)
+    for key in ('scavenging_capacity', 'g_max', 'respiration_max'):
+        assert fit['params'][CANCER][key] == pytest.approx(truth[CANCER][key],
+                                                           abs=4 * fit['stderr'][CANCER][key])
+    assert fit['n_solves'] == fit['nfev']
@@ -0,0 +1,87 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from cbd_model import trace
+from cbd_model.cli import MODELS, main, write_result
+from cbd_model.sweeps import SWEEPS
+
+FIGURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'figures')
+
+
+@pytest.fixture
+def restore_trace(monkeypatch):
+    previous = trace.configure()
+    monkeypatch.delenv('CBD_MODEL_TRACE', raising=False)
+    monkeypatch.delenv('CBD_MODEL_TRACE_PROFILE', raising=False)
+    yield
+    trace.configure(enabled=False, profile=previous['profile'])
+    if previous['path'] is not None:
+        trace.configure(path=previous['path'])
+
+
+def test_list_names_every_sweep(capsys):
+    assert main(['list']) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split('\t')[0] for line in lines] == list(MODELS)
+    assert all(line.split('\t')[1] for line in lines)
+
+
+def test_run_writes_json_to_stdout(capsys):
+    assert main(['run', 'v4', '--summary']) == 0
+    captured = capsys.readouterr()
+    result = json.loads(captured.out)
+    expected = SWEEPS['v4']()
+    assert result['model'] == 'v4'
+    assert result['scenarios'] == expected['scenarios']
+    np.testing.assert_allclose(result['solutions'], expected['solutions'])
+    assert captured.err.strip()
+
+
+def test_run_writes_npz_to_a_file(tmp_path, capsys):
+    path = tmp_path / 'v4.npz'
+    assert main(['run', 'v4', '--format', 'npz', '--output', str(path)]) == 0
+    assert capsys.readouterr().out == ''
+    expected = SWEEPS['v4']()
+    with np.load(path) as data:
+        np.testing.assert_allclose(data['t'], expected['t'])
+        np.testing.assert_allclose(data['solutions'], expected['solutions'])
+        assert str(data['model']) == 'v4'
+        assert json.loads(str(data['scenarios'])) == expected['scenarios']
+
+
+def test_write_result_rejects_npz_without_a_path_and_unknown_formats():
+    result = SWEEPS['v1']()
+    with pytest.raises(ValueError, match='file path'):
+        write_result(result, None, 'npz')
+    with pytest.raises(ValueError, match='unknown format'):
+        write_result(result, None, 'csv')
+
+
+def test_trace_records_the_run(tmp_path, restore_trace):
+    path = tmp_path / 'trace.jsonl'
+    assert main(['--trace', str(path), 'run', 'v4', '--method', 'odeint',
+                 '--output', str(tmp_path / 'v4.json')]) == 0
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert records and all(record['solver'] for record in records)
+    assert os.environ['CBD_MODEL_TRACE'] == str(path)
+
+
+def test_figures_go_to_the_out_dir_only(tmp_path, capsys):
+    pytest.importorskip('matplotlib')
+    before = {name: os.stat(os.path.join(FIGURES, name)).st_mtime_ns
+              for name in os.listdir(FIGURES)}
+    assert main(['figures', 'v1', 'v4', '--out-dir', str(tmp_path), '--jobs', '2']) == 0
+    paths = capsys.readouterr().out.split()
+    assert len(paths) == 2
+    assert all(os.path.dirname(p) == str(tmp_path) and os.path.exists(p) for p in paths)
+    after = {name: os.stat(os.path.join(FIGURES, name)).st_mtime_ns
+             for name in os.listdir(FIGURES)}
+    assert after == before
+
+
+def test_figures_rejects_unknown_sweeps(tmp_path):
+    with pytest.raises(SystemExit):
+        main(['figures', 'v9', '--out-dir', str(tmp_path)])
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from cbd_model.analytic import MODELS, run_analytic
+from cbd_model.batch import inhibition_factor, run_batch
+from cbd_model.combination import _dose_for, bliss_excess, loewe_excess, run_checkerboard
+from cbd_model.solvers import run_simulation_v3, run_simulation_v4
+
+
+@pytest.mark.parametrize('model', ['v3', 'v4'])
+def test_saturating_blocker_matches_boolean_blocker(model):
+    saturated = inhibition_factor(1e12, max_inhibition=1.0 - MODELS[model]['blocker_inhibition'])
+    np.testing.assert_allclose(saturated, MODELS[model]['blocker_inhibition'], rtol=1e-10)
+    doses = np.array([5.0, 20.0, 60.0])
+    _, boolean = run_analytic(doses, True, cell_type='Cancer (Vulnerable)', model=model)
+    _, factor = run_analytic(doses, saturated, cell_type='Cancer (Vulnerable)', model=model)
+    np.testing.assert_allclose(factor, boolean, rtol=0, atol=1e-8)
+
+
+def test_run_batch_accepts_inhibition_factors():
+    _, boolean = run_batch([20.0, 20.0], [True, False], cell_type='Cancer (Vulnerable)')
+    _, factor = run_batch([20.0, 20.0], inhibition_factor(np.array([1e12, 0.0])),
+                          cell_type='Cancer (Vulnerable)')
+    np.testing.assert_allclose(factor, boolean, rtol=1e-6, atol=1e-8)
+
+
+@pytest.mark.parametrize('run', [run_simulation_v3, run_simulation_v4])
+@pytest.mark.parametrize('factor', [inhibition_factor(0.0), 0.5, inhibition_factor(1e12)])
+@pytest.mark.parametrize('generated', [False, True])
+def test_odeint_matches_analytic_for_inhibition_factors(run, factor, generated):
+    _, analytic = run(40.0, factor, 'Cancer (Vulnerable)')
+    _, numeric = run(40.0, factor, 'Cancer (Vulnerable)', method='odeint', generated=generated)
+    np.testing.assert_allclose(numeric, analytic, rtol=1e-5, atol=1e-5)
+
+
+def test_mixed_boolean_and_factor_blockers_convert_element_wise():
+    _, mixed = run_batch(40.0, [True, 0.5, False], cell_type='Cancer (Vulnerable)')
+    _, boolean = run_batch(40.0, [True, False], cell_type='Cancer (Vulnerable)')
+    _, factor = run_batch(40.0, [0.5], cell_type='Cancer (Vulnerable)')
+    np.testing.assert_allclose(mixed[[0, 2]], boolean, rtol=1e-5, atol=1e-5)
+    np.testing.assert_allclose(mixed[1], factor[0], rtol=1e-5, atol=1e-5)
+    for model in ('v3', 'v4'):
+        _, mixed = run_analytic(40.0, np.array([True, 0.5], dtype=object),
+                                cell_type='Cancer (Vulnerable)', model=model)
+        _, boolean = run_analytic(40.0, True, cell_type='Cancer (Vulnerable)', model=model)
+        np.testing.assert_allclose(mixed[0], boolean[0], rtol=1e-12)
+
+
+def test_dose_for_takes_the_first_dose_on_a_plateau():
+    doses = np.arange(6.0)
+    curve = np.array([0.0, 0.5, 1.0, 1.0, 1.0, 1.0])
+    assert _dose_for(1.0, doses, curve) == 2.0
+    assert _dose_for(0.75, doses, curve) == 1.5
+    assert _dose_for(0.0, doses, curve) == 0.0
+    assert _dose_for(1.5, doses, curve) == np.inf
+    # A dip does not lower the envelope
+    np.testing.assert_array_equal(_dose_for(np.array([0.5, 0.9]), doses,
+                                            np.array([0.0, 0.6, 0.2, 1.0, 1.0, 1.0])),
+                                  [5.0 / 6.0, 2.75])
+
+
+def test_additive_combinations_score_zero():
+    effect_a = np.array([0.0, 0.2, 0.5])
+    effect_b = np.array([0.0, 0.1, 0.4])
+    bliss = effect_a[:, None] + effect_b[None, :] - effect_a[:, None] * effect_b[None, :]
+    np.testing.assert_allclose(bliss_excess(bliss, effect_a, effect_b), 0.0, atol=1e-15)
+    # A drug combined with itself is Loewe-additive: doses add
+    doses = np.array([0.0, 1.0, 2.0, 3.0, 4.0])
+    curve = doses / 4.0
+    combined = (doses[:, None] + doses[None, :]) / 4.0
+    inside = combined <= 1.0
+    excess = loewe_excess(np.minimum(combined, 1.0), doses, doses, curve, curve)
+    np.testing.assert_allclose(excess[inside], 0.0, atol=1e-12)
+
+
+def test_checkerboard_pool_matches_serial():
+    kwargs = dict(cbd_doses=np.linspace(0, 100, 23), blocker_doses=np.linspace(0, 30, 11),
+                  chunk_points=40)
+    serial = run_checkerboard(**kwargs, max_workers=1)
+    pooled = run_checkerboard(**kwargs, max_workers=2)
+    for key in ('effect', 'bliss', 'loewe', 'final_psi', 'collapse_time', 'survived'):
+        np.testing.assert_array_equal(pooled[key], serial[key])
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from scipy.integrate import odeint
+
+from cbd_model.analytic import analytic_collapse_time
+from cbd_model.events import INFO_KEYS, run_event_driven, sweep_event_driven
+from cbd_model.models import system_dynamics_v4
+from cbd_model.params import INITIAL_STATE, PSI_DEATH_THRESHOLD, ROS_TOXIC_THRESHOLD
+from cbd_model.pk import repeated_dosing, simulate_pk
+from cbd_model.stochastic import run_sde
+
+SCENARIOS = [
+    ('Cancer (Vulnerable)', 40.0, True),
+    ('Cancer (Vulnerable)', 5.0, True),
+    ('Healthy', 100.0, True),
+    ('Healthy', 5.0, False),
+]
+
+
+def _odeint_collapse_time(cbd_conc, cell_type, t_end=15.0, dt=1e-4):
+    """First trigger time of a dense, tightly converged odeint run; nan if none."""
+    t = np.arange(0.0, t_end + dt, dt)
+    sol = odeint(system_dynamics_v4, INITIAL_STATE, t, args=(cbd_conc, False, cell_type),
+                 rtol=1e-11, atol=1e-11)
+    fired = np.nonzero((sol[:, 0] < PSI_DEATH_THRESHOLD) | (sol[:, 2] > ROS_TOXIC_THRESHOLD))[0]
+    return t[fired[0]] if fired.size else np.nan
+
+
+@pytest.mark.parametrize('cell_type, dose, collapses', SCENARIOS)
+@pytest.mark.parametrize('method', ['LSODA', 'RK45', 'BDF'])
+def test_collapse_time_matches_closed_form_and_dense_odeint(cell_type, dose, collapses, method):
+    _, _, info = run_event_driven(dose, cell_type=cell_type, method=method)
+    exact = analytic_collapse_time(dose, cell_type=cell_type)[0]
+    assert np.isfinite(info['collapse_time']) == collapses
+    assert info['n_events'] == (1 if collapses else 0)
+    if collapses:
+        np.testing.assert_allclose(info['collapse_time'], exact, rtol=0, atol=1e-6)
+        # The dense run sees the trigger on the first grid point past the crossing
+        assert 0 <= _odeint_collapse_time(dose, cell_type) - info['collapse_time'] <= 1e-4
+    else:
+        assert np.isnan(exact)
+        assert np.isnan(_odeint_collapse_time(dose, cell_type))
+
+
+@pytest.mark.parametrize('method', ['LSODA', 'RK45', 'BDF'])
+def test_solver_statistics_are_filled_in(method):
+    _, _, info = run_event_driven(40.0, cell_type='Cancer (Vulnerable)', method=method)
+    assert set(info) == set(INFO_KEYS)
+    assert info['nfev'] > info['n_steps'] > 0
+    if method == 'RK45':
+        assert isinstance(info['n_rejected'], int) and info['n_rejected'] >= 0
+    else:
+        assert info['n_rejected'] is None
+    if method == 'BDF':
+        assert info['njev'] > 0 and info['nlu'] > 0
+    sweep = sweep_event_driven([5.0, 40.0], cell_type='Cancer (Vulnerable)', method=method)
+    assert sweep['nfev'][1] == info['nfev']
+
+
+def test_single_scenario_solvers_reject_arrays():
+    with pytest.raises(ValueError, match='resilience'):
+        run_event_driven(40.0, resilience=[0.3, 0.9], cell_type='Cancer (Vulnerable)')
+    with pytest.raises(ValueError, match='sweep_event_driven'):
+        run_event_driven([20.0, 40.0], cell_type='Cancer (Vulnerable)')
+    with pytest.raises(ValueError, match='resilience'):
+        run_event_driven(40.0, cell_type=['Healthy', 'Cancer (Vulnerable)'])
+    with pytest.raises(ValueError, match='scavenging_capacity'):
+        simulate_pk(repeated_dosing(20.0, interval=24.0), 48.0,
+                    scavenging_capacity=np.array([0.5, 1.0]))
+    with pytest.raises(ValueError, match='resilience'):
+        run_sde(40.0, 10, resilience=[0.3, 0.9])
+    with pytest.raises(ValueError, match='blocker'):
+        run_sde(40.0, 10, blocker=[False, True])
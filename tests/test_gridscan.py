@@ -0,0 +1,39 @@
+import os
+
+import numpy as np
+import pytest
+
+from cbd_model.gridscan import run_grid_scan
+
+DOSES = np.linspace(0, 100, 21)
+AXES = {'resilience': np.linspace(0.2, 0.9, 5), 'g_max': np.linspace(0.5, 2.0, 4)}
+OUTCOMES = ('final_psi', 'final_ros', 'collapse_time', 'threshold_dose', 'therapeutic_index')
+
+
+def assert_same_scan(a, b):
+    for key in OUTCOMES:
+        np.testing.assert_array_equal(a[key], b[key])
+
+
+def test_pool_matches_serial():
+    serial = run_grid_scan(DOSES, AXES, chunk_points=63, max_workers=1)
+    pooled = run_grid_scan(DOSES, AXES, chunk_points=63, max_workers=2)
+    assert_same_scan(serial, pooled)
+
+
+def test_resume_keeps_stored_chunk_layout(tmp_path):
+    reference = run_grid_scan(DOSES, AXES, max_workers=1)
+    out_dir = str(tmp_path / 'scan')
+    run_grid_scan(DOSES, AXES, out_dir=out_dir, chunk_points=63, max_workers=1)
+    os.remove(os.path.join(out_dir, 'chunk_00002.npz'))
+    for chunk_points in (63, 105, 2 ** 16):
+        resumed = run_grid_scan(DOSES, AXES, out_dir=out_dir, chunk_points=chunk_points,
+                                max_workers=1)
+        assert_same_scan(resumed, reference)
+
+
+def test_different_scan_in_same_directory_is_rejected(tmp_path):
+    out_dir = str(tmp_path / 'scan')
+    run_grid_scan(DOSES, AXES, out_dir=out_dir, max_workers=1)
+    with pytest.raises(ValueError, match='different scan'):
+        run_grid_scan(DOSES[:-1], AXES, out_dir=out_dir, max_workers=1)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from cbd_model.batch import banded_jacobian_v4_batch, system_dynamics_v4_batch, v4_coefficients
+from cbd_model.codegen import compile_rhs
+from cbd_model.models import JACOBIANS, SYSTEM_DYNAMICS
+from cbd_model.params import phenotype
+
+SCENARIOS = [
+    ('v1', (20.0, False)),
+    ('v2', (20.0, True, 0.4)),
+    ('v3', (40.0, False, 'Cancer (Vulnerable)')),
+    ('v3', (5.0, True, 'Healthy')),
+    ('v4', (40.0, False, 'Cancer (Vulnerable)')),
+    ('v4', (5.0, True, 'Healthy')),
+]
+# Away from the Apop thresholds, where the trigger is constant
+STATES = {2: np.array([0.8, 0.1]), 3: np.array([0.8, 0.1, 0.5])}
+# Including states past the thresholds, for the RHS comparison
+RHS_STATES = {2: [STATES[2], np.array([0.3, 0.0])],
+              3: [STATES[3], np.array([0.3, 0.0, 2.5]), np.array([1.0, 0.0, 0.1])]}
+
+def finite_difference(function, y, step=1e-6):
+    columns = []
+    for j in range(y.size):
+        dy = np.zeros_like(y)
+        dy[j] = step
+        columns.append((np.asarray(function(y + dy)) - np.asarray(function(y - dy))) / (2 * step))
+    return np.stack(columns, axis=1)
+
+
+@pytest.mark.parametrize('model, args', SCENARIOS)
+def test_jacobian_matches_finite_differences(model, args):
+    y = STATES[len(JACOBIANS[model](None, 0.0, *args))]
+    numeric = finite_difference(lambda state: SYSTEM_DYNAMICS[model](state, 0.0, *args), y)
+    np.testing.assert_allclose(JACOBIANS[model](y, 0.0, *args), numeric, atol=1e-8)
+
+
+@pytest.mark.parametrize('model, args', SCENARIOS)
+def test_generated_rhs_is_bitwise_identical(model, args):
+    rhs, jac = compile_rhs(model, args)
+    for y in RHS_STATES[len(JACOBIANS[model](None, 0.0, *args))]:
+        np.testing.assert_array_equal(rhs(y, 0.0), SYSTEM_DYNAMICS[model](y, 0.0, *args))
+        np.testing.assert_array_equal(jac(y, 0.0), JACOBIANS[model](y, 0.0, *args))
+
+def test_banded_batch_jacobian_matches_finite_differences():
+    params = phenotype('Cancer (Vulnerable)')
+    coefficients = v4_coefficients(np.array([0.0, 20.0, 60.0]), np.array([False, True, False]),
+                                   **params)
+    y = np.array([0.9, 0.2, 0.5, 0.4, -0.3, 1.1])
+    numeric = finite_difference(lambda state: system_dynamics_v4_batch(state, 0.0,
+                                                                       *coefficients), y)
+    band = banded_jacobian_v4_batch(coefficients[1])(y, 0.0, *coefficients)
+    dense = np.zeros((y.size, y.size))
+    for i in range(y.size):
+        for j in range(max(0, i - 1), min(y.size, i + 2)):
+            dense[i, j] = band[i - j + 1, j]
+    np.testing.assert_allclose(dense, numeric, atol=1e-8)
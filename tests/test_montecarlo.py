@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from cbd_model.montecarlo import (
+    batch_summary, default_priors, empty_summary, merge_summaries, run_monte_carlo,
+    sample_range,
+)
+
+EXACT = ('n_samples', 'survival_probability', 'collapse_probability', 'collapse_time_hist',
+         'final_psi_quantiles', 'final_ros_quantiles')
+
+
+def test_sample_range_does_not_depend_on_the_split():
+    priors = default_priors('Healthy')
+    whole = sample_range(priors, 0, 10_000, seed=4)
+    for start, stop in ((0, 1), (4095, 4097), (3000, 9000), (8192, 10_000)):
+        part = sample_range(priors, start, stop, seed=4)
+        for name in priors:
+            np.testing.assert_array_equal(part[name], whole[name][start:stop])
+
+
+@pytest.mark.parametrize('batch_size, max_workers', [(3000, 1), (7001, 1), (3000, 3),
+                                                     (2500, 2)])
+def test_results_do_not_depend_on_batches_or_workers(batch_size, max_workers):
+    reference = run_monte_carlo(20_000, 40.0, batch_size=20_000, seed=7)
+    result = run_monte_carlo(20_000, 40.0, batch_size=batch_size, max_workers=max_workers,
+                             seed=7)
+    for key in EXACT:
+        np.testing.assert_array_equal(result[key], reference[key])
+    for key in ('final_psi_mean', 'final_psi_std', 'final_ros_mean', 'final_ros_std'):
+        np.testing.assert_allclose(result[key], reference[key], rtol=1e-12)
+
+
+def _summaries(seed=1):
+    rng = np.random.default_rng(seed)
+    parts = []
+    for n in (5, 1000, 37):
+        psi = rng.normal(-20.0, 30.0, n)
+        ros = rng.gamma(2.0, 1.0, n)
+        collapse = np.where(rng.random(n) < 0.5, rng.uniform(0, 48, n), np.nan)
+        parts.append((psi, ros, collapse))
+    return parts
+
+
+def _assert_summaries_equal(a, b):
+    assert a.keys() == b.keys()
+    for key in a:
+        np.testing.assert_allclose(a[key], b[key], rtol=1e-12)
+
+
+def test_merge_summaries_is_associative():
+    a, b, c = (batch_summary(*part) for part in _summaries())
+    left = merge_summaries(merge_summaries(a, b), c)
+    right = merge_summaries(a, merge_summaries(b, c))
+    _assert_summaries_equal(left, right)
+    _assert_summaries_equal(merge_summaries(empty_summary(), left), left)
+    whole = batch_summary(*(np.concatenate(x) for x in zip(*_summaries())))
+    _assert_summaries_equal(left, whole)
+
+
+def test_merge_rejects_different_horizons():
+    with pytest.raises(ValueError, match='t_end'):
+        merge_summaries(empty_summary(t_end=48.0), empty_summary(t_end=24.0))
@@ -0,0 +1,40 @@
+import os
+
+import numpy as np
+
+from cbd_model import cache
+from cbd_model.pk import repeated_dosing, simulate_pk
+
+REGIMEN = repeated_dosing(20.0, interval=24.0)
+
+
+def test_checkpoint_extends_and_truncates(tmp_path):
+    path = str(tmp_path / 'run.npz')
+    _, full, full_info = simulate_pk(REGIMEN, 96.0)
+    t, short, short_info = simulate_pk(REGIMEN, 48.0, checkpoint_path=path)
+    assert short_info['counted_until'] == 48.0
+
+    t_ext, extended, extended_info = simulate_pk(REGIMEN, 96.0, checkpoint_path=path)
+    np.testing.assert_allclose(extended, full, rtol=1e-6, atol=1e-8)
+    assert extended_info['counted_until'] == 96.0
+
+    # The checkpoint now reaches 96 h; a 48 h rerun is cut from it and says so
+    t_cut, cut, cut_info = simulate_pk(REGIMEN, 48.0, checkpoint_path=path)
+    np.testing.assert_array_equal(t_cut, t)
+    np.testing.assert_allclose(cut, short, rtol=1e-6, atol=1e-8)
+    assert cut_info['counted_until'] == 96.0
+    assert cut_info['nfev'] == extended_info['nfev']
+
+
+def test_checkpoint_is_written_on_cache_hit(tmp_path):
+    previous = cache.configure()
+    cache.configure(enabled=True, directory=str(tmp_path / 'cache'))
+    try:
+        simulate_pk(REGIMEN, 48.0)
+        path = str(tmp_path / 'run.npz')
+        _, sol, _ = simulate_pk(REGIMEN, 48.0, checkpoint_path=path)
+        assert os.path.exists(path)
+        _, extended, _ = simulate_pk(REGIMEN, 72.0, checkpoint_path=path)
+        np.testing.assert_array_equal(extended[:sol.shape[0] - 1], sol[:-1])
+    finally:
+        cache.configure(**{key: previous[key] for key in ('enabled', 'directory')})
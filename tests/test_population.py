@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from cbd_model.analytic import analytic_final_state
+from cbd_model.population import (
+    PARAMETERS, run_population, sample_cells, sample_population, tissue_components,
+)
+
+DOSES = [0.0, 5.0, 40.0]
+N_CELLS = 20_000
+
+
+@pytest.fixture(scope='module')
+def reference():
+    return run_population('HCC tumour', N_CELLS, DOSES, seed=5, chunk_size=N_CELLS,
+                          keep_state=True)
+
+
+@pytest.mark.parametrize('chunk_size, max_workers', [(3000, 1), (4096, 1), (7001, 3),
+                                                     (2500, 2)])
+def test_results_do_not_depend_on_chunks_or_workers(reference, chunk_size, max_workers):
+    result = run_population('HCC tumour', N_CELLS, DOSES, seed=5, chunk_size=chunk_size,
+                            max_workers=max_workers, keep_state=True)
+    for key in ('component_counts', 'surviving_fraction', 'component_surviving_fraction',
+                'survived_fraction', 'final_state', 'collapse_time'):
+        np.testing.assert_array_equal(result[key], reference[key])
+
+
+def test_cells_are_stored_in_float32(reference):
+    cells = sample_population('HCC tumour', 5000, seed=5, chunk_size=1000)
+    assert cells['component'].dtype == np.int8
+    for key in PARAMETERS:
+        assert cells[key].dtype == np.float32
+    assert reference['final_state'].dtype == np.float32
+    assert reference['collapse_time'].dtype == np.float32
+
+
+def test_summary_matches_a_float64_reference(reference):
+    cells = sample_cells(tissue_components('HCC tumour'), 0, N_CELLS, seed=5, dtype=np.float64)
+    cells.pop('component')
+    tau = reference['t'] - reference['t'][0]
+    for d, dose in enumerate(DOSES):
+        final, collapse_time = analytic_final_state(dose, t_end=tau[-1], **cells)
+        lost = collapse_time[:, None] <= tau
+        np.testing.assert_allclose(reference['surviving_fraction'][d], 1.0 - lost.mean(axis=0),
+                                   rtol=0, atol=1e-3)
+        survived = (final[:, 0] > 0.4) & (final[:, 2] < 2.0)
+        np.testing.assert_allclose(reference['survived_fraction'][d], survived.mean(),
+                                   rtol=0, atol=1e-3)
+        # float32 parameters move each cell by float32 rounding, not more
+        np.testing.assert_allclose(reference['final_state'][d], final, rtol=1e-4, atol=1e-3)
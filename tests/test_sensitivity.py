@@ -0,0 +1,61 @@
+import numpy as np
+
+from cbd_model.sensitivity import morris_design, morris_effects, saltelli_design, sobol_indices
+
+ISHIGAMI_BOUNDS = {name: (-np.pi, np.pi) for name in ('x1', 'x2', 'x3')}
+
+
+def _ishigami(X, a=7.0, b=0.1):
+    return np.sin(X[:, 0]) + a * np.sin(X[:, 1]) ** 2 + b * X[:, 2] ** 4 * np.sin(X[:, 0])
+
+
+def _ishigami_indices(a=7.0, b=0.1):
+    v1 = 0.5 * (1 + b * np.pi ** 4 / 5) ** 2
+    v2 = a ** 2 / 8
+    v13 = b ** 2 * np.pi ** 8 * (1 / 18 - 1 / 50)
+    variance = v1 + v2 + v13
+    return np.array([v1, v2, 0.0]) / variance, np.array([v1 + v13, v2, v13]) / variance
+
+
+def test_sobol_indices_of_the_ishigami_function():
+    n_base = 2 ** 14
+    X = saltelli_design(ISHIGAMI_BOUNDS, n_base, seed=1)
+    result = sobol_indices(_ishigami(X), n_base, 3, n_bootstrap=200, seed=1)
+    first, total = _ishigami_indices()
+    np.testing.assert_allclose(result['S1'], first, atol=0.03)
+    np.testing.assert_allclose(result['ST'], total, atol=0.03)
+    assert np.all(result['S1_conf'][:, 0] <= result['S1'])
+    assert np.all(result['S1'] <= result['S1_conf'][:, 1])
+
+
+def test_sobol_indices_of_a_linear_function():
+    coefficients = np.array([4.0, 2.0, 1.0, 0.0])
+    bounds = {f'x{i}': (0.0, 1.0) for i in range(4)}
+    n_base = 2 ** 12
+    X = saltelli_design(bounds, n_base, seed=2)
+    result = sobol_indices(X @ coefficients, n_base, 4, n_bootstrap=100)
+    expected = coefficients ** 2 / (coefficients ** 2).sum()
+    np.testing.assert_allclose(result['S1'], expected, atol=0.02)
+    np.testing.assert_allclose(result['ST'], expected, atol=0.02)
+
+
+def test_morris_ranks_the_dominant_parameter_first():
+    coefficients = np.array([0.5, 10.0, -2.0])
+    bounds = {'a': (0.0, 2.0), 'b': (1.0, 2.0), 'c': (-1.0, 1.0)}
+    X, signs, delta = morris_design(bounds, 50, seed=3)
+    result = morris_effects(X @ coefficients, X, bounds, signs, delta, n_bootstrap=100)
+    # Effects are per full range: coefficient times width, with no spread
+    widths = np.array([2.0, 1.0, 2.0])
+    np.testing.assert_allclose(result['mu_star'], np.abs(coefficients) * widths)
+    np.testing.assert_allclose(result['mu'], coefficients * widths)
+    np.testing.assert_allclose(result['sigma'], 0.0, atol=1e-9)
+    assert np.argmax(result['mu_star']) == 1
+
+
+def test_morris_separates_interactions_on_the_ishigami_function():
+    X, signs, delta = morris_design(ISHIGAMI_BOUNDS, 500, seed=4)
+    result = morris_effects(_ishigami(X), X, ISHIGAMI_BOUNDS, signs, delta, n_bootstrap=100)
+    # x3 acts only through its interaction with x1: mean effect ~0, large spread
+    assert abs(result['mu'][2]) < 0.2 * result['mu_star'][2]
+    assert result['sigma'][2] > result['mu_star'][2]
+    assert np.argmin(result['mu_star']) == 2
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from cbd_model.params import phenotype
+from cbd_model.spheroid import (
+    CBD_DIFFUSIVITY, SPHEROID_RADIUS, UPTAKE_RATE, _banded_jacobian, _dynamics, _radial_grid,
+    _slice_grid, _sparse_jacobian, run_spheroid,
+)
+
+
+def finite_difference(rhs, y, step=1e-7):
+    columns = []
+    for j in range(y.size):
+        dy = np.zeros_like(y)
+        dy[j] = step * max(1.0, abs(y[j]))
+        columns.append((rhs(y + dy) - rhs(y - dy)) / (2 * dy[j]))
+    return np.stack(columns, axis=1)
+
+
+def system(grid, blocker=False):
+    _, _, _, laplacian, source = grid
+    n = laplacian.shape[0]
+    given = {key: np.full(n, value) for key, value in phenotype('Cancer (Vulnerable)').items()}
+    rhs, terms = _dynamics(laplacian, source, UPTAKE_RATE, blocker, given)
+    rng = np.random.default_rng(0)
+    y = np.column_stack([rng.uniform(0.5, 30.0, n), rng.uniform(0.2, 1.0, n),
+                         rng.uniform(0.1, 1.0, n)]).ravel()
+    return laplacian, given, rhs, terms, y
+
+
+@pytest.mark.parametrize('blocker', [False, True])
+def test_radial_banded_jacobian_matches_finite_differences(blocker):
+    laplacian, given, rhs, terms, y = system(_radial_grid(6, SPHEROID_RADIUS, CBD_DIFFUSIVITY),
+                                             blocker)
+    numeric = finite_difference(lambda state: rhs(state, 0.0, 20.0), y)
+    band = _banded_jacobian(laplacian, UPTAKE_RATE, blocker, given, terms)(y, 0.0, 20.0)
+    dense = np.zeros_like(numeric)
+    for i in range(y.size):
+        for j in range(max(0, i - 3), min(y.size, i + 4)):
+            dense[i, j] = band[i - j + 3, j]
+    np.testing.assert_allclose(dense, numeric, rtol=1e-6, atol=1e-6 * np.abs(numeric).max())
+
+
+def test_slice_sparse_jacobian_matches_finite_differences():
+    grid = _slice_grid((4, 5), 2 * SPHEROID_RADIUS, 2 * SPHEROID_RADIUS, CBD_DIFFUSIVITY)
+    laplacian, given, rhs, terms, y = system(grid)
+    numeric = finite_difference(lambda state: rhs(state, 0.0, 20.0), y)
+    exact = _sparse_jacobian(laplacian, UPTAKE_RATE, False, given, terms)(0.0, y).toarray()
+    np.testing.assert_allclose(exact, numeric, rtol=1e-6, atol=1e-6 * np.abs(numeric).max())
+
+
+def test_uniform_medium_is_radially_symmetric_in_a_slice():
+    result = run_spheroid(10.0, geometry='slice', n_nodes=(6, 6), t=np.linspace(0, 10, 3))
+    cbd = result['cbd'][-1].reshape(6, 6)
+    np.testing.assert_allclose(cbd, cbd.T, rtol=1e-6)
+    np.testing.assert_allclose(cbd, cbd[::-1], rtol=1e-6)
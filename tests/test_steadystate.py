@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from cbd_model.analytic import MODELS, analytic_final_state
+from cbd_model.models import system_dynamics_v3, system_dynamics_v4
+from cbd_model.steadystate import equilibrium, threshold_dose
+
+DYNAMICS = {'v3': system_dynamics_v3, 'v4': system_dynamics_v4}
+THRESHOLDS = [('v3', 'Cancer (Vulnerable)', False), ('v4', 'Cancer (Vulnerable)', False),
+              ('v4', 'Cancer (Vulnerable)', True), ('v4', 'Healthy', False)]
+
+
+@pytest.mark.parametrize('model', ['v3', 'v4'])
+@pytest.mark.parametrize('cell_type', ['Healthy', 'Cancer (Vulnerable)'])
+@pytest.mark.parametrize('blocker', [False, True])
+def test_equilibrium_is_the_fixed_point_of_the_odes(model, cell_type, blocker):
+    doses = np.array([0.0, 3.0, 20.0, 100.0])
+    eq = equilibrium(doses, blocker, cell_type=cell_type, model=model)
+    for dose, psi, ros in zip(doses, eq['psi'], eq['ros']):
+        dpsi, _, dros = DYNAMICS[model]([psi, 0.0, ros], 0.0, dose, blocker, cell_type)
+        np.testing.assert_allclose([dpsi, dros], 0.0, atol=1e-12)
+    # and where every trajectory ends up
+    final, _ = analytic_final_state(doses, blocker, cell_type=cell_type, model=model,
+                                    t_end=1000.0)
+    np.testing.assert_allclose(final[:, 0], eq['psi'], rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(final[:, 2], eq['ros'], rtol=1e-10, atol=1e-12)
+
+
+@pytest.mark.parametrize('model, cell_type, blocker', THRESHOLDS)
+def test_threshold_dose_is_where_long_runs_stop_surviving(model, cell_type, blocker):
+    dose = threshold_dose(blocker=blocker, cell_type=cell_type, model=model)['threshold_dose']
+    assert np.isfinite(dose).all()
+    doses = dose[0] * np.array([1 - 1e-6, 1 + 1e-6])
+    final, _ = analytic_final_state(doses, blocker, cell_type=cell_type, model=model,
+                                    t_end=1000.0)
+    spec = MODELS[model]
+    survived = (final[:, 0] > spec['psi_threshold']) & (final[:, 2] < spec['ros_threshold'])
+    np.testing.assert_array_equal(survived, [True, False])
+    np.testing.assert_array_equal(equilibrium(doses, blocker, cell_type=cell_type,
+                                              model=model)['viable'], [True, False])
+
+
+def test_threshold_dose_is_infinite_when_the_phenotype_stays_viable():
+    result = threshold_dose(blocker=True, cell_type='Healthy')
+    assert np.isinf(result['threshold_dose']).all()
+    assert result['binding'][0] == ''
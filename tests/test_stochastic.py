@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from cbd_model.analytic import run_analytic
+from cbd_model.stochastic import run_sde
+
+FIELDS = ('collapse_probability', 'first_passage_time', 'survived_fraction', 'psi', 'apop',
+          'ros')
+
+
+@pytest.mark.parametrize('scheme', ['euler_maruyama', 'milstein'])
+def test_paths_do_not_depend_on_chunking_or_workers(scheme):
+    kwargs = dict(cbd_conc=[20.0, 40.0], n_trajectories=300, noise='multiplicative',
+                  scheme=scheme, dt=0.05, seed=7)
+    reference = run_sde(**kwargs, chunk_size=300)
+    for chunk_size, max_workers in ((64, 1), (37, 2)):
+        result = run_sde(**kwargs, chunk_size=chunk_size, max_workers=max_workers)
+        for key in FIELDS:
+            np.testing.assert_array_equal(result[key], reference[key])
+
+
+def test_zero_noise_converges_to_closed_form_at_first_order():
+    _, exact = run_analytic(40.0, cell_type='Cancer (Vulnerable)', t=np.linspace(0, 50, 11))
+    errors = []
+    for dt in (0.04, 0.02, 0.01):
+        result = run_sde(40.0, 4, sigma_psi=0.0, sigma_ros=0.0, dt=dt)
+        np.testing.assert_allclose(result['ros'][0], exact[0, -1, 2], rtol=1e-12)
+        errors.append(np.abs(result['psi'][0] - exact[0, -1, 0]).max())
+    assert errors[-1] < 0.2 * 0.01
+    # Halving dt halves the Euler error
+    np.testing.assert_allclose(np.array(errors[:-1]) / errors[1:], 2.0, rtol=0.05)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from cbd_model import cache
+from cbd_model.analytic import run_analytic
+from cbd_model.params import phenotype, v3_phenotype
+from cbd_model.store import open_store, read, read_decimated, select, write_sweep
+
+DOSES = [0.0, 20.0, 60.0]
+AXES = {'g_max': [0.5, 1.0, 2.0]}
+
+
+@pytest.mark.parametrize('model, lookup', [('v3', v3_phenotype), ('v4', phenotype)])
+def test_write_sweep_uses_the_models_phenotypes(tmp_path, model, lookup):
+    path = str(tmp_path / 'store')
+    t = np.linspace(0, 50, 101)
+    assert write_sweep(path, DOSES, AXES, base='Healthy', t=t, model=model,
+                       dtype='float64', chunk_scenarios=4, max_workers=2) == 9
+    store = open_store(path)
+    for g_max in AXES['g_max']:
+        for dose in DOSES:
+            rows = select(store, g_max=g_max, cbd_conc=dose)
+            assert rows.size == 1
+            params = {**lookup('Healthy'), 'g_max': g_max}
+            _, expected = run_analytic(dose, t=t, model=model, **params)
+            np.testing.assert_allclose(read(store, rows)[0], expected[0], rtol=1e-12)
+
+
+def test_decimated_envelope_bounds_raw_data(tmp_path):
+    path = str(tmp_path / 'store')
+    write_sweep(path, DOSES, AXES, t=np.linspace(0, 50, 2001))
+    store = open_store(path)
+    rows = np.arange(9)
+    raw = read(store, rows)
+    envelope = read_decimated(store, rows, n_points=20)
+    assert envelope['min'].shape == (9, 20, 3)
+    assert np.all(envelope['min'].min(axis=1) == raw.min(axis=1))
+    assert np.all(envelope['max'].max(axis=1) == raw.max(axis=1))
+
+
+def test_write_sweep_leaves_the_result_cache_alone(tmp_path):
+    previous = cache.configure()
+    directory = tmp_path / 'cache'
+    cache.configure(enabled=True, directory=str(directory))
+    try:
+        write_sweep(str(tmp_path / 'store'), [5.0, 40.0], {'resilience': [0.3, 0.9]},
+                    chunk_scenarios=2)
+        assert not directory.exists() or not any(p.is_file() for p in directory.rglob('*'))
+        run_analytic(40.0, cell_type='Healthy')
+        assert any(p.is_file() for p in directory.rglob('*'))
+    finally:
+        cache.configure(**{key: previous[key] for key in ('enabled', 'directory')})
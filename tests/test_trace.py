@@ -0,0 +1,31 @@
+import sys
+import threading
+
+import pytest
+
+from cbd_model import trace
+from cbd_model.batch import run_batch
+
+
+def test_one_record_per_batch_chunk(tmp_path):
+    path = str(tmp_path / 'trace.jsonl')
+    with trace.tracing(path):
+        run_batch([5.0, 20.0, 40.0], cell_type='Cancer (Vulnerable)', chunk_size=2)
+    records = trace.load(path)
+    assert [(r['scenario']['start'], r['scenario']['stop']) for r in records] == [(0, 2), (2, 3)]
+    assert all(r['nfe'] > 0 and r['rhs_calls'] > 0 and 'error' not in r for r in records)
+
+
+def test_failed_solve_is_recorded_and_profiler_stopped(tmp_path):
+    path = str(tmp_path / 'trace.jsonl')
+    switch_interval = sys.getswitchinterval()
+    threads = threading.active_count()
+    with trace.tracing(path, profile=True):
+        with pytest.raises(TypeError):
+            run_batch([20.0], cell_type='Healthy', not_an_odeint_option=1)
+    assert sys.getswitchinterval() == switch_interval
+    assert threading.active_count() == threads
+    [record] = trace.load(path)
+    assert record['entry'] == 'run_batch'
+    assert record['error'].startswith('TypeError')
+    assert 'profile' in record